@@ -5,6 +5,7 @@ import shutil
 import subprocess
 
 from _init_venv_and_requirements import init_venv_and_requirements
+from lazy_import import lazy_modules
 from log import color, logger
 from util import human_readable_size, make_sure_dir_exists, show_head_line
 
@@ -83,6 +84,9 @@ def build(disable_douban=False, enable_proxy=False, use_upx=True):
             cmd_build.extend(['--icon', icon_path])
         for module in exclude_modules:
             cmd_build.extend(['--exclude-module', module])
+        for module in lazy_modules:
+            # 延迟导入的模块无法被pyinstaller分析到，需要显式告知
+            cmd_build.extend(['--hidden-import', module])
         if use_upx:
             cmd_build.extend(['--upx-dir', "utils"])
         cmd_build.extend(extra_args)
@@ -6,17 +6,19 @@
 # Author    : Chen Ji
 # Email     : fzls.zju@gmail.com
 # -------------------------------
+import hashlib
 import multiprocessing
 import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from compress import compress_dir_with_bandizip, decompress_dir_with_bandizip
 from log import color, logger
 from update import version_less
 from upload_lanzouyun import FileInFolder, Uploader
-from util import human_readable_size, range_from_one
+from util import human_readable_size, is_windows
 from version import now_version
 
 
@@ -35,6 +37,99 @@ class HistoryVersionFileInfo:
         return self.version
 
 
+# 制作补丁前需要从版本目录中移除的文件
+files_to_remove_before_patch = ["config.toml", "utils/auto_updater.exe"]
+
+# 预处理后的版本目录的缓存目录，按照目录内容的指纹区分
+prepared_dir_cache_dir = "patches_cache"
+
+# 每个补丁至少使用的线程数，据此计算可同时制作的补丁数
+min_threads_per_diff = 2
+
+
+def get_dir_fingerprint(dir_path: str) -> str:
+    """
+    计算目录内容的指纹，由各文件的相对路径、大小和修改时间计算得到，目录内容发生变化时指纹随之变化
+    """
+    hasher = hashlib.sha256()
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for filename in sorted(files):
+            filepath = os.path.join(root, filename)
+            stat = os.stat(filepath)
+            relpath = os.path.relpath(filepath, dir_path).replace(os.sep, "/")
+            hasher.update(f"{relpath}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+
+    return hasher.hexdigest()[:16]
+
+
+def link_or_copy(src: str, dst: str):
+    """
+    优先使用硬链接，避免实际复制文件内容，不支持时（如跨分区）则复制
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def prepare_version_dir(version_dir: str) -> str:
+    """
+    准备用于制作补丁的版本目录（移除不需要参与补丁的文件），并返回其路径。结果按目录内容指纹缓存，内容未变化时直接复用
+    """
+    prepared_dir = os.path.realpath(os.path.join(prepared_dir_cache_dir, f"{version_dir}_{get_dir_fingerprint(version_dir)}"))
+    if os.path.isdir(prepared_dir):
+        logger.info(f"{version_dir} 内容未发生变化，直接使用缓存的 {prepared_dir}")
+        return prepared_dir
+
+    logger.info(f"预处理 {version_dir} 到 {prepared_dir}")
+    temp_dir = prepared_dir + ".tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    shutil.copytree(version_dir, temp_dir, copy_function=link_or_copy)
+
+    for filename in files_to_remove_before_patch:
+        filepath = os.path.join(temp_dir, filename)
+        if os.path.isfile(filepath):
+            # 硬链接的情况下，这里仅移除链接，不影响原版本目录
+            os.remove(filepath)
+
+    # 全部处理完毕后再改名，确保缓存目录总是完整的
+    os.rename(temp_dir, prepared_dir)
+
+    return prepared_dir
+
+
+def clean_prepared_dir_cache(keep_dirs: List[str]):
+    if not os.path.isdir(prepared_dir_cache_dir):
+        return
+
+    for dir_name in os.listdir(prepared_dir_cache_dir):
+        dir_path = os.path.realpath(os.path.join(prepared_dir_cache_dir, dir_name))
+        if dir_path not in keep_dirs:
+            logger.info(f"移除不再需要的缓存 {dir_path}")
+            shutil.rmtree(dir_path, ignore_errors=True)
+
+
+def get_diff_command(dir_src: str) -> List[str]:
+    """
+    获取用于制作补丁的hdiffz命令，windows下使用自带的hdiffz.exe，其他系统优先使用PATH中的hdiffz，其次尝试通过wine运行hdiffz.exe
+    生成的补丁格式一致，均可被自动更新DLC使用的hpatchz.exe应用
+    """
+    hdiffz_exe = os.path.realpath(os.path.join(dir_src, "utils/hdiffz.exe"))
+    if is_windows():
+        return [hdiffz_exe]
+
+    hdiffz = shutil.which("hdiffz")
+    if hdiffz is not None:
+        return [hdiffz]
+
+    wine = shutil.which("wine")
+    if wine is not None:
+        return [wine, hdiffz_exe]
+
+    raise FileNotFoundError("当前系统不是windows，且未找到hdiffz或wine，请先安装HDiffPatch（https://github.com/sisong/HDiffPatch/releases），并确保hdiffz在PATH中")
+
+
 def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, dir_github_action_artifact, get_final_patch_path_only=False) -> str:
     latest_version = now_version
 
@@ -53,10 +148,9 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
     if version_less(netdisk_latest_version, latest_version):
         old_version_infos.append(HistoryVersionFileInfo(netdisk_latest_version_fileinfo, netdisk_latest_version))
 
-    # 从历史版本网盘中查找旧版本
-    for page in range_from_one(100):
-        folder_info = uploader.get_folder_info_by_url(uploader.folder_history_files.url, get_this_page=page)
-        for file in folder_info.files:
+    def parse_old_version_infos(files: List[FileInFolder]) -> List[HistoryVersionFileInfo]:
+        infos = []  # type: List[HistoryVersionFileInfo]
+        for file in files:
             filename = file.name  # type: str
 
             if not filename.startswith(uploader.history_version_prefix):
@@ -69,15 +163,21 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
             if not version_less(file_version, latest_version):
                 continue
 
-            if info in old_version_infos:
+            if info in old_version_infos or info in infos:
                 # 已经加入过（可能重复）
                 continue
 
-            old_version_infos.append(info)
+            infos.append(info)
 
-        if len(old_version_infos) >= create_patch_for_latest_n_version + 2:
-            # 已经找到超过前n+2个版本，因为网盘返回的必定是按上传顺序排列的，不过为了保险起见，多考虑一些
-            break
+        return infos
+
+    # 从历史版本网盘中查找旧版本，各页会并发获取，找到超过前n+2个版本后就不再获取后续页面
+    # 因为网盘返回的必定是按上传顺序排列的，不过为了保险起见，多考虑一些
+    folder_info = uploader.get_folder_info_by_url(
+        uploader.folder_history_files.url,
+        stop_when=lambda files: len(old_version_infos) + len(parse_old_version_infos(files)) >= create_patch_for_latest_n_version + 2,
+    )
+    old_version_infos.extend(parse_old_version_infos(folder_info.files))
 
     if create_patch_for_latest_n_version > len(old_version_infos):
         create_patch_for_latest_n_version = len(old_version_infos)
@@ -88,8 +188,6 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
     patch_oldest_version = old_version_infos[0].version
     patch_newest_version = old_version_infos[-1].version
     patches_dir = f"DNF蚊子腿小助手_增量更新文件_v{patch_oldest_version}_to_v{patch_newest_version}"
-    temp_dir = "patches_temp"
-
     patch_7z_file = f"{patches_dir}.7z"
     if get_final_patch_path_only:
         return patch_7z_file
@@ -119,49 +217,48 @@ def create_patch(dir_src, dir_all_release, create_patch_for_latest_n_version, di
 
     shutil.rmtree(patches_dir, ignore_errors=True)
     os.mkdir(patches_dir)
-    shutil.rmtree(temp_dir, ignore_errors=True)
-    os.mkdir(temp_dir)
-
-    def temp_path(dir_name):
-        return os.path.realpath(os.path.join(temp_dir, dir_name))
 
-    def preprocess_before_patch(temp_version_path):
-        for filename in ["config.toml", "utils/auto_updater.exe"]:
-            filepath = os.path.join(temp_version_path, filename)
-            if os.path.isfile(filepath):
-                os.remove(filepath)
+    diff_command = get_diff_command(dir_src)
 
-    # 为旧版本创建patch文件
+    # 准备各个版本预处理后的目录，已缓存的版本将直接复用
     target_version_dir = f"DNF蚊子腿小助手_v{latest_version}_by风之凌殇"
     logger.info(f"目标版本目录为{target_version_dir}")
-    shutil.copytree(target_version_dir, temp_path(target_version_dir))
-    preprocess_before_patch(temp_path(target_version_dir))
+    all_version_dirs = [target_version_dir, *[f"DNF蚊子腿小助手_v{info.version}_by风之凌殇" for info in old_version_infos]]
+    prepared_dirs = {version_dir: prepare_version_dir(version_dir) for version_dir in all_version_dirs}
 
-    for idx, version_info in enumerate(old_version_infos):
+    # 同时制作多个补丁，每个hdiffz进程分配一部分cpu，使总的线程数与cpu数一致
+    cpu_count = multiprocessing.cpu_count()
+    parallel_count = max(min(len(old_version_infos), cpu_count // min_threads_per_diff), 1)
+    threads_per_diff = max(cpu_count // parallel_count, 1)
+    logger.info(f"将同时制作{parallel_count}个补丁，每个补丁使用{threads_per_diff}个线程")
+
+    def make_patch(idx: int, version_info: HistoryVersionFileInfo):
         version = version_info.version
         patch_file = f"{patches_dir}/{version}.patch"
 
-        logger.info("-" * 80)
         logger.info(color("bold_yellow") + f"[{idx + 1}/{len(old_version_infos)}] 创建从v{version}升级到v{latest_version}的补丁{patch_file}")
 
         version_dir = f"DNF蚊子腿小助手_v{version}_by风之凌殇"
 
-        shutil.copytree(version_dir, temp_path(version_dir))
-        preprocess_before_patch(temp_path(version_dir))
-
-        subprocess.call([
-            os.path.realpath(os.path.join(dir_src, "utils/hdiffz.exe")),
-            f"-p-{multiprocessing.cpu_count()}",  # 设置系统最大cpu数
-            os.path.realpath(os.path.join(temp_dir, version_dir)),
-            os.path.realpath(os.path.join(temp_dir, target_version_dir)),
+        ret_code = subprocess.call([
+            *diff_command,
+            f"-p-{threads_per_diff}",
+            prepared_dirs[version_dir],
+            prepared_dirs[target_version_dir],
             patch_file,
         ])
+        if ret_code != 0:
+            raise Exception(f"创建补丁{patch_file}失败，错误码为{ret_code}")
 
         filesize = os.path.getsize(patch_file)
         logger.info(f"创建补丁{patch_file}结束，最终大小为{human_readable_size(filesize)}")
 
-    # 移除临时目录
-    shutil.rmtree(temp_dir, ignore_errors=True)
+    with ThreadPoolExecutor(max_workers=parallel_count) as pool:
+        for future in [pool.submit(make_patch, idx, version_info) for idx, version_info in enumerate(old_version_infos)]:
+            future.result()
+
+    # 仅保留本次用到的版本的缓存
+    clean_prepared_dir_cache(list(prepared_dirs.values()))
 
     # 压缩打包
     compress_dir_with_bandizip(patches_dir, patch_7z_file, dir_src)
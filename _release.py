@@ -117,15 +117,20 @@ def release():
             logger.info('\n')
 
         for upload_folder, upload_list in upload_info_list:
-            for local_filepath, history_file_prefix in reversed(upload_list):
-                # 逆序遍历，确保同一个网盘目录中，列在前面的最后才上传，从而在网盘显示时显示在最前方
+            # 同一个网盘目录中，除第一个外的文件同时上传，第一个文件等它们完成后再单独上传，从而在网盘显示时显示在最前方
+            first_filepath, first_history_file_prefix = upload_list[0]
+            batches = [
+                [(local_filepath, upload_folder, history_file_prefix) for local_filepath, history_file_prefix in reversed(upload_list[1:])],
+                [(first_filepath, upload_folder, first_history_file_prefix)],
+            ]
+            for batch in batches:
                 total_try_count = 1
                 for try_index in range_from_one(total_try_count):
-                    upload_ok = uploader.upload_to_lanzouyun(local_filepath, upload_folder, history_file_prefix=history_file_prefix)
-                    if upload_ok:
+                    batch = uploader.upload_files_to_lanzouyun(batch)
+                    if len(batch) == 0:
                         break
 
-                    logger.warning(f"第{try_index}/{total_try_count}次尝试上传{local_filepath}失败，等待一会后重试")
+                    logger.warning(f"第{try_index}/{total_try_count}次尝试上传{[local_filepath for local_filepath, _, _ in batch]}失败，等待一会后重试")
                     if try_index < total_try_count:
                         count_down("上传到网盘", 5 * try_index)
 
@@ -1,8 +1,14 @@
+import io
 import lzma
 import os
+import platform
 import shutil
 import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from os.path import realpath
+from typing import BinaryIO, List, Optional
 
 from log import logger
 
@@ -10,6 +16,9 @@ logger_func = logger.debug
 if os.path.exists(".use_by_myself"):
     logger_func = logger.info
 
+# lzma分块并行压缩时每块的大小，块越大压缩率越接近整体压缩，但并行度和内存占用也会随之变化
+lzma_block_size = 8 * 1024 * 1024
+
 
 def compress_dir_with_bandizip(dirpath: str, compressed_7z_filepath: str = "", dir_src_path: str = ""):
     """
@@ -23,6 +32,11 @@ def compress_dir_with_bandizip(dirpath: str, compressed_7z_filepath: str = "", d
 
     # 压缩打包
     logger_func(f"开始压缩 目录 {dirpath} 为 {compressed_7z_filepath}")
+    seven_zip = get_7z_path()
+    if seven_zip is not None:
+        subprocess.call([seven_zip, 'a', '-t7z', '-mx=9', '-y', compressed_7z_filepath, dirpath])
+        return
+
     subprocess.call([get_bz_path(dir_src_path), 'c', '-y', '-r', '-aoa', '-fmt:7z', '-l:9', compressed_7z_filepath, dirpath])
 
 
@@ -34,6 +48,11 @@ def decompress_dir_with_bandizip(compressed_7z_filepath: str, dir_src_path: str
 
     # 尝试解压
     logger_func(f"开始解压缩 目录 {compressed_7z_filepath} 到 目录 {dst_parent_folder} 下面")
+    seven_zip = get_7z_path()
+    if seven_zip is not None:
+        subprocess.call([seven_zip, "x", f"-o{dst_parent_folder}", "-aoa", "-y", realpath(compressed_7z_filepath)])
+        return
+
     subprocess.call([get_bz_path(dir_src_path), "x", f"-o:{dst_parent_folder}", "-aoa", "-target:auto", realpath(compressed_7z_filepath)])
 
 
@@ -45,6 +64,52 @@ def get_bz_path(dir_src_path: str = "") -> str:
     return realpath(os.path.join(dir_src_path, "utils/bandizip_portable", "bz.exe"))
 
 
+def get_7z_path() -> Optional[str]:
+    """
+    非windows系统下bandizip无法使用，此时尝试使用PATH中的7z命令行工具（p7zip或7-Zip），压缩格式一致
+    """
+    if platform.system() == "Windows":
+        return None
+
+    for name in ["7z", "7za", "7zz"]:
+        path = shutil.which(name)
+        if path is not None:
+            return path
+
+    return None
+
+
+def compress_stream_with_lzma(file_in: BinaryIO, file_out: BinaryIO, block_size: int = lzma_block_size, max_workers: Optional[int] = None):
+    """
+    流式分块并行压缩，每次只读取一块，并在多个线程中同时压缩（lzma压缩时会释放GIL）
+    每块压缩为一个独立的xz流，按顺序拼接后仍是合法的xz文件，可以直接使用 lzma.open/lzma.decompress 流式解压，与单线程压缩的结果兼容
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    wrote_any = False
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # 最多同时保留 2*max_workers 块在内存中，避免大文件一次性读入内存
+        pending = deque()
+        while True:
+            block = file_in.read(block_size)
+            if not block:
+                break
+
+            pending.append(pool.submit(lzma.compress, block))
+            if len(pending) >= 2 * max_workers:
+                file_out.write(pending.popleft().result())
+                wrote_any = True
+
+        while pending:
+            file_out.write(pending.popleft().result())
+            wrote_any = True
+
+    if not wrote_any:
+        # 空文件也需要写入一个合法的xz流
+        file_out.write(lzma.compress(b""))
+
+
 def compress_file_with_lzma(filepath: str, compressed_7z_filepath: str = ""):
     if compressed_7z_filepath == "":
         compressed_7z_filepath = filepath + ".7z"
@@ -55,8 +120,8 @@ def compress_file_with_lzma(filepath: str, compressed_7z_filepath: str = ""):
     # 创建压缩版本
     logger_func(f"开始压缩 文件 {filepath} 为 {compressed_7z_filepath}")
     with open(f"{filepath}", "rb") as file_in:
-        with lzma.open(f"{compressed_7z_filepath}", "wb") as file_out:
-            file_out.writelines(file_in)
+        with open(f"{compressed_7z_filepath}", "wb") as file_out:
+            compress_stream_with_lzma(file_in, file_out)
 
 
 def decompress_file_with_lzma(compressed_7z_filepath: str, filepath: str = ""):
@@ -74,14 +139,20 @@ def decompress_file_with_lzma(compressed_7z_filepath: str, filepath: str = ""):
     temp_target_path = f"{filepath}.decompressed"
     with lzma.open(f"{compressed_7z_filepath}", "rb") as file_in:
         with open(f"{temp_target_path}", "wb") as file_out:
-            file_out.writelines(file_in)
+            shutil.copyfileobj(file_in, file_out, 1024 * 1024)
 
     # 解压缩完成后再替换到目标文件，减少目标文件不可用的时长
     os.replace(temp_target_path, filepath)
 
 
 def compress_in_memory_with_lzma(src_bytes: bytes) -> bytes:
-    return lzma.compress(src_bytes)
+    if len(src_bytes) <= lzma_block_size:
+        # 不足一块时直接压缩，结果与分块压缩一致
+        return lzma.compress(src_bytes)
+
+    file_out = io.BytesIO()
+    compress_stream_with_lzma(io.BytesIO(src_bytes), file_out)
+    return file_out.getvalue()
 
 
 def decompress_in_memory_with_lzma(compressed_bytes: bytes) -> bytes:
@@ -131,5 +202,51 @@ def test():
     print(test_text == decompressed)
 
 
+def benchmark(filepaths: List[str]):
+    """
+    对比原先的单线程lzma压缩与分块并行压缩的压缩率和速度
+    用法：python compress.py benchmark [文件路径...]，未指定时默认使用 releases 目录中的发布压缩包和 utils/notices.txt
+    """
+    from util import human_readable_size
+
+    if len(filepaths) == 0:
+        filepaths = ["utils/notices.txt"]
+        if os.path.isdir("releases"):
+            filepaths.extend(sorted(os.path.join("releases", name) for name in os.listdir("releases") if name.endswith(".7z"))[-1:])
+
+    def _single_thread(src_bytes: bytes) -> bytes:
+        file_out = io.BytesIO()
+        with lzma.open(file_out, "wb") as f:
+            f.write(src_bytes)
+        return file_out.getvalue()
+
+    for filepath in filepaths:
+        with open(filepath, "rb") as f:
+            src_bytes = f.read()
+
+        logger.info(f"{filepath} 大小为 {human_readable_size(len(src_bytes))}")
+        for name, compress_func in [
+            ("单线程", _single_thread),
+            ("分块并行", compress_in_memory_with_lzma),
+        ]:
+            start_time = time.time()
+            compressed_bytes = compress_func(src_bytes)
+            compress_seconds = max(time.time() - start_time, 1e-6)
+
+            start_time = time.time()
+            assert lzma.decompress(compressed_bytes) == src_bytes
+            decompress_seconds = max(time.time() - start_time, 1e-6)
+
+            logger.info(
+                f"\t{name}: 压缩后 {human_readable_size(len(compressed_bytes))} 压缩率 {len(compressed_bytes) / max(len(src_bytes), 1):.2%} "
+                f"压缩速度 {human_readable_size(len(src_bytes) / compress_seconds)}/s 解压速度 {human_readable_size(len(src_bytes) / decompress_seconds)}/s"
+            )
+
+
 if __name__ == '__main__':
-    test()
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "benchmark":
+        benchmark(sys.argv[2:])
+    else:
+        test()
@@ -1,12 +1,15 @@
+import hashlib
+import pickle
 import re
 from multiprocessing import cpu_count
 
 from const import *
 from dao import DnfHelperChronicleExchangeGiftInfo
-from data_struct import to_raw_type
+from data_struct import to_json
 from log import *
 from sign import getACSRFTokenForAMS, getDjcSignParams
 from util import *
+from version import now_version
 
 encoding_error_str = "Found invalid character in key name: '#'. Try quoting the key name. (line 1 column 2 char 1)"
 
@@ -797,25 +800,27 @@ class CommonConfig(ConfigInterface):
         ]
 
     def on_config_update(self, raw_config: dict):
+        # 由于经常会有人填写成数字的列表，如[123, 456]，导致后面从各个dict中取值时出错（dict中都默认QQ为str类型，若传入int类型，会取不到对应的值）
+        # 所以这里做下兼容，强制转换为str
+        self.auto_send_card_target_qqs = [str(qq) for qq in self.auto_send_card_target_qqs]
+        self.sailiyam_visit_target_qqs = [str(qq) for qq in self.sailiyam_visit_target_qqs]
+
+        self.apply_runtime_settings()
+
+    def apply_runtime_settings(self):
+        """
+        应用配置中影响整个进程的部分，如日志等级、颜色，以及从url.toml中读取的链接
+        这些内容不会保存在配置快照中，因此使用快照时也需要调用一次
+        """
         log_level = self.log_level_map[self.log_level]
         consoleHandler.setLevel(log_level)
 
-        try:
-            from lanzou.api.utils import logger as lanzou_logger
-
-            # 将lanzou的日志也显示
-            lanzou_logger.setLevel(log_level)
-        except Exception:
-            pass
+        # 将lanzou的日志也显示
+        lanzou_logger.setLevel(log_level)
         if type(self.log_colors) is dict:
             for level, log_color in self.log_colors.items():
                 consoleLogFormatter.log_colors[level] = log_color
 
-        # 由于经常会有人填写成数字的列表，如[123, 456]，导致后面从各个dict中取值时出错（dict中都默认QQ为str类型，若传入int类型，会取不到对应的值）
-        # 所以这里做下兼容，强制转换为str
-        self.auto_send_card_target_qqs = [str(qq) for qq in self.auto_send_card_target_qqs]
-        self.sailiyam_visit_target_qqs = [str(qq) for qq in self.sailiyam_visit_target_qqs]
-
         url_config_filepath = get_url_config_path()
         if os.path.isfile(url_config_filepath):
             try:
@@ -975,6 +980,16 @@ def load_config(config_path="config.toml", local_config_path="config.toml.local"
         # 先重置
         g_config = Config()
 
+    # 仅在进程内首次加载时使用快照，后续的重新加载需要在现有配置（可能已在运行时修改过）的基础上更新
+    use_snapshot = not g_config.loaded and not is_run_in_github_action()
+    if use_snapshot:
+        sources = get_config_snapshot_sources(config_path, local_config_path)
+        snapshot_config = load_config_snapshot(sources)
+        if snapshot_config is not None:
+            g_config = snapshot_config
+            g_config.common.apply_runtime_settings()
+            return
+
     # 首先尝试读取config.toml（受版本管理系统控制）
     try:
         raw_config = toml.load(config_path)
@@ -1008,6 +1023,89 @@ def load_config(config_path="config.toml", local_config_path="config.toml.local"
     # 标记为已经初始化完毕
     g_config.loaded = True
 
+    if use_snapshot:
+        save_config_snapshot(sources, g_config)
+
+
+# 配置快照：完整解析后的Config会以pickle格式保存下来，配置文件未变动时直接读取，省去toml解析以及为各账号计算sDjcSign（RSA加密）等的耗时
+# 进程池中的子进程首次读取配置时也会命中该快照
+config_snapshot_path = os.path.join(cached_dir, "config.snapshot")
+# sDjcSign中包含生成时的时间戳，因此快照仅在一段时间内有效
+config_snapshot_ttl = 30 * 60
+config_snapshot_format = 1
+
+
+def get_config_snapshot_sources(config_path: str, local_config_path: str) -> List[Tuple[str, int, int, str]]:
+    """
+    快照所依赖的各个文件的 (路径, 修改时间, 大小, sha256)，任一文件变动（包括被创建或删除）都会使快照失效
+    除了配置文件外，还包括定义配置结构的本文件，避免代码变动后读取到旧结构的快照，以及会覆盖部分链接的url.toml
+    """
+    sources = []
+    for path in [config_path, local_config_path, __file__, get_url_config_path()]:
+        if path == "":
+            continue
+
+        if not os.path.isfile(path):
+            sources.append((path, 0, 0, ""))
+            continue
+
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        sources.append((path, stat.st_mtime_ns, stat.st_size, sha256))
+
+    return sources
+
+
+def load_config_snapshot(sources: List[Tuple[str, int, int, str]]) -> Optional[Config]:
+    if not os.path.isfile(config_snapshot_path):
+        return None
+
+    try:
+        with open(config_snapshot_path, 'rb') as f:
+            # 文件中依次保存了头部信息与配置，先校验头部，通过后再反序列化配置
+            header = pickle.load(f)
+            if header.get("format") != config_snapshot_format or header.get("version") != now_version or header.get("sources") != sources:
+                logger.debug("配置快照与当前配置文件不一致，将重新解析配置")
+                return None
+
+            age = time.time() - header.get("created_at", 0)
+            if age < 0 or age > config_snapshot_ttl:
+                logger.debug(f"配置快照已过期({age:.0f}秒)，将重新解析配置")
+                return None
+
+            cfg = pickle.load(f)
+    except Exception as e:
+        logger.debug("读取配置快照失败，将重新解析配置", exc_info=e)
+        return None
+
+    if not isinstance(cfg, Config):
+        return None
+
+    logger.debug(f"使用配置快照 {config_snapshot_path}，生成于{age:.0f}秒前")
+    return cfg
+
+
+def save_config_snapshot(sources: List[Tuple[str, int, int, str]], cfg: Config):
+    header = {
+        "format": config_snapshot_format,
+        "version": now_version,
+        "sources": sources,
+        "created_at": time.time(),
+    }
+
+    # 多个进程可能同时写入，先写到临时文件再替换，确保读取时不会读到写了一半的文件
+    tmp_path = f"{config_snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(cfg, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, config_snapshot_path)
+    except Exception as e:
+        logger.debug("保存配置快照失败", exc_info=e)
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+
 
 def gen_config_for_github_action():
     # 读取配置
@@ -1112,7 +1210,7 @@ def gen_config_for_github_action():
 
 
 def show_config_size(cfg: Config, ctx):
-    data_to_save = json.loads(json.dumps(to_raw_type(cfg)))
+    data_to_save = json.loads(to_json(cfg))
     toml_str = toml.dumps(data_to_save)
 
     show_file_content_info(ctx, toml_str)
@@ -1134,7 +1232,7 @@ def remove_unnecessary_configs(cfg, default_cfg):
 
 def save_config(cfg: Config, config_path="config.toml"):
     with open(config_path, 'w', encoding='utf-8') as save_file:
-        data_to_save = json.loads(json.dumps(to_raw_type(cfg)))
+        data_to_save = json.loads(to_json(cfg))
         toml.dump(data_to_save, save_file)
 
 
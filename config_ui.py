@@ -28,7 +28,7 @@ from network import process_result
 from qt_wrapper import *
 from setting import *
 from update import *
-from urls import Urls
+from urls import get_urls
 from usage_count import increase_counter
 from util import parse_scode, use_new_pay_method
 
@@ -2178,7 +2178,7 @@ class ArkLotteryConfigUi(QWidget):
 
     def get_ark_lottery_act_id(self) -> int:
         if is_new_version_ark_lottery():
-            return Urls().pesudo_ark_lottery_act_id
+            return get_urls().pesudo_ark_lottery_act_id
         else:
             return zzconfig().actid
 
@@ -3,12 +3,17 @@ from __future__ import annotations
 from datetime import datetime, timedelta
 from typing import List, Tuple, Type
 
-from data_struct import ConfigInterface, to_raw_type
+from data_struct import (AutoSlotsMeta, ConfigInterface, SlotsConfigInterface,
+                         fields_of, to_raw_type)
 
+# 这里的数据结构大多用于解析接口的回包，极速模式下各个进程中会同时存在大量实例，因此均使用自动生成的__slots__来保存字段，以减少内存占用
+
+
+class DaoObject(metaclass=AutoSlotsMeta):
+    __slots__ = ()
 
-class DaoObject:
     def __repr__(self):
-        return str(self.__dict__)
+        return str(fields_of(self))
 
 
 class GameInfo(DaoObject):
@@ -23,7 +28,7 @@ class GameInfo(DaoObject):
         return self.type == "1"
 
 
-class GameRoleInfo(ConfigInterface):
+class GameRoleInfo(SlotsConfigInterface):
     def __init__(self):
         self.sBizCode = "jx3"
         self.sOpenId = ""
@@ -34,7 +39,7 @@ class GameRoleInfo(ConfigInterface):
         return self.sRoleInfo.type == "1"
 
 
-class RoleInfo(ConfigInterface):
+class RoleInfo(SlotsConfigInterface):
     def __init__(self):
         # 端游
         self.accountId = "71672841"
@@ -75,13 +80,13 @@ class RoleInfo(ConfigInterface):
         return RoleInfo().auto_update_config(to_raw_type(self))
 
 
-class TemporaryChangeBindRoleInfo(ConfigInterface):
+class TemporaryChangeBindRoleInfo(SlotsConfigInterface):
     def __init__(self):
         self.roleCode = "71672841"
         self.serviceID = "11"
 
 
-class GoodsInfo(ConfigInterface):
+class GoodsInfo(SlotsConfigInterface):
     def __init__(self):
         self.type = "3"
         self.actId = "3"
@@ -109,7 +114,7 @@ class GoodsInfo(ConfigInterface):
         ]
 
 
-class GoodsValiDateInfo(ConfigInterface):
+class GoodsValiDateInfo(SlotsConfigInterface):
     def __init__(self):
         self.day = "永久"
         self.name = "曜-云鹰飞将"
@@ -154,7 +159,7 @@ class GoodsValiDateInfo(ConfigInterface):
         self.pinEnd = "0000-00-00 00:00:00"
 
 
-class GoodsCategoryInfo(ConfigInterface):
+class GoodsCategoryInfo(SlotsConfigInterface):
     def __init__(self):
         self.mainCategory = "170"
         self.subCategory = "0"
@@ -278,18 +283,19 @@ class XinYueItemInfo(DaoObject):
         self.used_refresh = used_refresh
 
 
-class XinYueTeamInfo(ConfigInterface):
+class XinYueTeamInfo(SlotsConfigInterface):
     def __init__(self):
         self.result = 0
         self.id = ""
         self.award_summary = "大大小|小中大"
         self.members = []  # type: List[XinYueTeamMember]
+        self.ttl_time = 0
 
     def is_team_full(self) -> bool:
         return len(self.members) == 2
 
 
-class XinYueTeamMember(ConfigInterface):
+class XinYueTeamMember(SlotsConfigInterface):
     def __init__(self):
         self.headurl = "http://thirdqq.qlogo.cn/g?b=oidb&k=KJKNiasFOwe0EGjTyHI7CLg&s=640&t=1556481203"
         self.nickname = "%E6%9C%88%E4%B9%8B%E7%8E%84%E6%AE%87"
@@ -299,7 +305,7 @@ class XinYueTeamMember(ConfigInterface):
         self.code = ""
 
 
-class SailiyamWorkInfo(ConfigInterface):
+class SailiyamWorkInfo(SlotsConfigInterface):
     def __init__(self):
         self.startTime = 0
         self.endTime = 0
@@ -309,7 +315,7 @@ class SailiyamWorkInfo(ConfigInterface):
         self.nowtime = 0
 
 
-class AmesvrCommonModRet(ConfigInterface):
+class AmesvrCommonModRet(SlotsConfigInterface):
     def __init__(self):
         self.iRet = "0"
         self.sMsg = "SUC"
@@ -327,7 +333,7 @@ def parse_amesvr_common_info(res) -> AmesvrCommonModRet:
     return AmesvrCommonModRet().auto_update_config(res["modRet"])
 
 
-class AmesvrUserBindInfo(ConfigInterface):
+class AmesvrUserBindInfo(SlotsConfigInterface):
     def __init__(self):
         self.Fid = "7179"
         self.Fuin = "1054073896"
@@ -349,7 +355,7 @@ class AmesvrUserBindInfo(ConfigInterface):
         self.sAmsSerial = "AMS-DNF-0922105129-ng2JeR-215651-558226"
 
 
-class AmesvrQueryRole(ConfigInterface):
+class AmesvrQueryRole(SlotsConfigInterface):
     def __init__(self):
         self.version = 'V1.0.20201105.20201105101730'
         self.retCode = '0'
@@ -362,7 +368,7 @@ class AmesvrQueryRole(ConfigInterface):
         self.checkstr = ''
 
 
-class RankUserInfo(ConfigInterface):
+class RankUserInfo(SlotsConfigInterface):
     def __init__(self):
         self.score = "10"
         self.sendScore = 0
@@ -370,7 +376,7 @@ class RankUserInfo(ConfigInterface):
         self.canGift = 0
 
 
-class DnfWarriorsCallInfo(ConfigInterface):
+class DnfWarriorsCallInfo(SlotsConfigInterface):
     def __init__(self):
         self.page = "index"
         self.userInfo = DnfWarriorsCallUserInfo()
@@ -381,7 +387,7 @@ class DnfWarriorsCallInfo(ConfigInterface):
         self.isMobile = False
 
 
-class DnfWarriorsCallUserInfo(ConfigInterface):
+class DnfWarriorsCallUserInfo(SlotsConfigInterface):
     def __init__(self):
         self.nick = "小号一号"
         self.avatar = "//qlogo3.store.qq.com/qzone/3036079506/3036079506/100"
@@ -395,7 +401,7 @@ class DnfWarriorsCallUserInfo(ConfigInterface):
         self.year = 0
 
 
-class DnfWarriorsCallZZ(ConfigInterface):
+class DnfWarriorsCallZZ(SlotsConfigInterface):
     def __init__(self):
         self.title = "QQ会员阿拉德勇士征集令"
         self.desc = "阿拉德勇士征集令，瓜分大额Q币、现金大奖！"
@@ -418,7 +424,7 @@ class DnfWarriorsCallZZ(ConfigInterface):
         self.actbossRule = DnfWarriorsCallZZBossRule()
 
 
-class DnfWarriorsCallZZBossZige(ConfigInterface):
+class DnfWarriorsCallZZBossZige(SlotsConfigInterface):
     def __init__(self):
         self.registerPackage = 117926
         self.buyVip = 117928
@@ -444,7 +450,7 @@ class DnfWarriorsCallZZBossZige(ConfigInterface):
         self.score = 117942
 
 
-class DnfWarriorsCallZZBossRule(ConfigInterface):
+class DnfWarriorsCallZZBossRule(SlotsConfigInterface):
     def __init__(self):
         self.registerPackage = 28172
         self.iosPay = "28158"
@@ -474,7 +480,7 @@ class DnfWarriorsCallZZBossRule(ConfigInterface):
         self.share2 = 28173
 
 
-class DnfWarriorsCallBoss(ConfigInterface):
+class DnfWarriorsCallBoss(SlotsConfigInterface):
     def __init__(self):
         self.left = {
             "117925": 0,
@@ -488,7 +494,7 @@ class DnfWarriorsCallBoss(ConfigInterface):
         }
 
 
-class QzoneActivityResponse(ConfigInterface):
+class QzoneActivityResponse(SlotsConfigInterface):
     def __init__(self):
         self.code = -10000
         self.subcode = -1
@@ -498,7 +504,7 @@ class QzoneActivityResponse(ConfigInterface):
         self.tips = "6871-284"
 
 
-class DnfHelperChronicleExchangeList(ConfigInterface):
+class DnfHelperChronicleExchangeList(SlotsConfigInterface):
     def __init__(self):
         self.code = 200
         self.exp = 0
@@ -513,7 +519,7 @@ class DnfHelperChronicleExchangeList(ConfigInterface):
         ]
 
 
-class DnfHelperChronicleExchangeGiftInfo(ConfigInterface):
+class DnfHelperChronicleExchangeGiftInfo(SlotsConfigInterface):
     def __init__(self):
         self.sIdentifyId = ""
         self.sName = "一次性材质转换器"
@@ -526,7 +532,7 @@ class DnfHelperChronicleExchangeGiftInfo(ConfigInterface):
         self.usedNum = 0
 
 
-class DnfHelperChronicleBasicAwardList(ConfigInterface):
+class DnfHelperChronicleBasicAwardList(SlotsConfigInterface):
     def __init__(self):
         self.basic1List = []  # type: List[DnfHelperChronicleBasicAwardInfo]
         self.basic2List = []  # type: List[DnfHelperChronicleBasicAwardInfo]
@@ -541,7 +547,7 @@ class DnfHelperChronicleBasicAwardList(ConfigInterface):
         ]
 
 
-class DnfHelperChronicleBasicAwardInfo(ConfigInterface):
+class DnfHelperChronicleBasicAwardInfo(SlotsConfigInterface):
     def __init__(self):
         self.sIdentifyId = ""
         self.giftName = "时间的引导石10个礼盒"
@@ -554,7 +560,7 @@ class DnfHelperChronicleBasicAwardInfo(ConfigInterface):
         self.sLbCode = "basic_0001"
 
 
-class DnfHelperChronicleLotteryList(ConfigInterface):
+class DnfHelperChronicleLotteryList(SlotsConfigInterface):
     def __init__(self):
         self.code = 200
         self.gifts = []  # type: List[DnfHelperChronicleLotteryGiftInfo]
@@ -566,7 +572,7 @@ class DnfHelperChronicleLotteryList(ConfigInterface):
         ]
 
 
-class DnfHelperChronicleLotteryGiftInfo(ConfigInterface):
+class DnfHelperChronicleLotteryGiftInfo(SlotsConfigInterface):
     def __init__(self):
         self.sIdentifyId = ""
         self.sName = "+8 装备增幅券*1"
@@ -578,7 +584,7 @@ class DnfHelperChronicleLotteryGiftInfo(ConfigInterface):
         self.iAction = "1"
 
 
-class DnfHelperChronicleUserActivityTopInfo(ConfigInterface):
+class DnfHelperChronicleUserActivityTopInfo(SlotsConfigInterface):
     def __init__(self):
         self.des = "十二月 · 卡恩"
         self.bImage = "https://mcdn.gtimg.com/bbcdn/dnf/Scoretheme/sPic2/icons/20201130165539.png?version=5540"
@@ -605,7 +611,7 @@ class DnfHelperChronicleUserActivityTopInfo(ConfigInterface):
         return self.level == 30
 
 
-class DnfHelperChronicleUserTaskList(ConfigInterface):
+class DnfHelperChronicleUserTaskList(SlotsConfigInterface):
     def __init__(self):
         self.pUserId = ""
         self.mIcon = "http://q.qlogo.cn/qqapp/1104466820/0E82A1DBAE746043CF3AEF95EC39FC2B/100"
@@ -619,7 +625,7 @@ class DnfHelperChronicleUserTaskList(ConfigInterface):
         ]
 
 
-class DnfHelperChronicleUserTaskInfo(ConfigInterface):
+class DnfHelperChronicleUserTaskInfo(SlotsConfigInterface):
     def __init__(self):
         self.mActionId = "001"
         self.name = "DNF助手签到"
@@ -631,7 +637,7 @@ class DnfHelperChronicleUserTaskInfo(ConfigInterface):
         self.pStatus = 0
 
 
-class DnfHelperChronicleSignList(ConfigInterface):
+class DnfHelperChronicleSignList(SlotsConfigInterface):
     def __init__(self):
         self.code = 200
         self.gifts = []  # type: List[DnfHelperChronicleSignGiftInfo]
@@ -643,7 +649,7 @@ class DnfHelperChronicleSignList(ConfigInterface):
         ]
 
 
-class DnfHelperChronicleSignGiftInfo(ConfigInterface):
+class DnfHelperChronicleSignGiftInfo(SlotsConfigInterface):
     def __init__(self):
         self.sIdentifyId = ""
         self.sName = "时间引导石礼盒 (5个)"
@@ -656,7 +662,7 @@ class DnfHelperChronicleSignGiftInfo(ConfigInterface):
         self.iLbSel = "1"
 
 
-class HelloVoiceDnfRoleInfo(ConfigInterface):
+class HelloVoiceDnfRoleInfo(SlotsConfigInterface):
     def __init__(self):
         self.area = "11"
         self.areaName = "浙江一区"
@@ -665,7 +671,7 @@ class HelloVoiceDnfRoleInfo(ConfigInterface):
         self.qq = "1054073896"
 
 
-class XinyueFinancingInfo(ConfigInterface):
+class XinyueFinancingInfo(SlotsConfigInterface):
     def __init__(self):
         self.name = "体验版周卡"
         self.buy = False
@@ -674,7 +680,7 @@ class XinyueFinancingInfo(ConfigInterface):
         self.endTime = ""
 
 
-class MajieluoShareInfo(ConfigInterface):
+class MajieluoShareInfo(SlotsConfigInterface):
     def __init__(self):
         self.iInvitee = "386596804"
         self.iShareLottery = "0"
@@ -682,7 +688,7 @@ class MajieluoShareInfo(ConfigInterface):
         self.iAssistLottery = "0"
 
 
-class DnfSpringInfo(ConfigInterface):
+class DnfSpringInfo(SlotsConfigInterface):
     def __init__(self):
         # 1月21日9:00至2月20日23:59充值DNF的金额
         self.recharge_money = 0
@@ -696,7 +702,7 @@ class DnfSpringInfo(ConfigInterface):
         self.total_take_fudai = 0
 
 
-class Dnf0121Info(ConfigInterface):
+class Dnf0121Info(SlotsConfigInterface):
     def __init__(self):
         self.sItemIds = []
         self.lottery_times = 0
@@ -705,7 +711,7 @@ class Dnf0121Info(ConfigInterface):
         self.hasTakeLogin = False
 
 
-class SpringFuDaiInfo(ConfigInterface):
+class SpringFuDaiInfo(SlotsConfigInterface):
     def __init__(self):
         # 今日是否已打开过福袋
         self.today_has_take_fudai = False
@@ -725,7 +731,7 @@ class SpringFuDaiInfo(ConfigInterface):
         self.date_info = 0
 
 
-class AmesvrSigninInfo(ConfigInterface):
+class AmesvrSigninInfo(SlotsConfigInterface):
     def __init__(self):
         self.nick_name = "1054073896"
         self.uin = "1054073896"
@@ -737,7 +743,7 @@ class AmesvrSigninInfo(ConfigInterface):
         self.iRet = "0"
 
 
-class AmesvrQueryFriendsInfo(ConfigInterface):
+class AmesvrQueryFriendsInfo(SlotsConfigInterface):
     def __init__(self):
         self.sMsg = "ok"
         self.iRet = 0
@@ -753,7 +759,7 @@ class AmesvrQueryFriendsInfo(ConfigInterface):
         ]
 
 
-class AmesvrFriendInfo(ConfigInterface):
+class AmesvrFriendInfo(SlotsConfigInterface):
     def __init__(self):
         self.uin = 56885028
         self.nick = "追风"
@@ -768,7 +774,7 @@ class GuanhuaiActInfo(DaoObject):
         self.ruleid = ruleid
 
 
-class BuyInfo(ConfigInterface):
+class BuyInfo(SlotsConfigInterface):
     def __init__(self):
         self.qq = ""
         self.game_qqs = []
@@ -881,7 +887,7 @@ class BuyInfo(ConfigInterface):
         return self.buy_records
 
 
-class BuyRecord(ConfigInterface):
+class BuyRecord(SlotsConfigInterface):
     def __init__(self):
         self.buy_month = 1
         self.buy_at = "2020-02-06 12:30:15"
@@ -891,20 +897,20 @@ class BuyRecord(ConfigInterface):
         return self.reason.startswith("自动更新DLC赠送")
 
 
-class OrderInfo(ConfigInterface):
+class OrderInfo(SlotsConfigInterface):
     def __init__(self):
         self.qq = "1234567"
         self.game_qqs = []
         self.buy_month = 1
 
 
-class CardSecret(ConfigInterface):
+class CardSecret(SlotsConfigInterface):
     def __init__(self):
         self.card = "auto_update-20210310174054-00001"
         self.secret = "cUtsSx0CwVF1p1VurbKuiI4WHQuKP3uz"
 
 
-class CardSecretUseDetail(ConfigInterface):
+class CardSecretUseDetail(SlotsConfigInterface):
     def __init__(self):
         self.card_secret = CardSecret()  # 卡密信息
         self.qq = ""  # 使用QQ
@@ -912,7 +918,7 @@ class CardSecretUseDetail(ConfigInterface):
         self.use_at = "2020-03-13 12:30:15"  # 使用时间点
 
 
-class AmsActInfo(ConfigInterface):
+class AmsActInfo(SlotsConfigInterface):
     def __init__(self):
         self.iActivityId = "354870"
         self.sActivityName = "马杰洛的关怀第三期活动"
@@ -950,7 +956,7 @@ class AmsActInfo(ConfigInterface):
         return format_time(parse_time(self.dtEndTime), "%Y%m%d") == get_today()
 
 
-class AmsActFlowInfo(ConfigInterface):
+class AmsActFlowInfo(SlotsConfigInterface):
     def __init__(self):
         self.sFlowName = "输出项"
         self.iNeedLogin = "1"
@@ -963,7 +969,7 @@ class AmsActFlowInfo(ConfigInterface):
         self.functions = []
 
 
-class XinyueWeeklyGiftInfo(ConfigInterface):
+class XinyueWeeklyGiftInfo(SlotsConfigInterface):
     def __init__(self):
         self.qq = "123456"
         self.iLevel = 4
@@ -972,13 +978,13 @@ class XinyueWeeklyGiftInfo(ConfigInterface):
         self.gift_got_list = ["1", "1", "1", "1", "0", "0", "0"]
 
 
-class XinyueWeeklyGPointsInfo(ConfigInterface):
+class XinyueWeeklyGPointsInfo(SlotsConfigInterface):
     def __init__(self):
         self.nickname = "风之凌殇"
         self.gpoints = 6666
 
 
-class XinyueCatUserInfo(ConfigInterface):
+class XinyueCatUserInfo(SlotsConfigInterface):
     def __init__(self):
         self.name = "风之凌殇"
         self.account = "12345678"
@@ -987,13 +993,13 @@ class XinyueCatUserInfo(ConfigInterface):
         self.has_cat = False
 
 
-class XinyueCatInfo(ConfigInterface):
+class XinyueCatInfo(SlotsConfigInterface):
     def __init__(self):
         self.fighting_capacity = 233
         self.yuanqi = 100
 
 
-class XinyueCatInfoFromApp(ConfigInterface):
+class XinyueCatInfoFromApp(SlotsConfigInterface):
     def __init__(self):
         self.id = "12345"
         self.user_id = "1234567"
@@ -1014,7 +1020,7 @@ class XinyueCatInfoFromApp(ConfigInterface):
         self.sendP = 0
 
 
-class XinyueCatMatchResult(ConfigInterface):
+class XinyueCatMatchResult(SlotsConfigInterface):
     def __init__(self):
         self.iRet = 0
         self.result = 1
@@ -1026,7 +1032,7 @@ class XinyueCatMatchResult(ConfigInterface):
         self.matchVitality = 300
 
 
-class DnfCollectionInfo(ConfigInterface):
+class DnfCollectionInfo(SlotsConfigInterface):
     def __init__(self):
         self.has_init = False
         self.luckyCount = 0
@@ -1036,19 +1042,19 @@ class DnfCollectionInfo(ConfigInterface):
         self.total_page = 0
 
 
-class DnfHeiyaInfo(ConfigInterface):
+class DnfHeiyaInfo(SlotsConfigInterface):
     def __init__(self):
         self.lottery_count = 0
         self.box_score = 0
 
 
-class DnfHelperInfo(ConfigInterface):
+class DnfHelperInfo(SlotsConfigInterface):
     def __init__(self):
         self.unlocked_maps = set()
         self.remaining_play_times = 0
 
 
-class DnfHelperGameInfo(ConfigInterface):
+class DnfHelperGameInfo(SlotsConfigInterface):
     def __init__(self):
         self.shareeuin = "f566PsFtrpanByrpzzhpcc6TLZ80qf83r8mY3GcjsQWLgAoBSWrj"
         self.shareenickname = "41c1-JYm0PG0NvcdHzyR_DkOqUrgaKW61rCo8VI4AlJ3RMPDRmxZw9C9c_eHt-ol5tqASsiNfuW6Dffq7QFgjcWxKmPO9GovbtfZ46dxAw3Ln1lDWNAvmvolFcl-CZ7oNVLmivPVL7bY8spbjJEhNI0"
@@ -1068,7 +1074,7 @@ class DnfHelperGameInfo(ConfigInterface):
         self.bindLastTime = 0
 
 
-class GuanjiaNewRequest(ConfigInterface):
+class GuanjiaNewRequest(SlotsConfigInterface):
     def __init__(self):
         self.aid = "2021061115132511816"
         self.bid = "2021061115132511816"
@@ -1094,7 +1100,7 @@ class GuanjiaNewRequest(ConfigInterface):
         self.pageSize = 1000
 
 
-class GuanjiaNewQueryLotteryInfo(ConfigInterface):
+class GuanjiaNewQueryLotteryInfo(SlotsConfigInterface):
     def __init__(self):
         self.success = 0
         self.message = ""
@@ -1107,7 +1113,7 @@ class GuanjiaNewQueryLotteryInfo(ConfigInterface):
         ]
 
 
-class GuanjiaNewQueryLotteryResult(ConfigInterface):
+class GuanjiaNewQueryLotteryResult(SlotsConfigInterface):
     def __init__(self):
         self.expireTime = ""
         self.string5 = ""
@@ -1145,14 +1151,14 @@ class GuanjiaNewQueryLotteryResult(ConfigInterface):
         return self.issueTime != ""
 
 
-class GuanjiaNewLotteryResult(ConfigInterface):
+class GuanjiaNewLotteryResult(SlotsConfigInterface):
     def __init__(self):
         self.success = 0
         self.message = ""
         self.data = GuanjiaNewLotteryResultData()
 
 
-class GuanjiaNewLotteryResultData(ConfigInterface):
+class GuanjiaNewLotteryResultData(SlotsConfigInterface):
     def __init__(self):
         self.expireTime = ""
         self.string5 = ""
@@ -1179,7 +1185,7 @@ class GuanjiaNewLotteryResultData(ConfigInterface):
         self.comment = "抗疲劳秘药(5点)（LV80-100)*1"
 
 
-class ColgBattlePassInfo(ConfigInterface):
+class ColgBattlePassInfo(SlotsConfigInterface):
     def __init__(self):
         self.activity_id = '4'
         self.lv_score = 0
@@ -1202,7 +1208,7 @@ class ColgBattlePassInfo(ConfigInterface):
         return untaken_rewards
 
 
-class ColgBattlePassTaskInfo(ConfigInterface):
+class ColgBattlePassTaskInfo(SlotsConfigInterface):
     def __init__(self):
         self.id = "96"
         self.task_name = "登入论坛"
@@ -1221,7 +1227,7 @@ class ColgBattlePassTaskInfo(ConfigInterface):
         self.is_highlight = "0"
 
 
-class ColgBattlePassRewardInfo(ConfigInterface):
+class ColgBattlePassRewardInfo(SlotsConfigInterface):
     def __init__(self):
         self.lv = "51"
         self.reward_img = "https://img-cos.colg.cn/uploads/images/202106/202106091826325699.png/ori_png"
@@ -1235,14 +1241,14 @@ class ColgBattlePassRewardInfo(ConfigInterface):
         self.sort_id = 12
 
 
-class ResponseInfo(ConfigInterface):
+class ResponseInfo(SlotsConfigInterface):
     def __init__(self):
         self.status_code = 200
         self.reason = "ok"
         self.text = ""
 
 
-class XiaojiangyouInfo(ConfigInterface):
+class XiaojiangyouInfo(SlotsConfigInterface):
     def __init__(self):
         self.source = "xy_games"
         self.user_id = "1054073896"
@@ -1261,20 +1267,20 @@ class XiaojiangyouInfo(ConfigInterface):
         }
 
 
-class XiaojiangyouInterveneMsg(ConfigInterface):
+class XiaojiangyouInterveneMsg(SlotsConfigInterface):
     def __init__(self):
         self.answer = []
         self.option = []
 
 
-class XiaojiangyouUserInfo(ConfigInterface):
+class XiaojiangyouUserInfo(SlotsConfigInterface):
     def __init__(self):
         self.headimgurl = ""
         self.nickname = ""
         self.level = 0
 
 
-class XiaojiangyouRoleInfo(ConfigInterface):
+class XiaojiangyouRoleInfo(SlotsConfigInterface):
     def __init__(self):
         self.source = "xy_games"
         self.game_id = "1"
@@ -1288,13 +1294,13 @@ class XiaojiangyouRoleInfo(ConfigInterface):
         self.acctype = ""
 
 
-class XiaojiangyouUserProfile(ConfigInterface):
+class XiaojiangyouUserProfile(SlotsConfigInterface):
     def __init__(self):
         self.robot_use_status = 1
         self.wx_img = ""
 
 
-class XiaojiangyouPackageInfo(ConfigInterface):
+class XiaojiangyouPackageInfo(SlotsConfigInterface):
     def __init__(self):
         self.ams_id = "IEGAMS-369679-398942"
         self.package_group_id = "1550778"
@@ -1303,7 +1309,7 @@ class XiaojiangyouPackageInfo(ConfigInterface):
         self.token = "0c316d84b848b72985eade54a57d1c31"
 
 
-class NewArkLotteryLotteryCountInfo(ConfigInterface):
+class NewArkLotteryLotteryCountInfo(SlotsConfigInterface):
     def __init__(self):
         self.ID = 6792
         self.name = "消耗"
@@ -1316,13 +1322,13 @@ class NewArkLotteryLotteryCountInfo(ConfigInterface):
         self.enough = False
 
 
-class NewArkLotteryCardCountInfo(ConfigInterface):
+class NewArkLotteryCardCountInfo(SlotsConfigInterface):
     def __init__(self):
         self.id = "1"
         self.num = 0
 
 
-class NewArkLotterySendCardResult(ConfigInterface):
+class NewArkLotterySendCardResult(SlotsConfigInterface):
     def __init__(self):
         self.code = 0
         self.message = "succ"
@@ -1332,13 +1338,13 @@ class NewArkLotterySendCardResult(ConfigInterface):
         return self.code == 0 and self.data.code == 0
 
 
-class NewArkLotterySendCardResultData(ConfigInterface):
+class NewArkLotterySendCardResultData(SlotsConfigInterface):
     def __init__(self):
         self.code = 0
         self.message = ""
 
 
-class DnfHelperQueryInfo(ConfigInterface):
+class DnfHelperQueryInfo(SlotsConfigInterface):
     def __init__(self):
         self.hasfinish = 0
         self.taskId = 797903
@@ -1347,7 +1353,7 @@ class DnfHelperQueryInfo(ConfigInterface):
         self.todayhastask = 0
 
 
-class HuyaActTaskInfo(ConfigInterface):
+class HuyaActTaskInfo(SlotsConfigInterface):
     def __init__(self):
         self.taskId = 16234
         self.actId = 4210
@@ -1367,7 +1373,7 @@ class HuyaActTaskInfo(ConfigInterface):
         self.prizeList = []
 
 
-class HuyaUserTaskInfo(ConfigInterface):
+class HuyaUserTaskInfo(SlotsConfigInterface):
     def __init__(self):
         self.taskId = 16234
         self.actId = 4210
@@ -1378,7 +1384,7 @@ class HuyaUserTaskInfo(ConfigInterface):
         self.prizeCount = 0
 
 
-class GuanJiaUserInfo(ConfigInterface):
+class GuanJiaUserInfo(SlotsConfigInterface):
     def __init__(self):
         self.province = ""
         self.city = ""
@@ -1390,7 +1396,7 @@ class GuanJiaUserInfo(ConfigInterface):
         self.key = "XXXXXX"
 
 
-class XinYueTeamAwardInfo(ConfigInterface):
+class XinYueTeamAwardInfo(SlotsConfigInterface):
     def __init__(self):
         self.dtGetPackageTime = "2021-10-29 21:32:38"
         self.iBroadcastFlag = "0"
@@ -1424,36 +1430,36 @@ class XinYueTeamAwardInfo(ConfigInterface):
         self.sUin = ""
 
 
-class XinYueTeamGroupInfo(ConfigInterface):
+class XinYueTeamGroupInfo(SlotsConfigInterface):
     def __init__(self):
         self.team_name = ""
         self.is_local = True
 
 
-class XinYueMatchServerAddTeamRequest(ConfigInterface):
+class XinYueMatchServerAddTeamRequest(SlotsConfigInterface):
     def __init__(self):
         self.leader_qq = ""
         self.team_id = ""
 
 
-class XinYueMatchServerCommonResponse(ConfigInterface):
+class XinYueMatchServerCommonResponse(SlotsConfigInterface):
     def __init__(self):
         self.code = 0
         self.message = ""
         self.data = None
 
 
-class XinYueMatchServerRequestTeamRequest(ConfigInterface):
+class XinYueMatchServerRequestTeamRequest(SlotsConfigInterface):
     def __init__(self):
         self.request_qq = ""
 
 
-class XinYueMatchServerRequestTeamResponse(ConfigInterface):
+class XinYueMatchServerRequestTeamResponse(SlotsConfigInterface):
     def __init__(self):
         self.team_id = ""
 
 
-class CreateWorkListInfo(ConfigInterface):
+class CreateWorkListInfo(SlotsConfigInterface):
     def __init__(self):
         self.total = "0"
         self.list = []  # type: List[CreateWorkInfo]
@@ -1464,7 +1470,7 @@ class CreateWorkListInfo(ConfigInterface):
         ]
 
 
-class CreateWorkInfo(ConfigInterface):
+class CreateWorkInfo(SlotsConfigInterface):
     def __init__(self):
         self.iInfoId = 1774933
         self.tglAuthorID = 2190051
@@ -1522,31 +1528,87 @@ class CreateWorkInfo(ConfigInterface):
         self.iPraiseNum = "528"
 
 
+def benchmark_memory(response_count=20, item_count=100):
+    """
+    对比字段保存在__dict__与自动生成的__slots__中时，解析接口回包后每个回包的内存占用
+    用法：python dao.py benchmark_memory
+    """
+    import tracemalloc
+    import types
+
+    def dict_backed(cls: type, item_types: dict) -> type:
+        # 构造一个字段相同但是保存在__dict__中的版本，用于对比
+        namespace = {key: val for key, val in cls.__dict__.items() if key not in ["__slots__", "__dict__", "__weakref__"] and not isinstance(val, types.MemberDescriptorType)}
+        namespace["fields_to_fill"] = lambda self: [(name, item_types.get(field_type, field_type)) for name, field_type in cls.fields_to_fill(self)]
+        return type(cls.__name__, (ConfigInterface,), namespace)
+
+    def make_raw(list_cls: type, item_cls: type, field: str) -> dict:
+        items = []
+        for idx in range(item_count):
+            item = to_raw_type(item_cls())
+            for key, val in item.items():
+                if isinstance(val, str):
+                    item[key] = f"{val}{idx}"
+            items.append(item)
+
+        raw = to_raw_type(list_cls())
+        raw[field] = items
+        return raw
+
+    def measure(cls: type, raw: dict) -> float:
+        # 预先解析一次，避免将解码器的缓存计入
+        cls().auto_update_config(raw)
+
+        tracemalloc.start()
+        responses = [cls().auto_update_config(raw) for _ in range(response_count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        assert len(responses) == response_count
+        return size / response_count
+
+    for list_cls, item_cls, field in [
+        (DnfHelperChronicleExchangeList, DnfHelperChronicleExchangeGiftInfo, "gifts"),
+        (DnfHelperChronicleUserTaskList, DnfHelperChronicleUserTaskInfo, "taskList"),
+        (AmesvrQueryFriendsInfo, AmesvrFriendInfo, "list"),
+    ]:
+        raw = make_raw(list_cls, item_cls, field)
+        dict_list_cls = dict_backed(list_cls, {item_cls: dict_backed(item_cls, {})})
+
+        slots_size, dict_size = measure(list_cls, raw), measure(dict_list_cls, raw)
+        print(f"{list_cls.__name__}({item_count}条): __dict__ {dict_size / 1024:.1f}KB/回包 __slots__ {slots_size / 1024:.1f}KB/回包 节省 {1 - slots_size / dict_size:.1%}")
+
+
 if __name__ == '__main__':
-    from util import format_time, parse_time
-
-    a = BuyInfo()
-    a.qq = "11"
-    a.game_qqs = ["12", "13"]
-    a.total_buy_month = 3
-    a.buy_records = [
-        BuyRecord().auto_update_config({"buy_at": "2020-02-06 12:30:15"}),
-        BuyRecord().auto_update_config({"buy_at": "2021-02-08 12:30:15", "buy_month": 2}),
-    ]
-    a.expire_at = format_time(parse_time("2020-02-06 12:30:15") + timedelta(days=31 * 3))
-
-    b = BuyInfo()
-    b.qq = "11"
-    b.game_qqs = ["12", "14"]
-    b.total_buy_month = 2
-    b.buy_records = [
-        BuyRecord().auto_update_config({"buy_at": "2020-02-06 12:30:15"}),
-        BuyRecord().auto_update_config({"buy_at": "2021-02-08 12:30:15"}),
-    ]
-    b.expire_at = format_time(parse_time("2020-02-06 12:30:15") + timedelta(days=31 * 2))
-
-    print(a)
-    print(b)
-
-    a.merge(b)
-    print(a)
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "benchmark_memory":
+        benchmark_memory()
+    else:
+        from util import format_time, parse_time
+
+        a = BuyInfo()
+        a.qq = "11"
+        a.game_qqs = ["12", "13"]
+        a.total_buy_month = 3
+        a.buy_records = [
+            BuyRecord().auto_update_config({"buy_at": "2020-02-06 12:30:15"}),
+            BuyRecord().auto_update_config({"buy_at": "2021-02-08 12:30:15", "buy_month": 2}),
+        ]
+        a.expire_at = format_time(parse_time("2020-02-06 12:30:15") + timedelta(days=31 * 3))
+
+        b = BuyInfo()
+        b.qq = "11"
+        b.game_qqs = ["12", "14"]
+        b.total_buy_month = 2
+        b.buy_records = [
+            BuyRecord().auto_update_config({"buy_at": "2020-02-06 12:30:15"}),
+            BuyRecord().auto_update_config({"buy_at": "2021-02-08 12:30:15"}),
+        ]
+        b.expire_at = format_time(parse_time("2020-02-06 12:30:15") + timedelta(days=31 * 2))
+
+        print(a)
+        print(b)
+
+        a.merge(b)
+        print(a)
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import dis
 import json
 from abc import ABCMeta
 from typing import Dict, List, Tuple, Type
 
-from Crypto.Cipher import AES
-
 from log import logger
 
+try:
+    # 可选依赖，安装后序列化时使用orjson，速度更快
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class Object:
     def __init__(self, fromDict=None):
@@ -29,15 +34,21 @@ class AESCipher:
     def encrypt(self, raw):
         raw = self.pad(raw)
         # 通过key值，使用ECB模式进行加密
-        cipher = AES.new(self.key, AES.MODE_ECB)
+        cipher = self.new_cipher()
         # 返回得到加密后的字符串
         return cipher.encrypt(raw.encode())
 
     def decrypt(self, enc):
         # 通过key值，使用ECB模式进行解密
-        cipher = AES.new(self.key, AES.MODE_ECB)
+        cipher = self.new_cipher()
         return self.unpad(cipher.decrypt(enc)).decode('utf8')
 
+    def new_cipher(self):
+        # Crypto导入耗时较长，仅在实际需要加解密时才导入
+        from Crypto.Cipher import AES
+
+        return AES.new(self.key, AES.MODE_ECB)
+
     # Padding for the input string --not related to encryption itself.
     def pad(self, s):
         return s + (self.BLOCK_SIZE - len(s) % self.BLOCK_SIZE) * chr(self.BLOCK_SIZE - len(s) % self.BLOCK_SIZE)
@@ -46,19 +57,133 @@ class AESCipher:
         return s[:-ord(s[len(s) - 1:])]
 
 
+class AutoSlotsMeta(ABCMeta):
+    """
+    根据类中各个方法里 self.xxx = ... 形式的赋值自动生成__slots__，实例不再各自持有一个__dict__，同时存在大量实例时可显著减少内存占用
+    注意：在类外部或者嵌套函数中才赋值的字段无法被识别，需要先在__init__中声明，否则赋值时会抛出AttributeError
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        if "__slots__" not in namespace:
+            namespace["__slots__"] = generate_slots(bases, namespace)
+
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+def generate_slots(bases: tuple, namespace: dict) -> Tuple[str, ...]:
+    inherited_slots = set()
+    has_dict = False
+    for base in bases:
+        has_dict = has_dict or base.__dictoffset__ != 0
+        for klass in base.__mro__:
+            slots = klass.__dict__.get("__slots__", ())
+            inherited_slots.update([slots] if isinstance(slots, str) else slots)
+
+    # 先处理__init__，使得字段的顺序与原先__dict__中的顺序一致
+    funcs = [namespace.get("__init__")]
+    for val in namespace.values():
+        if isinstance(val, property):
+            funcs.extend([val.fget, val.fset, val.fdel])
+        else:
+            funcs.append(val)
+
+    slots = []
+    shadow_class_attr = False
+    for func in funcs:
+        for attr in assigned_attrs(func):
+            if attr in inherited_slots or attr in slots:
+                continue
+            if attr in namespace or any(hasattr(base, attr) for base in bases):
+                # 实例字段覆盖了同名的类属性，slot会与类属性冲突，这种情况下只能保留__dict__
+                shadow_class_attr = True
+                continue
+
+            slots.append(attr)
+
+    if shadow_class_attr and not has_dict:
+        slots.append("__dict__")
+
+    return tuple(slots)
+
+
+_store_attr_op = dis.opmap["STORE_ATTR"]
+_extended_arg_op = dis.opmap["EXTENDED_ARG"]
+_cache_op = dis.opmap.get("CACHE", -1)
+# 加载局部变量的各个指令，高版本中还会有一次加载两个变量的合并指令，此时参数的低4位为后加载的变量
+_load_fast_ops = {op for name, op in dis.opmap.items() if name.startswith("LOAD_FAST") and name.count("LOAD_FAST") == 1}
+_load_fast_pair_ops = {op for name, op in dis.opmap.items() if name.count("LOAD_FAST") == 2}
+
+
+def assigned_attrs(func) -> List[str]:
+    """函数中对第一个参数（即self）的各个字段赋值的字段名，按首次出现的顺序排列"""
+    code = getattr(func, "__code__", None)
+    if code is None or code.co_argcount == 0:
+        return []
+
+    # 直接扫描字节码，而不是使用dis.get_instructions，后者会为每条指令构造对象，在导入大量配置类时耗时明显
+    # self.xxx = val 编译为 加载val -> 加载self -> STORE_ATTR xxx，其中self为第0个局部变量
+    attrs = []
+    prev_loads_self = False
+    ext_arg = 0
+    raw = code.co_code
+    for i in range(0, len(raw), 2):
+        op = raw[i]
+        if op == _cache_op:
+            continue
+
+        arg = raw[i + 1] | ext_arg
+        if op == _extended_arg_op:
+            ext_arg = arg << 8
+            continue
+        ext_arg = 0
+
+        if op == _store_attr_op and prev_loads_self:
+            attr = code.co_names[arg]
+            if attr not in attrs:
+                attrs.append(attr)
+
+        if op in _load_fast_ops:
+            prev_loads_self = arg == 0
+        elif op in _load_fast_pair_ops:
+            prev_loads_self = (arg & 15) == 0
+        else:
+            prev_loads_self = False
+
+    return attrs
+
+
 # 如果配置的值是dict，可以用ConfigInterface自行实现对应结构，将会自动解析
-# 如果配置的值是list/set/tuple，则需要实现ConfigInterface，同时重写auto_update_config，在调用过基类的该函数后，再自行处理这三类结果
+# 如果配置的值是list/set/tuple，则需要实现ConfigInterface，同时重写fields_to_fill/dict_fields_to_fill，基类会自动解析为对应结构
+# 注意：fields_to_fill/dict_fields_to_fill的结果会按类缓存，因此不能依赖于实例的状态
 class ConfigInterface(metaclass=ABCMeta):
+    # 本身不持有字段，使得SlotsConfigInterface的子类可以不需要__dict__，其他子类仍会自动拥有__dict__
+    __slots__ = ()
+
     def auto_update_config(self, raw_config: dict):
         if type(raw_config) is not dict:
             logger.warning(f"raw_config={raw_config} is not dict")
-        else:
+            return self.auto_update_config_reflectively(raw_config)
+
+        get_decoder(self).decode(self, raw_config)
+
+        # 调用可能存在的回调
+        self.on_config_update(raw_config)
+
+        # 最终返回自己，方便链式调用
+        return self
+
+    def auto_update_config_reflectively(self, raw_config: dict):
+        """
+        逐个字段通过反射解析的原始实现，auto_update_config在解析dict时会使用按类缓存的解码器，结果与本函数一致
+        目前仅在raw_config不是dict时使用，同时用于对比测试
+        """
+        if type(raw_config) is dict:
             for key, val in raw_config.items():
                 if hasattr(self, key):
                     attr = getattr(self, key)
                     if isinstance(attr, ConfigInterface):
                         config_field = attr  # type: ConfigInterface
-                        config_field.auto_update_config(val)
+                        config_field.auto_update_config_reflectively(val)
                     else:
                         setattr(self, key, val)
 
@@ -86,9 +211,9 @@ class ConfigInterface(metaclass=ABCMeta):
 
         return self.auto_update_config(raw_config)
 
-    def save_to_json_file(self, filepath: str, ensure_ascii=False, indent=2):
+    def save_to_json_file(self, filepath: str, ensure_ascii=False, indent=2, compact=False):
         with open(filepath, 'w', encoding='utf-8') as save_file:
-            json.dump(to_raw_type(self), save_file, ensure_ascii=ensure_ascii, indent=indent)
+            dump_json(self, save_file, ensure_ascii=ensure_ascii, indent=indent, compact=compact)
 
     def fill_array_fields(self, raw_config: dict, fields_to_fill: List[Tuple[str, Type[ConfigInterface]]]):
         for field_name, field_type in fields_to_fill:
@@ -97,7 +222,7 @@ class ConfigInterface(metaclass=ABCMeta):
                     setattr(self, field_name, [])
                     continue
                 if type(raw_config[field_name]) is list:
-                    setattr(self, field_name, [field_type().auto_update_config(item) for item in raw_config[field_name]])
+                    setattr(self, field_name, [field_type().auto_update_config_reflectively(item) for item in raw_config[field_name]])
 
     def fields_to_fill(self) -> List[Tuple[str, Type[ConfigInterface]]]:
         return []
@@ -109,7 +234,7 @@ class ConfigInterface(metaclass=ABCMeta):
                     setattr(self, field_name, {})
                     continue
                 if type(raw_config[field_name]) is dict:
-                    setattr(self, field_name, {key: field_type().auto_update_config(val) for key, val in raw_config[field_name].items()})
+                    setattr(self, field_name, {key: field_type().auto_update_config_reflectively(val) for key, val in raw_config[field_name].items()})
 
     def dict_fields_to_fill(self) -> List[Tuple[str, Type[ConfigInterface]]]:
         return []
@@ -118,12 +243,147 @@ class ConfigInterface(metaclass=ABCMeta):
         return
 
     def __str__(self):
-        return json.dumps(to_raw_type(self), ensure_ascii=False)
+        return to_json(self)
+
+
+class SlotsConfigInterface(ConfigInterface, metaclass=AutoSlotsMeta):
+    """
+    字段保存在自动生成的__slots__中的ConfigInterface，适用于会同时存在大量实例的数据结构，如dao中解析的各种接口回包
+    除了不能在类外部动态添加字段外，用法与ConfigInterface一致
+    """
+    __slots__ = ()
+
+
+class ConfigDecoder:
+    """
+    某个ConfigInterface子类的解码器，在该类首次解析时根据其字段信息生成，之后该类的所有实例共用
+
+    与auto_update_config_reflectively相比，省去了每个字段的hasattr/getattr、ABCMeta的isinstance判断，
+    以及每个对象都要调用fields_to_fill/dict_fields_to_fill并在解析完后再遍历一次的开销
+    """
+
+    def __init__(self, cls: type, instance: ConfigInterface):
+        self.cls = cls
+        # 使用__slots__且没有__dict__的类，所有字段都通过下面的class_attrs来判断
+        self.has_dict = cls.__dictoffset__ != 0
+        # 需要解析为 List[field_type] 和 Dict[str, field_type] 的字段
+        self.array_fields = dict(instance.fields_to_fill())  # type: Dict[str, Type[ConfigInterface]]
+        self.dict_fields = dict(instance.dict_fields_to_fill())  # type: Dict[str, Type[ConfigInterface]]
+        # 类上定义的属性（如类变量、方法），实例字段中找不到时需要通过这个判断是否存在
+        self.class_attrs = frozenset(dir(cls))
+
+    def decode(self, obj: ConfigInterface, raw_config: dict):
+        fields = obj.__dict__ if self.has_dict else {}
+        config_types = _config_types
+        for key, val in raw_config.items():
+            if key in fields:
+                attr = fields[key]
+                is_config = config_types.get(type(attr))
+                if is_config is None:
+                    is_config = is_config_type(type(attr))
+
+                if is_config:
+                    attr.auto_update_config(val)
+                else:
+                    fields[key] = val
+            elif key in self.class_attrs:
+                attr = getattr(obj, key, _unset)
+                if attr is _unset:
+                    # 尚未赋值的slot字段，与hasattr为False时一样跳过
+                    continue
+
+                is_config = config_types.get(type(attr))
+                if is_config is None:
+                    is_config = is_config_type(type(attr))
+
+                if is_config:
+                    attr.auto_update_config(val)
+                else:
+                    setattr(obj, key, val)
+
+        if self.array_fields or self.dict_fields:
+            self.fill_fields(obj, raw_config)
+
+    def fill_fields(self, obj: ConfigInterface, raw_config: dict):
+        """与原先的实现一样，在上面设置为原始值后再按需替换为解析后的结构"""
+        for key, field_type in self.array_fields.items():
+            if key in raw_config:
+                val = raw_config[key]
+                if val is None:
+                    setattr(obj, key, [])
+                elif type(val) is list:
+                    setattr(obj, key, [field_type().auto_update_config(item) for item in val])
+
+        for key, field_type in self.dict_fields.items():
+            if key in raw_config:
+                val = raw_config[key]
+                if val is None:
+                    setattr(obj, key, {})
+                elif type(val) is dict:
+                    setattr(obj, key, {sub_key: field_type().auto_update_config(sub_val) for sub_key, sub_val in val.items()})
+
+
+_decoders = {}  # type: Dict[type, ConfigDecoder]
+_config_types = {}  # type: Dict[type, bool]
+_unset = object()
+
+
+def get_decoder(obj: ConfigInterface) -> ConfigDecoder:
+    cls = type(obj)
+    decoder = _decoders.get(cls)
+    if decoder is None:
+        decoder = _decoders[cls] = ConfigDecoder(cls, obj)
+
+    return decoder
+
+
+def is_config_type(cls: type) -> bool:
+    """缓存issubclass的结果，ABCMeta的子类判断较慢"""
+    result = _config_types.get(cls)
+    if result is None:
+        result = _config_types[cls] = issubclass(cls, ConfigInterface)
+
+    return result
+
+
+_slot_fields = {}  # type: Dict[type, Tuple[str, ...]]
+
+
+def fields_of(obj) -> dict:
+    """返回对象的各个字段，兼容使用__slots__的类，未使用__slots__的类直接返回其__dict__"""
+    cls = type(obj)
+    slot_fields = _slot_fields.get(cls)
+    if slot_fields is None:
+        slot_fields = _slot_fields[cls] = get_slot_fields(cls)
+
+    if not slot_fields:
+        return obj.__dict__
+
+    fields = {}
+    for name in slot_fields:
+        val = getattr(obj, name, _unset)
+        if val is not _unset:
+            fields[name] = val
+    if cls.__dictoffset__ != 0:
+        fields.update(obj.__dict__)
+
+    return fields
+
+
+def get_slot_fields(cls: type) -> Tuple[str, ...]:
+    slot_fields = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get("__slots__", ())
+        for name in [slots] if isinstance(slots, str) else slots:
+            if name not in ["__dict__", "__weakref__"] and name not in slot_fields:
+                slot_fields.append(name)
+
+    return tuple(slot_fields)
 
 
 def to_raw_type(v):
     if isinstance(v, ConfigInterface):
-        return {sk: to_raw_type(sv) for sk, sv in v.__dict__.items()}
+        return {sk: to_raw_type(sv) for sk, sv in fields_of(v).items()}
     elif isinstance(v, list):
         return list(to_raw_type(sv) for sk, sv in enumerate(v))
     elif isinstance(v, tuple):
@@ -136,6 +396,64 @@ def to_raw_type(v):
         return v
 
 
+def _default(v):
+    """序列化时遇到json不支持的类型时的回调，直接返回对象的字段字典，而不是像to_raw_type那样先递归复制一遍"""
+    if isinstance(v, ConfigInterface):
+        return fields_of(v)
+    elif isinstance(v, (set, frozenset)):
+        return list(v)
+
+    raise TypeError(f"Object of type {type(v).__name__} is not JSON serializable")
+
+
+compact_separators = (',', ':')
+
+
+def to_json(v, ensure_ascii=False, indent=None, compact=False) -> str:
+    """
+    将ConfigInterface（或包含它的容器）直接序列化为json字符串，结果与 json.dumps(to_raw_type(v)) 一致
+    :param compact: 紧凑模式，不缩进且分隔符后不加空格，用于存盘时减小体积
+    """
+    if compact:
+        indent = None
+
+    if _use_orjson(ensure_ascii, indent, compact):
+        try:
+            return orjson.dumps(v, default=_default, option=_orjson_option(indent)).decode('utf-8')
+        except (TypeError, orjson.JSONEncodeError):
+            # 超过64位的整数等orjson不支持的情况，回退到标准库
+            pass
+
+    separators = compact_separators if compact else None
+    return json.dumps(v, default=_default, ensure_ascii=ensure_ascii, indent=indent, separators=separators)
+
+
+def dump_json(v, fp, ensure_ascii=False, indent=None, compact=False):
+    """
+    将ConfigInterface（或包含它的容器）序列化后写入文件对象fp
+    标准库在缩进时只能使用python实现的编码器，此时逐段流式写入，其他情况下整体编码后一次写入
+    """
+    if indent is not None and not compact and not _use_orjson(ensure_ascii, indent, compact):
+        json.dump(v, fp, default=_default, ensure_ascii=ensure_ascii, indent=indent)
+        return
+
+    fp.write(to_json(v, ensure_ascii, indent, compact))
+
+
+def _use_orjson(ensure_ascii: bool, indent, compact: bool) -> bool:
+    # orjson不转义非ascii字符，且只支持2个空格的缩进，其非缩进输出即为紧凑格式
+    return orjson is not None and not ensure_ascii and (compact or indent == 2)
+
+
+def _orjson_option(indent) -> int:
+    # json只支持str作为key，标准库会自动将int等类型的key转换为str，orjson则需要显式开启
+    option = orjson.OPT_NON_STR_KEYS
+    if indent == 2:
+        option |= orjson.OPT_INDENT_2
+
+    return option
+
+
 def test():
     class TestSubConfig(ConfigInterface):
         def __init__(self):
@@ -189,5 +507,107 @@ def test():
     print(test_config)
 
 
+def benchmark(times=20):
+    """
+    对比反射解析与按类缓存的解码器的速度
+    用法：python data_struct.py benchmark
+    """
+    import os
+    import time
+
+    import toml
+
+    from config import Config
+    from dao import (DnfHelperChronicleExchangeList,
+                     DnfHelperChronicleLotteryList,
+                     DnfHelperChronicleUserTaskList)
+
+    config_path = "config.toml" if os.path.exists("config.toml") else "config.example.toml"
+    raw_config = toml.load(config_path)
+
+    def _gifts(count: int) -> List[dict]:
+        return [{"sIdentifyId": str(idx), "sName": f"礼包{idx}", "iCard": "20", "iNum": "5", "iLevel": "1", "sLbcode": f"ex_{idx:04}",
+                 "sPic1": "https://mcdn.gtimg.com/icon.png", "isLock": 0, "usedNum": 0, "fChance": "0.001", "sLbCode": f"lottery_{idx:04}",
+                 "sLbPic": "https://mcdn.gtimg.com/icon.png", "iRank": "1", "iAction": "1"} for idx in range(count)]
+
+    cases = [
+        (config_path, Config, raw_config),
+        ("编年史兑换列表", DnfHelperChronicleExchangeList, {"code": 200, "exp": 0, "gifts": _gifts(2000), "hasPartner": True, "level": 10, "msg": "success"}),
+        ("编年史抽奖列表", DnfHelperChronicleLotteryList, {"code": 200, "gifts": _gifts(2000), "msg": "success"}),
+        ("编年史任务列表", DnfHelperChronicleUserTaskList, {"pUserId": "1", "hasPartner": True, "taskList": [
+            {"mActionId": str(idx), "name": f"任务{idx}", "mExp": 11, "mStatus": 0, "jumpUrl": "", "pActionId": "013", "pExp": 5, "pStatus": 0} for idx in range(2000)
+        ]}),
+    ]
+
+    for name, cls, raw in cases:
+        if cls is not Config:
+            # Config中每个账号的sDjcSign包含时间戳和随机数，每次解析的结果都不同，不参与对比
+            assert to_raw_type(cls().auto_update_config(raw)) == to_raw_type(cls().auto_update_config_reflectively(raw))
+
+        result = {}
+        for method in ["auto_update_config_reflectively", "auto_update_config"]:
+            start_time = time.time()
+            for _ in range(times):
+                getattr(cls(), method)(raw)
+            result[method] = (time.time() - start_time) / times
+
+        old, new = result["auto_update_config_reflectively"], result["auto_update_config"]
+        logger.info(f"{name}: 反射解析 {old * 1000:.2f}ms 缓存解码器 {new * 1000:.2f}ms 加速比 {old / max(new, 1e-9):.2f}")
+
+
+def benchmark_json(times=20):
+    """
+    对比先通过to_raw_type复制再序列化与直接序列化的速度
+    用法：python data_struct.py benchmark_json
+    """
+    import os
+    import time
+
+    import toml
+
+    from config import Config
+    from db import CacheDB, CacheInfo
+
+    config_path = "config.toml" if os.path.exists("config.toml") else "config.example.toml"
+    cfg = Config().auto_update_config(toml.load(config_path))
+
+    cache_db = CacheDB()
+    for idx in range(5000):
+        info = CacheInfo()
+        info.value = {"uin": f"o{idx:010}", "skey": f"@{idx:09}", "nickname": f"账号{idx}", "roles": [{"id": idx, "level": 110}]}
+        cache_db.cache[f"cache_key_{idx}"] = info
+
+    logger.info(f"orjson可用：{orjson is not None}")
+    for name, v in [(config_path, cfg), ("CacheDB(5000条)", cache_db)]:
+        expected = json.dumps(to_raw_type(v), ensure_ascii=False, indent=2)
+        assert json.loads(to_json(v, indent=2)) == json.loads(expected)
+        assert json.loads(to_json(v, compact=True)) == json.loads(expected)
+
+        cases = [
+            ("to_raw_type+缩进", lambda: json.dumps(to_raw_type(v), ensure_ascii=False, indent=2)),
+            ("直接序列化+缩进", lambda: to_json(v, indent=2)),
+            ("to_raw_type+单行", lambda: json.dumps(to_raw_type(v), ensure_ascii=False)),
+            ("直接序列化+单行", lambda: to_json(v)),
+            ("直接序列化+紧凑", lambda: to_json(v, compact=True)),
+        ]
+
+        result = []
+        for case_name, func in cases:
+            start_time = time.time()
+            for _ in range(times):
+                res = func()
+            result.append(f"{case_name} {(time.time() - start_time) / times * 1000:.2f}ms/{len(res.encode('utf-8')) / 1024:.0f}KB")
+
+        logger.info(f"{name}: {' '.join(result)}")
+
+
 if __name__ == '__main__':
-    test()
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] in ["benchmark", "benchmark_json"]:
+        # 直接运行本文件时，这里的ConfigInterface与dao等模块导入的并不是同一个类，因此需要使用导入的模块中的版本
+        import data_struct
+
+        getattr(data_struct, sys.argv[1])()
+    else:
+        test()
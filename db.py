@@ -68,6 +68,9 @@ class CacheDB(DBInterface):
 
         self.cache = {}  # type: Dict[str, CacheInfo]
 
+    def save_compact(self) -> bool:
+        return True
+
     def dict_fields_to_fill(self) -> List[Tuple[str, Type[ConfigInterface]]]:
         return [
             ('cache', CacheInfo)
@@ -88,6 +91,16 @@ class FireCrackersDB(DBInterface):
         self.friend_qqs = []  # type: List[str]
 
 
+class GithubMirrorDB(DBInterface):
+    def __init__(self):
+        super().__init__()
+
+        # 上次最先返回有效更新信息的站点，github.com表示原站
+        self.fastest_site = ""
+        # 各站点最近一次成功获取更新信息的耗时（秒）
+        self.site_to_cost = {}  # type: Dict[str, float]
+
+
 class UserBuyInfoDB(DBInterface):
     def __init__(self):
         super().__init__()
@@ -39,6 +39,12 @@ class DBInterface(ConfigInterface):
     def get_version(self) -> str:
         return ""
 
+    def save_compact(self) -> bool:
+        """
+        是否以紧凑格式存盘（不缩进），数据量较大的数据库可以重载为True以减小文件体积和序列化耗时
+        """
+        return False
+
     # ----------------- 数据库读写操作 -----------------
     def with_context(self, context: str) -> DBInterface:
         """
@@ -80,7 +86,7 @@ class DBInterface(ConfigInterface):
 
             self.version = self.get_version()
 
-            self.save_to_json_file(db_file)
+            self.save_to_json_file(db_file, compact=self.save_compact())
         except Exception:
             logger.error(f"保存数据库失败，db_to_save={self}")
 
@@ -1,5 +1,6 @@
 import string
 from multiprocessing import Pool
+from types import MappingProxyType
 from urllib.parse import quote, quote_plus
 
 import json_parser
@@ -11,11 +12,11 @@ from first_run import *
 from game_info import get_game_info, get_game_info_by_bizcode
 from network import *
 from qq_login import LoginResult, QQLogin
-from qzone_activity import QzoneActivity
+from qzone_activity import QzoneActivity, clear_page_data_cache
 from setting import *
 from sign import getMillSecondsUnix
-from urls import (Urls, get_act_url, get_ams_act, get_ams_act_desc,
-                  get_not_ams_act, get_not_ams_act_desc, not_know_end_time,
+from urls import (get_act_url, get_ams_act, get_ams_act_desc, get_not_ams_act,
+                  get_not_ams_act_desc, get_urls, not_know_end_time,
                   search_act)
 from usage_count import increase_counter
 
@@ -28,6 +29,49 @@ class DjcHelper:
 
     local_saved_teamid_file = os.path.join(cached_dir, ".teamid_new.{}.json")
 
+    # format时无值的默认参数，内容固定，所有实例共用
+    format_default_empty_params = MappingProxyType({key: "" for key in [
+        "package_id", "lqlevel", "teamid",
+        "weekDay",
+        "sArea", "serverId", "areaId", "nickName", "sRoleId", "sRoleName", "uin", "skey", "userId", "token",
+        "iActionId", "iGoodsId", "sBizCode", "partition", "iZoneId", "platid", "sZoneDesc", "sGetterDream",
+        "dzid",
+        "page",
+        "iPackageId",
+        "isLock", "amsid", "iLbSel1", "num", "mold", "exNum", "iCard", "iNum", "actionId",
+        "plat", "extraStr",
+        "sContent", "sPartition", "sAreaName", "md5str", "ams_checkparam", "checkparam",
+        "type", "moduleId", "giftId", "acceptId", "sendQQ",
+        "cardType", "giftNum", "inviteId", "inviterName", "sendName", "invitee", "receiveUin", "receiver", "receiverName", "receiverUrl", "inviteUin",
+        "user_area", "user_partition", "user_areaName", "user_roleId", "user_roleName",
+        "user_roleLevel", "user_checkparam", "user_md5str", "user_sex", "user_platId",
+        "cz", "dj",
+        "siActivityId",
+        "needADD", "dateInfo", "sId", "userNum",
+        "index",
+        "pageNow", "pageSize",
+        "clickTime",
+        "skin_id", "decoration_id", "adLevel", "adPower",
+        "username", "petId",
+        "fuin", "sCode", "sNickName", "iId", "sendPage",
+        "hello_id", "prize",
+        "qd",
+        "iReceiveUin",
+        "map1", "map2", "len",
+        "itemIndex",
+        "sRole",
+        "loginNum",
+        "level",
+        "iGuestUin",
+        "ukey",
+        "iGiftID",
+        "iInviter",
+        "iPageNow", "iPageSize",
+        "pUserId", "isBind",
+        "iType", "iWork", "iPage",
+        "sNick",
+    ]})
+
     def __init__(self, account_config, common_config):
         self.cfg = account_config  # type: AccountConfig
         self.common_cfg = common_config  # type: CommonConfig
@@ -44,7 +88,7 @@ class DjcHelper:
         self.init_network()
 
         # 相关链接
-        self.urls = Urls()
+        self.urls = get_urls()
 
     # --------------------------------------------一些辅助函数--------------------------------------------
 
@@ -798,7 +842,7 @@ class DjcHelper:
 
     def open_mobile_game_server_list(self):
         game_info = self.get_mobile_game_info()
-        res = requests.get(self.urls.query_game_server_list.format(bizcode=game_info.bizCode), timeout=10)
+        res = http_request("GET", self.urls.query_game_server_list.format(bizcode=game_info.bizCode), timeout=10)
         server_list_file = f"utils/reference_data/server_list_{game_info.bizName}.js"
         with open(server_list_file, 'w', encoding='utf-8') as f:
             f.write(res.text)
@@ -1334,7 +1378,7 @@ class DjcHelper:
         old_gpoints = self.query_gpoints()
 
         for op in self.cfg.xinyue_app_operations:
-            res = requests.post(url, bytes(op.encrypted_raw_http_body), headers=headers, timeout=10)
+            res = http_request("POST", url, data=bytes(op.encrypted_raw_http_body), headers=headers, timeout=10)
             logger.info(f"心悦app操作：{op.name} 返回码={res.status_code}, 请求结果={res.content}")
 
         new_gpoints = self.query_gpoints()
@@ -1525,11 +1569,12 @@ class DjcHelper:
         from_qq = self.qq()
 
         ctx = f"{from_qq} 赠送卡片 {card_name}({cardId}) 给 {to_qq}"
+        clear_page_data_cache()
         return self.get(ctx, self.urls.ark_lottery_send_card, cardId=cardId, from_qq=from_qq, to_qq=to_qq, actName=self.zzconfig.actName, print_res=print_res)
         # # {"13333":{"data":{},"ret":0,"msg":"成功"},"ecode":0,"ts":1607934736057}
 
     def send_card_by_name(self, card_name, to_qq):
-        card_info_map = parse_card_group_info_map(self.zzconfig)
+        card_info_map = card_group_info_map()
         return self.send_card(card_name, card_info_map[card_name].id, to_qq, print_res=True)
 
     def fetch_pskey(self, force=False, window_index=1):
@@ -5607,7 +5652,7 @@ class DjcHelper:
                         "user-agent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.141 Safari/537.36',
                     }
 
-                    res = requests.post(url, headers=headers, timeout=10)
+                    res = http_request("POST", url, headers=headers, timeout=10)
                     html_text = res.text
 
                     prefixes = [
@@ -6007,7 +6052,7 @@ class DjcHelper:
         self.xjy_info = self.xjy_query_info()
 
     def xjy_get_role_id(self, areaId: str, roleName: str, headers: dict) -> str:
-        res = requests.get(self.format(self.urls.xiaojiangyou_get_role_id, areaId=areaId, roleName=roleName), headers=headers)
+        res = http_request("GET", self.format(self.urls.xiaojiangyou_get_role_id, areaId=areaId, roleName=roleName), headers=headers)
         parsed = parse.urlparse(res.url)
         role_id = parse.parse_qs(parsed.query)['role_id'][0]
 
@@ -6991,60 +7036,14 @@ class DjcHelper:
             "date": date,
         }
 
-        # 无值的默认值
-        default_empty_params = {key: "" for key in [
-            "package_id", "lqlevel", "teamid",
-            "weekDay",
-            "sArea", "serverId", "areaId", "nickName", "sRoleId", "sRoleName", "uin", "skey", "userId", "token",
-            "iActionId", "iGoodsId", "sBizCode", "partition", "iZoneId", "platid", "sZoneDesc", "sGetterDream",
-            "dzid",
-            "page",
-            "iPackageId",
-            "isLock", "amsid", "iLbSel1", "num", "mold", "exNum", "iCard", "iNum", "actionId",
-            "plat", "extraStr",
-            "sContent", "sPartition", "sAreaName", "md5str", "ams_checkparam", "checkparam",
-            "type", "moduleId", "giftId", "acceptId", "sendQQ",
-            "cardType", "giftNum", "inviteId", "inviterName", "sendName", "invitee", "receiveUin", "receiver", "receiverName", "receiverUrl", "inviteUin",
-            "user_area", "user_partition", "user_areaName", "user_roleId", "user_roleName",
-            "user_roleLevel", "user_checkparam", "user_md5str", "user_sex", "user_platId",
-            "cz", "dj",
-            "siActivityId",
-            "needADD", "dateInfo", "sId", "userNum",
-            "index",
-            "pageNow", "pageSize",
-            "clickTime",
-            "skin_id", "decoration_id", "adLevel", "adPower",
-            "username", "petId",
-            "fuin", "sCode", "sNickName", "iId", "sendPage",
-            "hello_id", "prize",
-            "qd",
-            "iReceiveUin",
-            "map1", "map2", "len",
-            "itemIndex",
-            "sRole",
-            "loginNum",
-            "level",
-            "iGuestUin",
-            "ukey",
-            "iGiftID",
-            "iInviter",
-            "iPageNow", "iPageSize",
-            "pUserId", "isBind",
-            "iType", "iWork", "iPage",
-            "sNick",
-        ]}
-
-        # 整合得到所有默认值
-        default_params = {**default_valued_params, **default_empty_params}
-
         # 首先将默认参数添加进去，避免format时报错
-        merged_params = {**default_params, **params}
+        merged_params = {**self.format_default_empty_params, **default_valued_params, **params}
 
         # # 需要url encode一下，否则如果用户配置的值中包含&等符号时，会影响后续实际逻辑
         # quoted_params = {k: quote_plus(str(v)) for k, v in merged_params.items()}
 
         # 将参数全部填充到url的参数中
-        urlRendered = url.format(**merged_params)
+        urlRendered = url.format_map(merged_params)
 
         # 过滤掉没有实际赋值的参数
         return filter_unused_params_catch_exception(urlRendered)
@@ -7411,7 +7410,53 @@ def watch_live():
             time.sleep(waitTime)
 
 
+def benchmark(times=1000):
+    """
+    统计每次构造DjcHelper、构造Urls以及format链接的耗时和内存分配情况
+    用法：python djc_helper.py benchmark
+    """
+    import time
+    import tracemalloc
+
+    from urls import Urls
+
+    load_config("config.toml" if os.path.exists("config.toml") else "config.example.toml")
+    cfg = config()
+    account_config = cfg.account_configs[0]
+    djcHelper = DjcHelper(account_config, cfg.common)
+
+    cases = [
+        ("构造DjcHelper", lambda: DjcHelper(account_config, cfg.common)),
+        ("构造Urls(原先每个DjcHelper各自构造一次)", lambda: Urls()),
+        ("get_urls", get_urls),
+        ("format链接", lambda: djcHelper.format(djcHelper.urls.money_flow)),
+    ]
+    for name, func in cases:
+        # 预热，使得首次使用时才构造的共享数据不计入
+        func()
+
+        start_time = time.perf_counter()
+        for _ in range(times):
+            func()
+        seconds = (time.perf_counter() - start_time) / times
+
+        # 保留各次的结果，从而统计每次调用后新增的内存块数目和大小
+        tracemalloc.start()
+        results = [func() for _ in range(times)]
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        stats = snapshot.statistics("filename")
+        blocks, size = sum(stat.count for stat in stats), sum(stat.size for stat in stats)
+
+        assert len(results) == times
+        print(f"{name}: {seconds * 1e6:.1f}us/次 新增内存块 {blocks / times:.1f}个/次 {size / times / 1024:.2f}KB/次")
+
+
 if __name__ == '__main__':
+    if len(sys.argv) >= 2 and sys.argv[1] == "benchmark":
+        benchmark()
+        sys.exit(0)
+
     # 读取配置信息
     load_config("config.toml", "config.toml.local")
     cfg = config()
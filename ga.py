@@ -1,9 +1,9 @@
 # Google Analytics 上报脚本
-from urllib.parse import quote_plus
-
-import requests
+from typing import Dict, List
+from urllib.parse import quote_plus, urlencode
 
 from log import logger
+from network import http_request
 from util import get_cid, get_resolution, try_except
 from version import now_version
 
@@ -11,36 +11,49 @@ from version import now_version
 # note: 当发现上报失败时，可以将打印的post body复制到 https://ga-dev-tools.web.app/hit-builder/ 进行校验，看是否缺了参数，或者有参数不符合格式
 # note: 参数文档 https://developers.google.com/analytics/devguides/collection/protocol/v1/parameters
 GA_API_URL = "https://www.google-analytics.com/collect"
+GA_BATCH_API_URL = "https://www.google-analytics.com/batch"
+# 批量接口单次请求最多允许20个hit
+GA_BATCH_MAX_HITS = 20
 GA_TRACKING_ID = "UA-179595405-1"
 
 headers = {
     "user-agent": "djc_helper",
 }
 
-common_data = {
-    'v': '1',  # API Version.
-    'tid': GA_TRACKING_ID,  # Tracking ID / Property ID.
-    'cid': get_cid(),  # Anonymous Client Identifier. Ideally, this should be a UUID that is associated with particular user, device, or browser instance.
-    'ua': 'djc_helper',
+_common_data = {}  # type: Dict[str, str]
 
-    'an': "djc_helper",
-    'av': now_version,
 
-    'ds': 'app',
-    'sr': get_resolution(),
-}
+def get_common_data() -> Dict[str, str]:
+    """
+    各个上报共用的参数，其中获取设备标识和分辨率可能较慢，因此在首次上报时才计算
+    """
+    if len(_common_data) == 0:
+        _common_data.update({
+            'v': '1',  # API Version.
+            'tid': GA_TRACKING_ID,  # Tracking ID / Property ID.
+            'cid': get_cid(),  # Anonymous Client Identifier. Ideally, this should be a UUID that is associated with particular user, device, or browser instance.
+            'ua': 'djc_helper',
+
+            'an': "djc_helper",
+            'av': now_version,
+
+            'ds': 'app',
+            'sr': get_resolution(),
+        })
+
+    return _common_data
+
 
 GA_REPORT_TYPE_EVENT = "event"
 GA_REPORT_TYPE_PAGE_VIEW = "page_view"
 
 
-@try_except(show_exception_info=False)
-def track_event(category: str, action: str, label=None, value=0, ga_misc_params: dict = None):
+def make_event_hit(category: str, action: str, label=None, value=0, ga_misc_params: dict = None) -> dict:
     if ga_misc_params is None:
         ga_misc_params = {}
 
-    data = {
-        **common_data,
+    return {
+        **get_common_data(),
 
         't': 'event',  # Event hit type.
         'ec': category,  # Event category.
@@ -51,18 +64,14 @@ def track_event(category: str, action: str, label=None, value=0, ga_misc_params:
         **ga_misc_params,  # 透传的一些额外参数
     }
 
-    res = requests.post(GA_API_URL, data=data, headers=headers, timeout=10)
-    logger.debug(f"request body = {res.request.body}")
-
 
-@try_except(show_exception_info=False)
-def track_page(page: str, ga_misc_params: dict = None):
+def make_page_hit(page: str, ga_misc_params: dict = None) -> dict:
     if ga_misc_params is None:
         ga_misc_params = {}
 
     page = quote_plus(page)
-    data = {
-        **common_data,
+    return {
+        **get_common_data(),
 
         't': 'pageview',  # Event hit type.
         'dh': "djc-helper.com",  # Document hostname.
@@ -72,10 +81,40 @@ def track_page(page: str, ga_misc_params: dict = None):
         **ga_misc_params,  # 透传的一些额外参数
     }
 
-    res = requests.post(GA_API_URL, data=data, timeout=10)
+
+@try_except(show_exception_info=False)
+def track_event(category: str, action: str, label=None, value=0, ga_misc_params: dict = None):
+    res = http_request("POST", GA_API_URL, data=make_event_hit(category, action, label, value, ga_misc_params), headers=headers, timeout=10)
+    logger.debug(f"request body = {res.request.body}")
+
+
+@try_except(show_exception_info=False)
+def track_page(page: str, ga_misc_params: dict = None):
+    res = http_request("POST", GA_API_URL, data=make_page_hit(page, ga_misc_params), timeout=10)
     logger.debug(f"request body = {res.request.body}")
 
 
+def track_hits(hits: List[dict], timeout=10) -> int:
+    """
+    通过批量接口上报多个hit，每个请求最多包含 GA_BATCH_MAX_HITS 个
+    某个请求出错时不再发送后续的请求，返回已经成功上报的hit数目（即前多少个已上报），由调用方决定如何处理剩余部分
+    """
+    for idx in range(0, len(hits), GA_BATCH_MAX_HITS):
+        # 与单个上报时一致，值为None的参数不上报
+        body = "\n".join(urlencode({k: v for k, v in hit.items() if v is not None}) for hit in hits[idx:idx + GA_BATCH_MAX_HITS])
+
+        try:
+            res = http_request("POST", GA_BATCH_API_URL, data=body.encode("utf-8"), headers=headers, timeout=timeout)
+            res.raise_for_status()
+        except Exception as e:
+            logger.debug(f"batch request failed, {idx}/{len(hits)} hits sent", exc_info=e)
+            return idx
+
+        logger.debug(f"batch request body = {body}")
+
+    return len(hits)
+
+
 if __name__ == '__main__':
     # track_event("example", "test")
     track_page("/example/test_quote")
@@ -1,8 +1,8 @@
 # Google Analytics 4 上报脚本
-
-import requests
+from typing import List
 
 from log import logger
+from network import http_request
 from util import get_cid, try_except
 
 # note: 查看数据地址 https://analytics.google.com/analytics/web/#/
@@ -14,39 +14,68 @@ GA_API_SECRET = "Hyn3f-XnQIygfii6xju6Hg"
 GA_MEASUREMENT_ID = "G-6C4M20MVJ4"
 
 GA_API_URL = f"{GA_API_BASE_URL}?measurement_id={GA_MEASUREMENT_ID}&api_secret={GA_API_SECRET}"
+# 单次请求最多允许包含25个事件
+GA_MAX_EVENTS_PER_REQUEST = 25
+# 事件的时间最多允许往前追溯72小时
+GA_MAX_BACKDATE_SECONDS = 72 * 3600
 
 headers = {
     "user-agent": "djc_helper",
 }
 
 
-@try_except(show_exception_info=False)
-def track_event(category: str, event_name: str):
+def make_event(category: str, event_name: str, timestamp_micros=0) -> dict:
+    """
+    :param timestamp_micros 事件实际发生的时间，仅在补报之前的事件时设置，ga4仅接受 GA_MAX_BACKDATE_SECONDS 内的
+    """
     event_name = event_name.replace('/', '_')
 
-    json_data = {
-        "client_id": get_cid(),
-        "user_id": get_cid(),
-
-        "events": [
-            {
-                "name": category,
-                "params": {
-                    "event_name": event_name,
-                },
-            }
-        ],
+    event = {
+        "name": category,
+        "params": {
+            "event_name": event_name,
+        },
     }
+    if timestamp_micros != 0:
+        event["timestamp_micros"] = timestamp_micros
+
+    return event
+
+
+@try_except(show_exception_info=False)
+def track_event(category: str, event_name: str):
+    track_events([make_event(category, event_name)])
+
+
+def track_events(events: List[dict], timeout=10) -> int:
+    """
+    批量上报多个事件，每个请求最多包含 GA_MAX_EVENTS_PER_REQUEST 个
+    某个请求出错时不再发送后续的请求，返回已经成功上报的事件数目（即前多少个已上报），由调用方决定如何处理剩余部分
+    """
+    for idx in range(0, len(events), GA_MAX_EVENTS_PER_REQUEST):
+        json_data = {
+            "client_id": get_cid(),
+            "user_id": get_cid(),
+
+            "events": events[idx:idx + GA_MAX_EVENTS_PER_REQUEST],
+        }
+
+        try:
+            res = http_request("POST", GA_API_URL, json=json_data, headers=headers, timeout=timeout)
+            res.raise_for_status()
+        except Exception as e:
+            logger.debug(f"request failed, {idx}/{len(events)} events sent", exc_info=e)
+            return idx
 
-    res = requests.post(GA_API_URL, json=json_data, headers=headers, timeout=10)
+        # 打印日志，方便调试
+        debug_msg = f"request info: body = {res.request.body}"
+        logFunc = logger.debug
+        if "debug" in GA_API_BASE_URL:
+            debug_msg += f" res = {res.text}"
+            logFunc = logger.warning
+        logFunc(debug_msg)
 
-    # 打印日志，方便调试
-    debug_msg = f"request info: body = {res.request.body}"
-    logFunc = logger.debug
-    if "debug" in GA_API_BASE_URL:
-        debug_msg += f" res = {res.text}"
-        logFunc = logger.warning
-    logFunc(debug_msg)
+    return len(events)
 
 
 if __name__ == '__main__':
@@ -17,6 +17,9 @@ from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
 from urllib3 import disable_warnings
 from urllib3.exceptions import InsecureRequestWarning
 
+from lanzou.api.downloader import (SegmentedDownloader, calc_file_hash,
+                                   get_range_support_size)
+from lanzou.api.folder_index import FolderIndexEntry, folder_index
 from lanzou.api.models import FileList, FolderList
 from lanzou.api.types import *
 from lanzou.api.utils import *
@@ -45,6 +48,10 @@ class LanZouCloud(object):
         self._timeout = 15  # 每个请求的超时(不包含下载响应体的用时)
         self._max_size = 100  # 单个文件大小上限 MB
         self._upload_delay = (0, 0)  # 文件上传延时
+        self._upload_threads = 1  # 批量上传时同时上传的文件数
+        self._download_threads = 1  # 下载单个文件时的并发连接数，大于 1 时若服务器支持 Range 请求，则分段并发下载
+        self._min_segment_size = 1048576  # 分段下载时单个分段的最小字节数，小于该值的文件仍使用单连接下载
+        self.last_download_stat = None  # 最近一次分段下载的统计信息(DownloadStat)，可用于展示下载速度
         self._doupload_url = 'https://pc.woozooo.com/doupload.php'
         self._account_url = 'https://pc.woozooo.com/account.php'
         self._mydisk_url = 'https://pc.woozooo.com/mydisk.php'
@@ -121,6 +128,21 @@ class LanZouCloud(object):
             return LanZouCloud.SUCCESS
         return LanZouCloud.FAILED
 
+    def set_upload_threads(self, thread_count=1) -> int:
+        """设置批量上传时同时上传的文件数，不宜过大，避免触发官方的频率限制"""
+        if thread_count < 1:
+            return LanZouCloud.FAILED
+        self._upload_threads = thread_count
+        return LanZouCloud.SUCCESS
+
+    def set_download_threads(self, thread_count=1, min_segment_size=1048576) -> int:
+        """设置下载单个文件时的并发连接数，服务器支持 Range 请求时将分段并发下载"""
+        if thread_count < 1 or min_segment_size <= 0:
+            return LanZouCloud.FAILED
+        self._download_threads = thread_count
+        self._min_segment_size = min_segment_size
+        return LanZouCloud.SUCCESS
+
     def login(self, username, passwd) -> int:
         """
         登录蓝奏云控制台[已弃用]
@@ -765,8 +787,11 @@ class LanZouCloud(object):
         self.delete_rec(folder_id, False)
         return LanZouCloud.SUCCESS
 
-    def _upload_small_file(self, file_path, folder_id=-1, *, callback=None, uploaded_handler=None) -> int:
-        """绕过格式限制上传不超过 max_size 的文件"""
+    def _upload_small_file(self, file_path, folder_id=-1, *, callback=None, uploaded_handler=None,
+                           exist_file_list: FileList = None) -> int:
+        """绕过格式限制上传不超过 max_size 的文件
+        :param exist_file_list 目标文件夹中已有的文件列表，批量上传时由调用方获取一次后传入，避免每个文件都重新获取一遍
+        """
         if not os.path.isfile(file_path):
             return LanZouCloud.PATH_ERROR
 
@@ -779,7 +804,7 @@ class LanZouCloud(object):
 
         # 文件已经存在同名文件就删除
         filename = name_format(os.path.basename(file_path))
-        file_list = self.get_file_list(folder_id)
+        file_list = exist_file_list if exist_file_list is not None else self.get_file_list(folder_id)
         if file_list.find_by_name(filename):
             self.delete(file_list.find_by_name(filename).id)
         logger.debug(f'Upload file_path:{file_path} to folder_id:{folder_id}')
@@ -800,14 +825,16 @@ class LanZouCloud(object):
         # MultipartEncoderMonitor 每上传 8129 bytes数据调用一次回调函数，问题根源是 httplib 库
         # issue : https://github.com/requests/toolbelt/issues/75
         # 上传完成后，回调函数会被错误的多调用一次(强迫症受不了)。因此，下面重新封装了回调函数，修改了接受的参数，并阻断了多余的一次调用
-        self._upload_finished_flag = False  # 上传完成的标志
+        # 上传完成的标志放在局部变量中，确保多个文件同时上传时互不影响
+        upload_finished_flag = False
 
         def _call_back(read_monitor):
+            nonlocal upload_finished_flag
             if callback is not None:
-                if not self._upload_finished_flag:
+                if not upload_finished_flag:
                     callback(filename, read_monitor.len, read_monitor.bytes_read)
                 if read_monitor.len == read_monitor.bytes_read:
-                    self._upload_finished_flag = True
+                    upload_finished_flag = True
 
         monitor = MultipartEncoderMonitor(post_data, _call_back)
         result = self._post('https://pc.woozooo.com/fileup.php', data=monitor, headers=tmp_header, timeout=3600)
@@ -896,7 +923,8 @@ class LanZouCloud(object):
         logger.debug(f"Upload finished, Delete tmp folder:{tmp_dir}")
         return LanZouCloud.SUCCESS
 
-    def upload_file(self, file_path, folder_id=-1, *, callback=None, uploaded_handler=None) -> int:
+    def upload_file(self, file_path, folder_id=-1, *, callback=None, uploaded_handler=None,
+                    exist_file_list: FileList = None) -> int:
         """解除限制上传文件
         :param callback 用于显示上传进度的回调函数
                 def callback(file_name, total_size, now_size):
@@ -908,13 +936,16 @@ class LanZouCloud(object):
                     if is_file:
                         self.set_desc(fid, '...', is_file=True)
                         ...
+
+        :param exist_file_list 目标文件夹中已有的文件列表，若传入则不再重新获取，用于检查同名文件
         """
         if not os.path.isfile(file_path):
             return LanZouCloud.PATH_ERROR
 
         # 单个文件不超过 max_size 直接上传
         if os.path.getsize(file_path) <= self._max_size * 1048576:
-            return self._upload_small_file(file_path, folder_id, callback=callback, uploaded_handler=uploaded_handler)
+            return self._upload_small_file(file_path, folder_id, callback=callback, uploaded_handler=uploaded_handler,
+                                           exist_file_list=exist_file_list)
 
         # 上传超过 max_size 的文件
         if self._limit_mode:
@@ -955,22 +986,34 @@ class LanZouCloud(object):
         if dir_id == LanZouCloud.MKDIR_ERROR:
             return LanZouCloud.MKDIR_ERROR
 
-        for filename in os.listdir(dir_path):
-            file_path = dir_path + os.sep + filename
-            if not os.path.isfile(file_path):
-                continue  # 跳过子文件夹
-            code = self.upload_file(file_path, dir_id, callback=callback, uploaded_handler=uploaded_handler)
-            if code != LanZouCloud.SUCCESS:
-                if failed_callback is not None:
-                    failed_callback(code, filename)
+        # 目标文件夹的文件列表只获取一次，由各个文件共享
+        exist_file_list = self.get_file_list(dir_id)
+
+        # 同时上传多个文件，并发数由 set_upload_threads 控制
+        with ThreadPoolExecutor(max_workers=self._upload_threads) as ex:
+            task_to_filename = {}
+            for filename in os.listdir(dir_path):
+                file_path = dir_path + os.sep + filename
+                if not os.path.isfile(file_path):
+                    continue  # 跳过子文件夹
+                task = ex.submit(self.upload_file, file_path, dir_id, callback=callback, uploaded_handler=uploaded_handler,
+                                 exist_file_list=exist_file_list)
+                task_to_filename[task] = filename
+
+            for task in as_completed(task_to_filename):
+                code = task.result()
+                if code != LanZouCloud.SUCCESS:
+                    if failed_callback is not None:
+                        failed_callback(code, task_to_filename[task])
         return LanZouCloud.SUCCESS
 
     def down_file_by_url(self, share_url, pwd='', save_path='./Download', *, callback=None, overwrite=False,
-                         downloaded_handler=None) -> int:
+                         downloaded_handler=None, expected_hash='') -> int:
         """通过分享链接下载文件(需提取码)
         :param callback 用于显示下载进度 callback(file_name, total_size, now_size)
         :param overwrite 文件已存在时是否强制覆盖
         :param downloaded_handler 下载完成后进一步处理文件的回调函数 downloaded_handle(file_path)
+        :param expected_hash 若不为空，下载完成后校验文件的 sha256，不一致时视为下载失败
         """
         if not is_file_url(share_url):
             return LanZouCloud.URL_INVALID
@@ -1024,27 +1067,21 @@ class LanZouCloud(object):
         if not content_length:
             return LanZouCloud.FAILED  # 应该不会出现这种情况
 
-        # 支持断点续传下载
-        now_size = 0
-        if os.path.exists(tmp_file_path):
-            now_size = os.path.getsize(tmp_file_path)  # 本地已经下载的文件大小
-        headers = {**self._headers, 'Range': 'bytes=%d-' % now_size}
-        resp = self._get(info.durl, stream=True, headers=headers)
-
-        if resp is None:  # 网络异常
-            return LanZouCloud.FAILED
-        if resp.status_code == 416:  # 已经下载完成
-            return LanZouCloud.SUCCESS
-
-        with open(tmp_file_path, "ab") as f:
-            file_name = os.path.basename(file_path)
-            for chunk in resp.iter_content(4096):
-                if chunk:
-                    f.write(chunk)
-                    f.flush()
-                    now_size += len(chunk)
-                    if callback is not None:
-                        callback(file_name, int(content_length), now_size)
+        resp.close()
+        code = self._down_file_with_segments(info.durl, tmp_file_path, int(content_length), callback=callback,
+                                             file_name=os.path.basename(file_path), expected_hash=expected_hash)
+        if code is not None:
+            if code != LanZouCloud.SUCCESS:
+                return code
+        else:
+            code = self._down_file_with_single_connection(info.durl, tmp_file_path, int(content_length), callback=callback,
+                                                          file_name=os.path.basename(file_path))
+            if code != LanZouCloud.SUCCESS:
+                return code
+            if expected_hash != '' and calc_file_hash(tmp_file_path).lower() != expected_hash.lower():
+                logger.error(f"Hash mismatch for {tmp_file_path}, remove it")
+                os.remove(tmp_file_path)
+                return LanZouCloud.FAILED
 
         # 下载完成
         if os.path.exists(file_path):
@@ -1087,6 +1124,59 @@ class LanZouCloud(object):
             downloaded_handler(os.path.abspath(file_path))
         return LanZouCloud.SUCCESS
 
+    def _down_file_with_segments(self, durl, tmp_file_path, content_length, *, callback=None, file_name='',
+                                 expected_hash=''):
+        """尝试分段并发下载，若当前配置或服务器不支持分段下载，则返回 None，由调用方使用单连接下载"""
+        if self._download_threads <= 1 or content_length < 2 * self._min_segment_size:
+            return None
+
+        total_size = get_range_support_size(self._session, durl, self._headers, self._timeout)
+        if total_size != content_length:
+            logger.debug(f"Server does not support range request, fallback to single connection: {durl}")
+            return None
+
+        downloader = SegmentedDownloader(self._session, self._headers, thread_count=self._download_threads,
+                                         min_segment_size=self._min_segment_size, timeout=self._timeout)
+        stat = downloader.download(durl, tmp_file_path, total_size, expected_hash=expected_hash, callback=callback,
+                                   file_name=file_name)
+        self.last_download_stat = stat
+        if not stat.ok:
+            return LanZouCloud.FAILED
+
+        logger.debug(f"Download {file_name} with {stat.segment_count} segments, "
+                     f"speed={stat.speed / 1048576:.2f}MB/s, cost={stat.seconds:.2f}s")
+        return LanZouCloud.SUCCESS
+
+    def _down_file_with_single_connection(self, durl, tmp_file_path, content_length, *, callback=None, file_name=''):
+        """单连接下载，支持断点续传"""
+        if SegmentedDownloader.has_progress(tmp_file_path):
+            # 之前分段下载的临时文件是预分配好大小的，无法按照文件大小续传，只能重新下载
+            logger.debug(f"Remove segmented download progress of {tmp_file_path}")
+            SegmentedDownloader.remove_progress(tmp_file_path)
+
+        # 支持断点续传下载
+        now_size = 0
+        if os.path.exists(tmp_file_path):
+            now_size = os.path.getsize(tmp_file_path)  # 本地已经下载的文件大小
+        headers = {**self._headers, 'Range': 'bytes=%d-' % now_size}
+        resp = self._get(durl, stream=True, headers=headers)
+
+        if resp is None:  # 网络异常
+            return LanZouCloud.FAILED
+        if resp.status_code == 416:  # 已经下载完成
+            return LanZouCloud.SUCCESS
+
+        with open(tmp_file_path, "ab") as f:
+            for chunk in resp.iter_content(4096):
+                if chunk:
+                    f.write(chunk)
+                    f.flush()
+                    now_size += len(chunk)
+                    if callback is not None:
+                        callback(file_name, content_length, now_size)
+
+        return LanZouCloud.SUCCESS
+
     def down_file_by_id(self, fid, save_path='./Download', *, callback=None, overwrite=False,
                         downloaded_handler=None) -> int:
         """登录用户通过id下载文件(无需提取码)"""
@@ -1096,19 +1186,19 @@ class LanZouCloud(object):
         return self.down_file_by_url(info.url, info.pwd, save_path, callback=callback, overwrite=overwrite,
                                      downloaded_handler=downloaded_handler)
 
-    def get_folder_info_by_url(self, share_url, dir_pwd='', get_this_page=0) -> FolderDetail:
-        """获取文件夹里所有文件的信息"""
+    def _parse_folder_page(self, share_url, dir_pwd=''):
+        """解析文件夹分享页面，返回 (状态码, 索引)，索引中包含文件夹信息以及获取文件列表所需的请求参数"""
         if is_file_url(share_url):
-            return FolderDetail(LanZouCloud.URL_INVALID)
+            return LanZouCloud.URL_INVALID, None
         try:
             html = self._get(share_url, headers=self._headers).text
-        except requests.RequestException:
-            return FolderDetail(LanZouCloud.NETWORK_ERROR)
+        except (requests.RequestException, AttributeError):
+            return LanZouCloud.NETWORK_ERROR, None
         if '文件不存在' in html or '文件取消' in html:
-            return FolderDetail(LanZouCloud.FILE_CANCELLED)
+            return LanZouCloud.FILE_CANCELLED, None
         # 要求输入密码, 用户描述中可能带有"输入密码",所以不用这个字符串判断
         if ('id="pwdload"' in html or 'id="passwddiv"' in html) and len(dir_pwd) == 0:
-            return FolderDetail(LanZouCloud.LACK_PASSWORD)
+            return LanZouCloud.LACK_PASSWORD, None
 
         if "acw_sc__v2" in html:
             # 在页面被过多访问或其他情况下，有时候会先返回一个加密的页面，其执行计算出一个acw_sc__v2后放入页面后再重新访问页面才能获得正常页面
@@ -1136,7 +1226,7 @@ class LanZouCloud(object):
                           re.findall(r'<div class="user-radio-\d"></div>(.+?)</div>', html)
             folder_desc = folder_desc[0] if folder_desc else ""
         except IndexError:
-            return FolderDetail(LanZouCloud.FAILED)
+            return LanZouCloud.FAILED, None
 
         # 提取子文件夹信息(vip用户分享的文件夹可以递归包含子文件夹)
         sub_folders = FolderList()
@@ -1148,22 +1238,20 @@ class LanZouCloud(object):
             time_str = datetime.today().strftime('%Y-%m-%d')  # 网页没有时间信息, 设置为今天
             sub_folders.append(FolderInfo(name=name, desc=desc, url=url, time=time_str, pwd=dir_pwd))
 
-        # 提取改文件夹下全部文件
-        page = 1
-        if get_this_page > 0:
-            # 若外部设定仅获取某页，则初始参数为该页
-            page = get_this_page
-        files = FileList()
-        while True:
-            if page >= 2 and get_this_page == 0:  # 连续的请求需要稍等一下
-                sleep(0.6)
+        folder_meta = {'name': folder_name, 'id': folder_id, 'time': folder_time, 'desc': folder_desc}
+        post_data = {'lx': lx, 'k': k, 't': t, 'fid': folder_id, 'pwd': dir_pwd}
+        return LanZouCloud.SUCCESS, FolderIndexEntry(folder_meta, sub_folders, post_data)
+
+    def _get_folder_page(self, post_data, page, max_retries=5):
+        """获取文件夹指定页的文件列表，返回 (状态码, 文件列表)，该页超出最后一页时文件列表为 None"""
+        for _ in range(max_retries):
             try:
                 logger.debug(f"Parse page {page}...")
-                post_data = {'lx': lx, 'pg': page, 'k': k, 't': t, 'fid': folder_id, 'pwd': dir_pwd}
-                resp = self._post(self._host_url + '/filemoreajax.php', data=post_data, headers=self._headers).json()
-            except (requests.RequestException, AttributeError):
-                return FolderDetail(LanZouCloud.NETWORK_ERROR)
+                resp = self._post(self._host_url + '/filemoreajax.php', data={**post_data, 'pg': page}, headers=self._headers).json()
+            except (requests.RequestException, AttributeError, ValueError):
+                return LanZouCloud.NETWORK_ERROR, None
             if resp['zt'] == 1:  # 成功获取一页文件信息
+                files = []
                 for f in resp["text"]:
                     files.append(FileInFolder(
                         name=f["name_all"],  # 文件名
@@ -1172,30 +1260,118 @@ class LanZouCloud(object):
                         type=f["name_all"].split('.')[-1],  # 文件格式
                         url=self._host_url + "/" + f["id"]  # 文件分享链接
                     ))
-                page += 1  # 下一页
-
-                if get_this_page > 0:
-                    # 若外部设定仅获取某页，则请求完该页就结束
-                    break
-
-                continue
+                return LanZouCloud.SUCCESS, files
             elif resp['zt'] == 2:  # 已经拿到全部的文件信息
-                break
+                return LanZouCloud.SUCCESS, None
             elif resp['zt'] == 3:  # 提取码错误
-                return FolderDetail(LanZouCloud.PASSWORD_ERROR)
-            elif resp["zt"] == 4:
+                return LanZouCloud.PASSWORD_ERROR, None
+            elif resp["zt"] == 4:  # 请求过于频繁，稍等一下再重试
+                sleep(0.6)
                 continue
             else:
-                return FolderDetail(LanZouCloud.FAILED)  # 其它未知错误
+                return LanZouCloud.FAILED, None  # 其它未知错误
+
+        return LanZouCloud.FAILED, None
 
+    def _make_folder_detail(self, entry: FolderIndexEntry, files, share_url, dir_pwd='') -> FolderDetail:
+        folder_time = entry.folder_meta['time']
         # 通过文件的时间信息补全文件夹的年份(如果有文件的话)
         if files:  # 最后一个文件上传时间最早，文件夹的创建年份与其相同
             folder_time = files[-1].time.split('-')[0] + '-' + folder_time
         else:  # 可恶，没有文件，日期就设置为今年吧
             folder_time = datetime.today().strftime('%Y-%m-%d')
 
-        this_folder = FolderInfo(folder_name, folder_id, dir_pwd, folder_time, folder_desc, share_url)
-        return FolderDetail(LanZouCloud.SUCCESS, this_folder, files, sub_folders)
+        file_list = FileList()
+        for file in files:
+            file_list.append(file)
+
+        meta = entry.folder_meta
+        this_folder = FolderInfo(meta['name'], meta['id'], dir_pwd, folder_time, meta['desc'], share_url)
+        return FolderDetail(LanZouCloud.SUCCESS, this_folder, file_list, entry.sub_folders)
+
+    def get_folder_info_by_url(self, share_url, dir_pwd='', get_this_page=0) -> FolderDetail:
+        """获取文件夹里所有文件的信息"""
+        code, entry = self._parse_folder_page(share_url, dir_pwd)
+        if code != LanZouCloud.SUCCESS:
+            return FolderDetail(code)
+
+        # 提取改文件夹下全部文件
+        page = 1
+        if get_this_page > 0:
+            # 若外部设定仅获取某页，则初始参数为该页
+            page = get_this_page
+        files = []
+        while True:
+            if page >= 2 and get_this_page == 0:  # 连续的请求需要稍等一下
+                sleep(0.6)
+            code, page_files = self._get_folder_page(entry.post_data, page)
+            if code != LanZouCloud.SUCCESS:
+                return FolderDetail(code)
+            if page_files is None:  # 已经拿到全部的文件信息
+                break
+
+            files.extend(page_files)
+            page += 1  # 下一页
+
+            if get_this_page > 0:
+                # 若外部设定仅获取某页，则请求完该页就结束
+                break
+
+        return self._make_folder_detail(entry, files, share_url, dir_pwd)
+
+    def set_folder_index_ttl(self, ttl: float):
+        """设置文件夹索引缓存的有效期(秒)，为 0 时不缓存，该缓存在进程内共享"""
+        folder_index.ttl = ttl
+
+    def invalidate_folder_index(self, share_urls: List[str] = None):
+        """清除文件夹索引缓存，未指定分享链接时清除全部"""
+        folder_index.invalidate(share_urls)
+
+    def get_folder_info_by_url_concurrently(self, share_url, dir_pwd='', *, max_pages=100, max_workers=4,
+                                            stop_when=None) -> FolderDetail:
+        """并发获取文件夹中的文件信息，结果会在进程内缓存一段时间，有效期内重复调用无需再次请求
+        :param max_pages 最多获取的页数
+        :param max_workers 同时请求的页数
+        :param stop_when 每批页面获取完成后调用 stop_when(files)，返回 True 时不再获取后续页面，用于找到所需文件后尽早结束
+        """
+        entry = folder_index.get(share_url, dir_pwd)
+        if entry is None:
+            code, entry = self._parse_folder_page(share_url, dir_pwd)
+            if code != LanZouCloud.SUCCESS:
+                return FolderDetail(code)
+            folder_index.put(share_url, dir_pwd, entry)
+
+        with entry.lock:
+            while True:
+                fetched_pages = entry.contiguous_pages()
+                if entry.is_complete() or fetched_pages >= max_pages:
+                    break
+                if stop_when is not None and fetched_pages > 0 and stop_when(entry.files()):
+                    break
+
+                batch = list(range(fetched_pages + 1, min(fetched_pages + max_workers, max_pages) + 1))
+                if entry.last_page is not None:
+                    batch = [page for page in batch if page <= entry.last_page]
+                batch = [page for page in batch if page not in entry.pages]
+
+                with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+                    results = list(pool.map(lambda page: self._get_folder_page(entry.post_data, page), batch))
+
+                for page, (code, page_files) in zip(batch, results):
+                    if code != LanZouCloud.SUCCESS:
+                        folder_index.invalidate([share_url])
+                        return FolderDetail(code)
+                    if page_files is None:
+                        # 超出了最后一页
+                        last_page = page - 1
+                        if entry.last_page is None or last_page < entry.last_page:
+                            entry.last_page = last_page
+                    else:
+                        entry.pages[page] = page_files
+
+            files = entry.files()
+
+        return self._make_folder_detail(entry, files, share_url, dir_pwd)
 
     def get_folder_info_by_id(self, folder_id):
         """通过 id 获取文件夹及内部文件信息"""
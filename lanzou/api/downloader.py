@@ -0,0 +1,267 @@
+"""
+分段并发下载，使用多个 Range 请求同时下载同一个文件的不同部分
+
+下载中的数据会直接写入预先分配好大小的临时文件的对应位置，各分段的进度会定期写入记录文件，
+中断后再次下载同一文件时会从记录中恢复，仅下载尚未完成的部分
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+import requests
+
+from lanzou.api.utils import logger
+
+__all__ = ['SegmentedDownloader', 'DownloadStat', 'get_range_support_size', 'calc_file_hash']
+
+# 下载结果统计信息，speed 单位为 字节/秒
+DownloadStat = namedtuple('DownloadStat', ['ok', 'size', 'downloaded_size', 'seconds', 'speed', 'segment_count', 'file_hash'],
+                          defaults=(False, 0, 0, 0.0, 0.0, 0, ''))
+
+
+def get_range_support_size(session: requests.Session, url: str, headers: dict, timeout=15) -> int:
+    """检查服务器是否支持 Range 请求，若支持则返回文件总大小，否则返回 -1"""
+    try:
+        resp = session.get(url, headers={**headers, 'Range': 'bytes=0-0'}, stream=True, timeout=timeout, verify=False)
+    except requests.RequestException:
+        return -1
+
+    try:
+        # 支持的话，会返回形如 Content-Range: bytes 0-0/123456 的头部
+        content_range = resp.headers.get('Content-Range', '')
+        if resp.status_code != 206 or '/' not in content_range:
+            return -1
+
+        total_size = content_range.split('/')[-1].strip()
+        if not total_size.isdigit():
+            return -1
+
+        return int(total_size)
+    finally:
+        resp.close()
+
+
+def calc_file_hash(file_path: str, hash_algorithm='sha256', chunk_size=1048576) -> str:
+    """计算文件哈希值"""
+    hasher = hashlib.new(hash_algorithm)
+    with open(file_path, 'rb') as f:
+        chunk = f.read(chunk_size)
+        while chunk:
+            hasher.update(chunk)
+            chunk = f.read(chunk_size)
+    return hasher.hexdigest()
+
+
+class SegmentedDownloader:
+    """分段并发下载器
+
+    记录文件中保存 总大小 以及每个分段的 [起始位置, 结束位置(含), 已下载字节数]，
+    总大小与记录不一致时（比如服务器上文件已更新）会丢弃旧的记录和临时文件重新下载
+    """
+
+    record_suffix = '.segments'
+
+    def __init__(self, session: requests.Session, headers: dict, *, thread_count=4, min_segment_size=1048576,
+                 timeout=15, chunk_size=65536, save_record_interval=1.0):
+        self._session = session
+        self._headers = headers
+        self._thread_count = max(thread_count, 1)
+        self._min_segment_size = min_segment_size  # 单个分段的最小大小，避免小文件被切得太碎
+        self._timeout = timeout
+        self._chunk_size = chunk_size
+        self._save_record_interval = save_record_interval  # 保存下载进度记录的最小间隔，单位秒
+
+        self._lock = threading.Lock()
+        self._segments = []  # type: List[List[int]]
+        self._total_size = 0
+        self._record_file = ''
+        self._last_save_record_time = 0.0
+        self._stop = threading.Event()
+
+    def download(self, url: str, tmp_file_path: str, total_size: int, *, expected_hash='', hash_algorithm='sha256',
+                 callback=None, file_name='') -> DownloadStat:
+        """下载 url 对应的文件到 tmp_file_path，下载并校验完成后返回的统计信息中 ok 为 True
+        :param expected_hash 若不为空，下载完成后将校验文件哈希值，不一致时视为失败，并移除已下载的数据
+        :param callback 用于显示下载进度 callback(file_name, total_size, now_size)
+        """
+        file_name = file_name or os.path.basename(tmp_file_path)
+        self._total_size = total_size
+        self._record_file = tmp_file_path + self.record_suffix
+        self._stop.clear()
+
+        self._prepare(tmp_file_path)
+
+        already_downloaded = self._downloaded_size()
+        unfinished = [idx for idx, seg in enumerate(self._segments) if not self._is_segment_finished(seg)]
+        logger.debug(f"Segmented download {file_name}: size={total_size}, segments={len(self._segments)}, "
+                     f"unfinished={len(unfinished)}, resume_from={already_downloaded}")
+
+        start_time = time.time()
+        ok = True
+        if unfinished:
+            with ThreadPoolExecutor(max_workers=min(self._thread_count, len(unfinished))) as pool:
+                futures = [pool.submit(self._download_segment, url, tmp_file_path, idx, file_name, callback) for idx in unfinished]
+                for future in as_completed(futures):
+                    try:
+                        segment_ok = future.result()
+                    except Exception as e:
+                        logger.debug(f"Download segment of {file_name} raised exception: {e}")
+                        segment_ok = False
+
+                    if not segment_ok:
+                        # 任意一个分段失败时，通知其他分段尽快停止，已下载的进度会保存到记录文件中，以便下次续传
+                        ok = False
+                        self._stop.set()
+
+        self._save_record(force=True)
+        seconds = max(time.time() - start_time, 1e-6)
+        downloaded_size = self._downloaded_size() - already_downloaded
+
+        if not ok or self._downloaded_size() != total_size:
+            logger.debug(f"Segmented download {file_name} failed, progress saved to {self._record_file}")
+            return DownloadStat(False, total_size, downloaded_size, seconds, downloaded_size / seconds, len(self._segments))
+
+        file_hash = ''
+        if expected_hash != '':
+            file_hash = calc_file_hash(tmp_file_path, hash_algorithm)
+            if file_hash.lower() != expected_hash.lower():
+                logger.error(f"Hash mismatch for {file_name}: expected={expected_hash}, actual={file_hash}")
+                self.remove_progress(tmp_file_path)
+                return DownloadStat(False, total_size, downloaded_size, seconds, downloaded_size / seconds, len(self._segments), file_hash)
+
+        # 全部分段下载完成，记录文件可以删除
+        os.remove(self._record_file)
+
+        stat = DownloadStat(True, total_size, downloaded_size, seconds, downloaded_size / seconds, len(self._segments), file_hash)
+        logger.debug(f"Segmented download {file_name} finished: {stat}")
+        return stat
+
+    @classmethod
+    def has_progress(cls, tmp_file_path: str) -> bool:
+        """是否存在分段下载的进度记录"""
+        return os.path.exists(tmp_file_path + cls.record_suffix)
+
+    @classmethod
+    def remove_progress(cls, tmp_file_path: str):
+        """移除分段下载的临时文件和进度记录"""
+        for path in [tmp_file_path, tmp_file_path + cls.record_suffix]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _prepare(self, tmp_file_path: str):
+        """读取下载记录，或者初始化分段信息并预分配临时文件"""
+        record = self._load_record()
+        if record is not None and record['total_size'] == self._total_size and os.path.exists(tmp_file_path) \
+                and os.path.getsize(tmp_file_path) == self._total_size:
+            self._segments = record['segments']
+            logger.debug(f"Find segmented download record file: {self._record_file}")
+            return
+
+        # 记录无效或不存在，重新开始下载
+        self.remove_progress(tmp_file_path)
+        self._segments = self._split_segments()
+
+        # 预分配文件大小，各分段直接写入对应位置
+        with open(tmp_file_path, 'wb') as f:
+            f.truncate(self._total_size)
+
+        self._save_record(force=True)
+
+    def _split_segments(self) -> List[List[int]]:
+        segment_count = max(min(self._thread_count, self._total_size // self._min_segment_size), 1)
+        segment_size = self._total_size // segment_count
+
+        segments = []
+        for idx in range(segment_count):
+            start = idx * segment_size
+            end = self._total_size - 1 if idx == segment_count - 1 else start + segment_size - 1
+            segments.append([start, end, 0])
+
+        return segments
+
+    def _download_segment(self, url: str, tmp_file_path: str, idx: int, file_name: str, callback) -> bool:
+        start, end, downloaded = self._segments[idx]
+        headers = {**self._headers, 'Range': f'bytes={start + downloaded}-{end}'}
+        try:
+            resp = self._session.get(url, headers=headers, stream=True, timeout=self._timeout, verify=False)
+        except requests.RequestException as e:
+            logger.debug(f"Download segment {idx} of {file_name} failed: {e}")
+            return False
+
+        with resp:
+            if resp.status_code != 206:
+                # 服务器忽略了 Range 头部，直接写入会导致数据错位
+                logger.debug(f"Download segment {idx} of {file_name} failed: status_code={resp.status_code}")
+                return False
+
+            try:
+                # 不使用缓冲，确保写入记录文件的进度对应的数据已经交给系统
+                with open(tmp_file_path, 'r+b', buffering=0) as f:
+                    f.seek(start + downloaded)
+                    for chunk in resp.iter_content(self._chunk_size):
+                        if self._stop.is_set():
+                            return False
+                        if not chunk:
+                            continue
+
+                        # 防止服务器返回超出请求范围的数据
+                        chunk = chunk[:end - start + 1 - downloaded]
+                        f.write(chunk)
+                        downloaded += len(chunk)
+
+                        with self._lock:
+                            self._segments[idx][2] = downloaded
+                            now_size = self._downloaded_size()
+                        self._save_record()
+
+                        if callback is not None:
+                            callback(file_name, self._total_size, now_size)
+
+                        if downloaded >= end - start + 1:
+                            break
+            except requests.RequestException as e:
+                logger.debug(f"Download segment {idx} of {file_name} interrupted: {e}")
+                return False
+
+        return self._is_segment_finished(self._segments[idx])
+
+    def _downloaded_size(self) -> int:
+        return sum(seg[2] for seg in self._segments)
+
+    def _is_segment_finished(self, segment: List[int]) -> bool:
+        start, end, downloaded = segment
+        return downloaded >= end - start + 1
+
+    def _load_record(self) -> Optional[dict]:
+        if not os.path.exists(self._record_file):
+            return None
+
+        try:
+            with open(self._record_file, 'rb') as rf:
+                record = pickle.load(rf)
+            if isinstance(record, dict) and 'total_size' in record and 'segments' in record:
+                return record
+        except Exception:  # 记录文件可能在写入过程中被中断，此时视为无效记录
+            pass
+
+        return None
+
+    def _save_record(self, force=False):
+        with self._lock:
+            now = time.time()
+            if not force and now - self._last_save_record_time < self._save_record_interval:
+                return
+            self._last_save_record_time = now
+
+            # 先写到临时文件再替换，避免中断时记录文件损坏
+            # 注意：记录中的进度可能略落后于实际写入的数据，续传时重复下载这部分数据即可，不影响正确性
+            record = {'total_size': self._total_size, 'segments': [list(seg) for seg in self._segments]}
+            with open(self._record_file + '.tmp', 'wb') as rf:
+                pickle.dump(record, rf)
+            os.replace(self._record_file + '.tmp', self._record_file)
@@ -0,0 +1,85 @@
+"""
+文件夹文件列表的索引缓存，同一进程内的多个 LanZouCloud 实例共享
+
+蓝奏云文件夹的文件列表需要逐页请求，一次发布或更新流程中会多次查询同一个文件夹，
+这里按 (分享链接, 提取码) 缓存已获取的各页数据，在有效期内的重复查询无需再次请求
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+__all__ = ['FolderIndexEntry', 'FolderIndex', 'folder_index']
+
+
+class FolderIndexEntry:
+    """单个文件夹的索引，记录解析分享页得到的文件夹信息，以及已获取的各页文件列表"""
+
+    def __init__(self, folder_meta: dict, sub_folders, post_data: dict):
+        self.folder_meta = folder_meta  # 文件夹名称、id、描述等信息
+        self.sub_folders = sub_folders
+        self.post_data = post_data  # 获取各页文件列表时需要的请求参数
+        self.pages = {}  # type: Dict[int, list]
+        self.last_page = None  # type: Optional[int] # 最后一页的页码，尚未获取到最后一页时为 None
+        self.created_at = time.time()
+        self.lock = threading.Lock()
+
+    def contiguous_pages(self) -> int:
+        """从第一页开始，连续已获取的页数"""
+        page = 0
+        while page + 1 in self.pages:
+            page += 1
+        return page
+
+    def files(self) -> list:
+        """按页码顺序返回从第一页开始连续获取到的文件"""
+        files = []
+        for page in range(1, self.contiguous_pages() + 1):
+            files.extend(self.pages[page])
+        return files
+
+    def is_complete(self) -> bool:
+        """是否已获取全部页面"""
+        return self.last_page is not None and self.contiguous_pages() >= self.last_page
+
+    def is_expired(self, ttl: float) -> bool:
+        return time.time() - self.created_at > ttl
+
+
+class FolderIndex:
+    """按 (分享链接, 提取码) 缓存文件夹索引，超过有效期后丢弃"""
+
+    def __init__(self, ttl=120):
+        self.ttl = ttl  # 缓存有效期，单位秒，为 0 时不缓存
+        self._entries = {}  # type: Dict[Tuple[str, str], FolderIndexEntry]
+        self._lock = threading.Lock()
+
+    def get(self, share_url: str, dir_pwd: str) -> Optional[FolderIndexEntry]:
+        with self._lock:
+            entry = self._entries.get((share_url, dir_pwd))
+            if entry is None:
+                return None
+            if entry.is_expired(self.ttl):
+                del self._entries[(share_url, dir_pwd)]
+                return None
+            return entry
+
+    def put(self, share_url: str, dir_pwd: str, entry: FolderIndexEntry):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(share_url, dir_pwd)] = entry
+
+    def invalidate(self, share_urls: Optional[List[str]] = None):
+        """移除指定分享链接的缓存，未指定时清空全部缓存，在上传、移动、删除文件后调用"""
+        with self._lock:
+            if share_urls is None:
+                self._entries.clear()
+                return
+
+            for key in list(self._entries.keys()):
+                if key[0] in share_urls:
+                    del self._entries[key]
+
+
+folder_index = FolderIndex()
@@ -16,7 +16,9 @@ __all__ = ['logger', 'remove_notes', 'name_format', 'time_format', 'is_name_vali
 
 # 调试日志设置
 logger = logging.getLogger('lanzou')
-logger.setLevel(logging.ERROR)
+if logger.level == logging.NOTSET:
+    # 使用方可能在导入本模块之前就已经设置了日志级别
+    logger.setLevel(logging.ERROR)
 formatter = logging.Formatter(
     fmt="%(asctime)s [line:%(lineno)d] %(funcName)s %(levelname)s - %(message)s",
     datefmt="%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,76 @@
+# 延迟导入，用于降低启动耗时
+#
+# 部分第三方库（如selenium的webdriver）导入耗时较长，但仅在部分流程中才会用到，
+# 通过 lazy_import/lazy_object 获取的模块或对象在首次被访问时才会实际导入
+#
+# note: pyinstaller无法分析出通过字符串指定的模块，因此所有延迟导入的模块都需要登记在 lazy_modules 中，打包时会作为 hidden import 传入
+import importlib
+from types import ModuleType
+from typing import Any
+
+lazy_modules = [
+    "selenium.webdriver",
+    "selenium.webdriver.chrome.options",
+    "selenium.webdriver.chrome.service",
+    "selenium.webdriver.common.action_chains",
+    "selenium.webdriver.common.by",
+    "selenium.webdriver.common.desired_capabilities",
+    "selenium.webdriver.support.expected_conditions",
+    "selenium.webdriver.support.ui",
+]
+
+
+class LazyModule(ModuleType):
+    """
+    延迟导入的模块，首次访问其属性时才会导入实际的模块
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+
+    def __getattr__(self, attr: str) -> Any:
+        # 仅在本对象上找不到属性时才会调用，首次调用后会将实际模块的属性复制过来，之后的访问不再经过这里
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+class LazyObject:
+    """
+    延迟导入的模块中的某个对象，如类或函数，首次访问其属性或调用时才会导入实际的模块
+    """
+
+    def __init__(self, module_name: str, name: str):
+        self._module_name = module_name
+        self._name = name
+        self._target = None
+
+    def _resolve(self) -> Any:
+        if self._target is None:
+            self._target = getattr(importlib.import_module(self._module_name), self._name)
+
+        return self._target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._module_name}.{self._name}>"
+
+
+def lazy_import(module_name: str) -> ModuleType:
+    check_registered(module_name)
+    return LazyModule(module_name)
+
+
+def lazy_object(module_name: str, name: str) -> Any:
+    check_registered(module_name)
+    return LazyObject(module_name, name)
+
+
+def check_registered(module_name: str):
+    if module_name not in lazy_modules:
+        raise ValueError(f"延迟导入的模块 {module_name} 需要先登记到 lazy_modules 中，否则打包后将无法导入")
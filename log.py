@@ -122,13 +122,9 @@ consoleHandler.setFormatter(consoleLogFormatter)
 consoleHandler.setLevel(logging.INFO)
 logger.addHandler(consoleHandler)
 
-try:
-    from lanzou.api.utils import logger as lanzou_logger
-
-    # 将lanzou的日志也显示
-    lanzou_logger.setLevel(logging.INFO)
-except Exception:
-    pass
+# 将lanzou的日志也显示（直接通过名称获取，避免导入lanzou及其依赖的网络库）
+lanzou_logger = logging.getLogger('lanzou')
+lanzou_logger.setLevel(logging.INFO)
 
 
 def color(color_name):
@@ -13,6 +13,7 @@ import argparse
 from check_first_run import check_first_run_async
 from log import log_directory
 from main_def import *
+from network import show_host_stats
 from pool import close_pool, init_pool
 from show_usage import *
 from usage_count import *
@@ -165,6 +166,9 @@ def main():
     # 运行结束展示下多进程信息
     show_multiprocessing_info(cfg)
 
+    # 展示本进程中各域名的请求次数和耗时，方便定位网络方面的瓶颈
+    show_host_stats()
+
     # 检查是否有更新，用于提示未购买自动更新的朋友去手动更新~
     if cfg.common.check_update_on_end:
         check_update(cfg)
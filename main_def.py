@@ -6,15 +6,16 @@ from dao import BuyRecord
 from djc_helper import (DjcHelper, get_prize_names, is_new_version_ark_lottery,
                         run_act)
 from first_run import *
+from network import http_request
 from notice import NoticeManager
 from pool import get_pool, init_pool
 from qq_login import QQLogin
-from qzone_activity import QzoneActivity
+from qzone_activity import QzoneActivity, clear_page_data_cache
 from setting import *
 from show_usage import *
 from update import check_update_on_start, get_update_info
 from upload_lanzouyun import Uploader
-from urls import Urls, get_not_ams_act_desc
+from urls import get_not_ams_act_desc, get_urls
 from usage_count import *
 from version import author
 
@@ -265,6 +266,9 @@ def get_owned_card_infos_sort_by_count(card_name_to_counts: Dict[str, int]) -> L
 
 
 def query_account_ark_lottery_info(idx: int, total_account: int, account_config: AccountConfig, common_config: CommonConfig) -> Tuple[Dict[str, int], Dict[str, int], DjcHelper]:
+    # 可能在进程池中运行，此时其他进程中的赠送卡片等操作不会清空本进程中的页面缓存，因此先清空，确保获取的是最新数据
+    clear_page_data_cache()
+
     djcHelper = DjcHelper(account_config, common_config)
     lr = djcHelper.fetch_pskey()
     if lr is None:
@@ -336,7 +340,7 @@ def send_card(target_qq: str, qq_to_card_name_to_counts: Dict[str, Dict[str, int
 
                     index = new_ark_lottery_parse_index_from_card_id(card_name)
                 else:
-                    card_info_map = parse_card_group_info_map(qq_to_djcHelper[target_qq].zzconfig)
+                    card_info_map = card_group_info_map()
 
                     send_ok = qq_to_djcHelper[qq].send_card(card_name, card_info_map[card_name].id, target_qq).get('ecode', -1) == 0
                     index = card_info_map[card_name].index
@@ -497,7 +501,7 @@ def make_ark_lottery_card_and_award_info():
             prizeDisplayTitles.append(title)
     else:
         lottery_zzconfig = zzconfig()
-        card_info_map = parse_card_group_info_map(lottery_zzconfig)
+        card_info_map = card_group_info_map()
         # 卡片编码 => 名称
         for name, card_info in card_info_map.items():
             order_map[card_info.index] = name
@@ -524,6 +528,9 @@ def query_lottery_status(idx: int, account_config: AccountConfig, common_config:
     if not account_config.ark_lottery.show_status:
         return
 
+    # 可能在进程池中运行，此时其他进程中的赠送卡片等操作不会清空本进程中的页面缓存，因此先清空，确保获取的是最新数据
+    clear_page_data_cache()
+
     djcHelper = DjcHelper(account_config, common_config)
     lr = djcHelper.fetch_pskey()
     if lr is None:
@@ -610,7 +617,7 @@ def show_activity_info(cfg: Config):
     logger.info("")
     _show_head_line("部分活动信息")
     logger.warning("如果一直卡在这一步，请在小助手目录下创建一个空文件：不查询活动.txt")
-    Urls().show_current_valid_act_infos()
+    get_urls().show_current_valid_act_infos()
 
     user_buy_info = get_user_buy_info(cfg.get_qq_accounts(), show_dlc_info=False)
     show_activities_summary(cfg, user_buy_info)
@@ -1270,15 +1277,11 @@ def has_buy_auto_updater_dlc_and_query_ok(qq_accounts: List[str], max_retry_coun
             has_no_users = True
             for remote_filename in [uploader.buy_auto_updater_users_filename, uploader.cs_buy_auto_updater_users_filename]:
                 try:
-                    user_list_filepath = uploader.download_file_in_folder(uploader.folder_online_files, remote_filename, downloads_dir, show_log=show_log, try_compressed_version_first=True)
+                    buy_users = uploader.load_synced_json(uploader.folder_online_files, remote_filename, downloads_dir, show_log=show_log)  # type: List[str]
                 except FileNotFoundError:
                     # 如果网盘没有这个文件，就跳过
                     continue
 
-                buy_users = []
-                with open(user_list_filepath, 'r', encoding='utf-8') as data_file:
-                    buy_users = json.load(data_file)
-
                 if len(buy_users) != 0:
                     has_no_users = False
 
@@ -1334,7 +1337,7 @@ def get_user_buy_info_from_server(qq_accounts: List[str]) -> Tuple[BuyInfo, bool
         if len(qq_accounts) != 0:
             def fetch_query_info_from_server() -> str:
                 server_addr = get_pay_server_addr()
-                raw_res = requests.post(f"{server_addr}/query_buy_info", json=qq_accounts, timeout=20)
+                raw_res = http_request("POST", f"{server_addr}/query_buy_info", json=qq_accounts, timeout=20)
 
                 if raw_res.status_code == 200:
                     return raw_res.text
@@ -1372,30 +1375,12 @@ def get_user_buy_info_from_netdisk(qq_accounts: List[str], max_retry_count=3, re
                 user_buy_info = user_buy_info_list[idx]
 
                 try:
-                    buy_info_filepath = uploader.download_file_in_folder(uploader.folder_online_files, remote_filename, downloads_dir, show_log=show_log, try_compressed_version_first=True)
+                    # 付费信息文件内容未变化时，将直接复用本进程之前解析的结果
+                    buy_users = uploader.load_synced_json(uploader.folder_online_files, remote_filename, downloads_dir, show_log=show_log, parse=parse_buy_users)
                 except FileNotFoundError:
                     # 如果网盘没有这个文件，就跳过
                     continue
 
-                buy_users = {}  # type: Dict[str, BuyInfo]
-
-                def update_if_longer(qq: str, info: BuyInfo):
-                    if qq not in buy_users:
-                        buy_users[qq] = info
-                    else:
-                        # 如果已经在其他地方已经出现过这个QQ，则仅当新的付费信息过期时间较晚时才覆盖
-                        old_info = buy_users[qq]
-                        if time_less(old_info.expire_at, info.expire_at):
-                            buy_users[qq] = info
-
-                with open(buy_info_filepath, 'r', encoding='utf-8') as data_file:
-                    raw_infos = json.load(data_file)
-                    for qq, raw_info in raw_infos.items():
-                        info = BuyInfo().auto_update_config(raw_info)
-                        update_if_longer(qq, info)
-                        for game_qq in info.game_qqs:
-                            update_if_longer(game_qq, info)
-
                 if len(buy_users) != 0:
                     has_no_users = False
 
@@ -1440,6 +1425,28 @@ def get_user_buy_info_from_netdisk(qq_accounts: List[str], max_retry_count=3, re
     return default_user_buy_info, False
 
 
+def parse_buy_users(raw_infos: Dict[str, dict]) -> Dict[str, BuyInfo]:
+    """解析网盘中的付费信息，返回 QQ => 付费信息，包括各个附属QQ"""
+    buy_users = {}  # type: Dict[str, BuyInfo]
+
+    def update_if_longer(qq: str, info: BuyInfo):
+        if qq not in buy_users:
+            buy_users[qq] = info
+        else:
+            # 如果已经在其他地方已经出现过这个QQ，则仅当新的付费信息过期时间较晚时才覆盖
+            old_info = buy_users[qq]
+            if time_less(old_info.expire_at, info.expire_at):
+                buy_users[qq] = info
+
+    for qq, raw_info in raw_infos.items():
+        info = BuyInfo().auto_update_config(raw_info)
+        update_if_longer(qq, info)
+        for game_qq in info.game_qqs:
+            update_if_longer(game_qq, info)
+
+    return buy_users
+
+
 def try_add_extra_times(user_buy_info: BuyInfo, has_buy_dlc: bool, show_dlc_info: bool):
     if has_buy_dlc:
         add_extra_times_for_dlc(user_buy_info, show_dlc_info)
@@ -1,4 +1,9 @@
-from urllib.parse import unquote_plus
+import copy
+import os
+import re
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import unquote_plus, urlparse
 
 import requests
 
@@ -40,7 +45,7 @@ class Network:
             }}
             if extra_headers is not None:
                 get_headers = {**get_headers, **extra_headers}
-            return requests.get(url, headers=get_headers, timeout=self.common_cfg.http_timeout)
+            return http_request("GET", url, headers=get_headers, timeout=self.common_cfg.http_timeout)
 
         res = try_request(request_fn, self.common_cfg.retry, check_fn)
         return process_result(ctx, res, pretty, print_res, is_jsonp, is_normal_jsonp, need_unquote)
@@ -59,7 +64,7 @@ class Network:
             }}
             if extra_headers is not None:
                 post_headers = {**post_headers, **extra_headers}
-            return requests.post(url, data=data, json=json, headers=post_headers, timeout=self.common_cfg.http_timeout)
+            return http_request("POST", url, data=data, json=json, headers=post_headers, timeout=self.common_cfg.http_timeout)
 
         if not disable_retry:
             res = try_request(request_fn, self.common_cfg.retry, check_fn)
@@ -103,6 +108,215 @@ def try_request(request_fn: Callable[[], requests.Response], retryCfg: RetryConf
     logger.error(f"重试{retryCfg.max_retry_count}次后仍失败")
 
 
+_http_session = None  # type: Optional[requests.Session]
+_http_session_pid = 0
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    返回当前进程共用的会话，从而复用连接池中的连接，避免每次请求都重新建立连接
+    子进程中会重新创建，避免与父进程共用同一个连接
+    """
+    global _http_session, _http_session_pid
+    with _http_session_lock:
+        if _http_session is None or _http_session_pid != os.getpid():
+            session = requests.Session()
+            # 不同账号的请求共用这个会话，因此不在会话中保存服务器返回的cookie，避免串号，各请求自行在headers中设置cookie
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+            _http_session = session
+            _http_session_pid = os.getpid()
+
+        return _http_session
+
+
+# 各域名两次请求之间的最小间隔（秒），用于统一限制对某些域名的请求频率，未配置的域名不做限制
+host_min_request_interval = {}  # type: Dict[str, float]
+_host_next_request_time = {}  # type: Dict[str, float]
+_rate_limit_lock = threading.Lock()
+
+
+def wait_for_rate_limit(host: str):
+    min_interval = host_min_request_interval.get(host, 0)
+    if min_interval <= 0:
+        return
+
+    with _rate_limit_lock:
+        now = time.time()
+        request_time = max(now, _host_next_request_time.get(host, 0))
+        _host_next_request_time[host] = request_time + min_interval
+
+    if request_time > now:
+        time.sleep(request_time - now)
+
+
+class HostStat:
+    def __init__(self, host: str):
+        self.host = host
+        self.count = 0
+        self.failed_count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+_host_stats = {}  # type: Dict[str, HostStat]
+_host_stats_lock = threading.Lock()
+
+
+def record_host_stat(host: str, seconds: float, ok: bool):
+    with _host_stats_lock:
+        if host not in _host_stats:
+            _host_stats[host] = HostStat(host)
+        stat = _host_stats[host]
+
+        stat.count += 1
+        if not ok:
+            stat.failed_count += 1
+        stat.total_seconds += seconds
+        stat.max_seconds = max(stat.max_seconds, seconds)
+
+
+def get_host_stats() -> List[HostStat]:
+    """
+    返回当前进程中各域名的请求统计，按总耗时从高到低排序
+    """
+    with _host_stats_lock:
+        stats = [copy.copy(stat) for stat in _host_stats.values()]
+
+    return sorted(stats, key=lambda stat: stat.total_seconds, reverse=True)
+
+
+def show_host_stats():
+    stats = get_host_stats()
+    if len(stats) == 0:
+        return
+
+    total_count = sum(stat.count for stat in stats)
+    total_seconds = sum(stat.total_seconds for stat in stats)
+    lines = [f"本进程共发出 {total_count} 个http请求，累计耗时 {total_seconds:.2f} 秒，各域名情况如下："]
+    for stat in stats:
+        lines.append(f"    {stat.host:40s} 请求 {stat.count:4d} 次 失败 {stat.failed_count:3d} 次 累计 {stat.total_seconds:7.2f} 秒 平均 {stat.total_seconds / stat.count:5.2f} 秒 最长 {stat.max_seconds:5.2f} 秒")
+
+    logger.info(color("bold_black") + "\n".join(lines))
+
+
+def http_request(method: str, url: str, retry_cfg: Optional[RetryConfig] = None, check_fn: Callable[[requests.Response], Optional[Exception]] = None, **kwargs) -> Optional[requests.Response]:
+    """
+    所有对外http请求的统一入口，共用连接池，并统一进行限速和按域名统计耗时
+    :param retry_cfg: 不为None时，按照该配置通过 try_request 进行重试（所有重试均失败时返回None），否则仅请求一次，出错时直接抛出异常
+    :param kwargs: 透传给 requests.Session.request 的参数，如 headers/data/json/timeout/stream
+    """
+
+    def request_fn() -> requests.Response:
+        host = urlparse(url).netloc
+        wait_for_rate_limit(host)
+
+        start_time = time.time()
+        ok = False
+        try:
+            res = get_http_session().request(method, url, **kwargs)
+            ok = True
+            return res
+        finally:
+            record_host_stat(host, time.time() - start_time, ok)
+
+    if retry_cfg is None:
+        return request_fn()
+
+    return try_request(request_fn, retry_cfg, check_fn)
+
+
+class StreamingJsonExtractor:
+    """
+    从分块读取的文本中提取紧跟在 prefix 之后的json对象或数组
+    每次传入新的文本块后仅扫描新增部分，对象闭合后即可停止读取剩余内容
+    """
+
+    # 在字符串外/内时需要关注的字符，其余字符可以直接跳过
+    re_outside_string = re.compile(r'[{}\[\]"]')
+    re_inside_string = re.compile(r'["\\]')
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.text = ""
+        self.started = False
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+
+        self.done = False
+        self.result = None
+
+    def feed(self, chunk: str) -> bool:
+        """
+        传入新读取的文本块，若json已经完整，则解析并保存到 result 中，并返回True
+        """
+        self.text += chunk
+
+        if not self.started:
+            idx = self.text.find(self.prefix)
+            if idx == -1:
+                # 仅保留末尾可能是前缀一部分的内容
+                self.text = self.text[max(len(self.text) - len(self.prefix) + 1, 0):]
+                return False
+
+            self.text = self.text[idx + len(self.prefix):]
+            self.started = True
+
+        text = self.text
+        pos = self.pos
+        while True:
+            if self.in_string:
+                match = self.re_inside_string.search(text, pos)
+                if match is None:
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(text):
+                        # 转义符在当前块的末尾，等下一块到来后再处理
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                else:
+                    self.in_string = False
+                    pos = match.end()
+            else:
+                match = self.re_outside_string.search(text, pos)
+                if match is None:
+                    break
+                pos = match.end()
+
+                char = match.group()
+                if char == '"':
+                    self.in_string = True
+                elif char in "{[":
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self.result = json.loads(text[:pos])
+                        self.done = True
+                        return True
+
+        self.pos = min(pos, len(text))
+        return False
+
+
+def fetch_json_in_page(url: str, prefix: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None, method="POST", chunk_size=16 * 1024):
+    """
+    流式请求页面，并提取其中紧跟在 prefix 之后的json数据（如 window.syncData = {...}），读取到json结束后即不再下载页面剩余内容
+    """
+    with http_request(method, url, headers=headers, timeout=timeout, stream=True) as res:
+        fix_encoding(res)
+
+        extractor = StreamingJsonExtractor(prefix)
+        for chunk in res.iter_content(chunk_size, decode_unicode=True):
+            if extractor.feed(chunk):
+                return extractor.result
+
+    raise Exception(f"页面 {url} 中未找到完整的 {prefix} 数据, status_code={res.status_code}")
+
+
 # 每次处理完备份一次最后的报错，方便出错时打印出来~
 last_response_info = None  # type: Optional[ResponseInfo]
 
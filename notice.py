@@ -2,7 +2,7 @@ import json
 import os.path
 
 from const import downloads_dir
-from data_struct import to_raw_type
+from data_struct import dump_json
 from first_run import *
 from update import version_less
 from upload_lanzouyun import Uploader
@@ -81,35 +81,26 @@ class NoticeManager:
     @try_except()
     def load(self, from_remote=True):
         if from_remote:
-            path = self.cache_path
-            # 下载最新公告
-            self.download_latest_notices()
+            # 同步最新公告，内容未变化时直接复用本进程之前解析的结果
+            uploader = Uploader()
+            notices = uploader.load_synced_json(uploader.folder_online_files, self.file_name, os.path.dirname(self.cache_path), parse=parse_notices)
+            self.notices.extend(notices)
         else:
-            path = self.save_path
-
-        if not os.path.isfile(path):
-            return
+            if not os.path.isfile(self.save_path):
+                return
 
-        # 读取公告
-        with open(path, 'r', encoding='utf-8') as save_file:
-            for raw_notice in json.load(save_file):
-                notice = Notice().auto_update_config(raw_notice)
-                self.notices.append(notice)
+            # 读取公告
+            with open(self.save_path, 'r', encoding='utf-8') as save_file:
+                self.notices.extend(parse_notices(json.load(save_file)))
 
         self.notices = sorted(self.notices)
         logger.info("公告读取完毕")
 
-    def download_latest_notices(self):
-        uploader = Uploader()
-
-        dirpath, filename = os.path.dirname(self.cache_path), os.path.basename(self.cache_path)
-        uploader.download_file_in_folder(uploader.folder_online_files, filename, dirpath, try_compressed_version_first=True)
-
     @try_except()
     def save(self):
         # 本地存盘
         with open(self.save_path, 'w', encoding='utf-8') as save_file:
-            json.dump(to_raw_type(self.notices), save_file, ensure_ascii=False, indent=2)
+            dump_json(self.notices, save_file, indent=2)
             logger.info("公告存盘完毕")
 
         # 上传到网盘
@@ -154,6 +145,10 @@ class NoticeManager:
         logger.info(f"添加公告：{notice}")
 
 
+def parse_notices(raw_notices: List[dict]) -> List[Notice]:
+    return sorted(Notice().auto_update_config(raw_notice) for raw_notice in raw_notices)
+
+
 def main():
     # 初始化
     nm = NoticeManager(load_from_remote=False)
@@ -2,17 +2,8 @@
 from collections import Counter
 from urllib.parse import quote_plus, unquote_plus
 
-from selenium import webdriver
 from selenium.common.exceptions import (StaleElementReferenceException,
                                         TimeoutException)
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.webdriver import WebDriver
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-from selenium.webdriver.support import expected_conditions
-from selenium.webdriver.support.ui import WebDriverWait
 
 from compress import decompress_dir_with_bandizip
 from config import *
@@ -20,11 +11,21 @@ from dao import GuanJiaUserInfo
 from exceptions_def import (GithubActionLoginException,
                             SameAccountTryLoginAtMultipleThreadsException)
 from first_run import is_first_run_in
-from upload_lanzouyun import Uploader
+from lazy_import import lazy_import, lazy_object
 from urls import get_act_url
 from util import async_message_box, get_screen_size
 from version import now_version
 
+# selenium的webdriver导入耗时较长，且仅在需要登录时才会用到，因此延迟到首次使用时再导入
+webdriver = lazy_import("selenium.webdriver")
+expected_conditions = lazy_import("selenium.webdriver.support.expected_conditions")
+Options = lazy_object("selenium.webdriver.chrome.options", "Options")
+Service = lazy_object("selenium.webdriver.chrome.service", "Service")
+ActionChains = lazy_object("selenium.webdriver.common.action_chains", "ActionChains")
+By = lazy_object("selenium.webdriver.common.by", "By")
+DesiredCapabilities = lazy_object("selenium.webdriver.common.desired_capabilities", "DesiredCapabilities")
+WebDriverWait = lazy_object("selenium.webdriver.support.ui", "WebDriverWait")
+
 
 class LoginResult(ConfigInterface):
     def __init__(self, uin="", skey="", openid="", p_skey="", vuserid="", qc_openid="", qc_k="",
@@ -108,7 +109,7 @@ class QQLogin():
 
     def __init__(self, common_config, window_index=1):
         self.cfg = common_config  # type: CommonConfig
-        self.driver = None  # type: Optional[WebDriver]
+        self.driver = None  # type: Optional[webdriver.Chrome]
         self.window_title = ""
         self.time_start_login = datetime.datetime.now()
 
@@ -262,6 +263,8 @@ class QQLogin():
         logger.info("检查driver是否存在")
         if not os.path.isfile(self.chrome_driver_executable_path()):
             logger.info(color("bold_yellow") + f"未在小助手utils目录里发现 {chrome_driver_exe_name} ，将尝试从网盘下载")
+            from upload_lanzouyun import Uploader
+
             uploader = Uploader()
             uploader.download_file_in_folder(uploader.folder_djc_helper_tools, chrome_driver_exe_name, chrome_root_directory)
 
@@ -283,6 +286,8 @@ class QQLogin():
         # 尝试从网盘下载合适版本的便携版chrome
         if not os.path.isfile(self.chrome_binary_7z()):
             logger.info(color("bold_yellow") + f"本地未发现便携版chrome的压缩包，尝试自动从网盘下载 {zip_name}，需要下载大概80MB的压缩包，请耐心等候")
+            from upload_lanzouyun import Uploader
+
             uploader = Uploader()
             uploader.download_file_in_folder(uploader.folder_djc_helper_tools, zip_name, chrome_root_directory)
 
@@ -306,6 +311,8 @@ class QQLogin():
 
         # 走到这里，大概率是多线程并行下载导致文件出错了，尝试重新下载
         logger.info(color("bold_yellow") + "似乎chrome相关文件损坏了，尝试重新下载并解压")
+        from upload_lanzouyun import Uploader
+
         uploader = Uploader()
         uploader.download_file_in_folder(uploader.folder_djc_helper_tools, chrome_driver_exe_name, chrome_root_directory, cache_max_seconds=0, download_only_if_server_version_is_newer=False)
         uploader.download_file_in_folder(uploader.folder_djc_helper_tools, zip_name, chrome_root_directory, cache_max_seconds=0, download_only_if_server_version_is_newer=False)
@@ -1,20 +1,27 @@
 import datetime
-import json
 import random
 import time
 
-import requests
-
 from config import AccountConfig, CommonConfig
 from dao import DnfWarriorsCallInfo, GuanhuaiActInfo, RoleInfo
 from log import color, logger
-from network import process_result, try_request
+from network import fetch_json_in_page, http_request, process_result
 from qq_login import LoginResult
 from setting import *
 from sign import getACSRFTokenForAMS
-from urls import Urls, get_not_ams_act
+from urls import get_not_ams_act, get_urls
 from util import format_now, format_time, parse_time, uin2qq
 
+# 本次运行中已获取的QQ空间活动页面数据，key为 (QQ, 页面链接)，value为 (获取时间, 页面数据)
+# 页面数据中包含次数、卡片数目等会变化的数据，因此在进行任何活动操作或赠送卡片后都需要调用 clear_page_data_cache 清空
+# 多进程模式下其他进程的操作无法清空本进程的缓存，因此缓存仅在很短的时间内有效
+_page_data_cache = {}  # type: Dict[Tuple[str, str], Tuple[float, dict]]
+page_data_cache_ttl = 5
+
+
+def clear_page_data_cache():
+    _page_data_cache.clear()
+
 
 class QzoneActivity:
     def __init__(self, djc_helper, lr: LoginResult):
@@ -39,7 +46,7 @@ class QzoneActivity:
         self.zzconfig = djc_helper.zzconfig  # type: ArkLotteryZzConfig
 
         self.g_tk = getACSRFTokenForAMS(lr.p_skey)
-        self.urls = Urls()
+        self.urls = get_urls()
         # 使用QQ空间登录态进行抽卡活动
         self.headers = {
             "Accept": "application/json, text/javascript, */*; q=0.01",
@@ -98,7 +105,7 @@ class QzoneActivity:
 
     def take_ark_lottery_awards(self, print_warning=True):
         if self.cfg.ark_lottery.need_take_awards:
-            take_awards = parse_prize_list(self.zzconfig)
+            take_awards = prize_list()
 
             for award in take_awards:
                 for idx in range(award.count):
@@ -141,7 +148,7 @@ class QzoneActivity:
 
         logger.info(f"尝试消耗{count}张卡片【{card_name}】来进行抽奖")
 
-        card_info_map = parse_card_group_info_map(self.zzconfig)
+        card_info_map = card_group_info_map()
         ruleid = card_info_map[card_name].lotterySwitchId
         for idx in range(count):
             # 消耗卡片获得抽奖资格
@@ -388,28 +395,26 @@ class QzoneActivity:
     # ----------------- QQ空间活动通用逻辑 ----------------------
 
     def fetch_data(self, activity_page_url):
-        data_prefix = "window.syncData = "
-        data_suffix = ";\n</script>"
-
-        def request_fn():
-            return requests.post(activity_page_url, headers=self.headers, timeout=self.djc_helper.common_cfg.http_timeout)
-
-        def check_fn(response: requests.Response):
-            return data_prefix not in response.text
+        """
+        获取活动页面中的 window.syncData 数据，若在 page_data_cache_ttl 秒内已获取过且期间未进行过活动操作，则直接使用之前的结果
+        返回的数据可能被其他调用方共用，请勿修改
+        """
+        cache_key = (self.lr.uin, activity_page_url)
+        if cache_key in _page_data_cache:
+            fetch_time, data = _page_data_cache[cache_key]
+            if time.time() - fetch_time < page_data_cache_ttl:
+                return data
 
         retry_cfg = self.djc_helper.common_cfg.retry
         for i in range(retry_cfg.max_retry_count):
             try:
-                res = try_request(request_fn, self.djc_helper.common_cfg.retry)
-                page_html = res.text
-
-                prefix_idx = page_html.index(data_prefix) + len(data_prefix)
-                suffix_idx = page_html.index(data_suffix, prefix_idx)
-
-                return json.loads(page_html[prefix_idx:suffix_idx])
+                data = fetch_json_in_page(activity_page_url, "window.syncData = ", headers=self.headers, timeout=self.djc_helper.common_cfg.http_timeout)
+                _page_data_cache[cache_key] = (time.time(), data)
+                return data
             except Exception as e:
-                logger.debug("出错了", exc_info=e)
-                time.sleep(retry_cfg.retry_wait_time)
+                logger.debug(f"{i + 1}/{retry_cfg.max_retry_count}: 获取QQ空间活动数据出错了", exc_info=e)
+                if i + 1 != retry_cfg.max_retry_count:
+                    time.sleep(retry_cfg.retry_wait_time)
 
         raise Exception("无法正常获取QQ空间活动数据")
 
@@ -437,7 +442,8 @@ class QzoneActivity:
             countid=countid,
         )
 
-        request_fn = lambda: requests.post(url, raw_data, headers=self.headers, timeout=self.djc_helper.common_cfg.http_timeout)
-        res = try_request(request_fn, self.djc_helper.common_cfg.retry)
+        clear_page_data_cache()
+
+        res = http_request("POST", url, retry_cfg=self.djc_helper.common_cfg.retry, data=raw_data, headers=self.headers, timeout=self.djc_helper.common_cfg.http_timeout)
         logger.debug(f"{raw_data}")
         return process_result(ctx, res, pretty, print_res)
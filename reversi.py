@@ -9,7 +9,8 @@ logger.removeHandler(fileHandler)
 logger.addHandler(new_file_handler())
 logger.setLevel(logging.INFO)
 
-import copy
+import multiprocessing
+import os
 import random
 import sys
 import time
@@ -24,29 +25,27 @@ from PyQt5.QtGui import QPixmap
 
 from log import asciiReset, color
 from qt_wrapper import *
+from reversi_engine import (Board, Engine, OpeningBook, ParallelEngine,
+                            board_size, cell_blue, cell_empty, cell_invalid,
+                            cell_red, opening_book_path, weight_map)
 from util import range_from_one
 
-board_size = 8
-
-cell_blue = -1
-cell_empty = 0
-cell_red = 1
-cell_invalid = 2
-
 invalid_cell_count = 5
 
 winner_counter = Counter()
 
-weight_map = [
-    [500, -25, 10, 5, 5, 10, -25, 500],
-    [-25, -45, 1, 1, 1, 1, -45, -25],
-    [10, 1, 3, 2, 2, 3, 1, 10],
-    [5, 1, 2, 1, 1, 2, 1, 5],
-    [5, 1, 2, 1, 1, 2, 1, 5],
-    [10, 1, 3, 2, 2, 3, 1, 10],
-    [-25, -45, 1, 1, 1, 1, -45, -25],
-    [500, -25, 10, 5, 5, 10, -25, 500],
-]
+
+_opening_book = None  # type: Optional[OpeningBook]
+
+
+def get_opening_book() -> Optional[OpeningBook]:
+    """加载开局库（通过 python reversi_engine.py book 生成），不存在时返回None"""
+    global _opening_book
+    if _opening_book is None and os.path.exists(opening_book_path):
+        _opening_book = OpeningBook.load(opening_book_path)
+        logger.info(f"已加载开局库 {opening_book_path}，共{len(_opening_book)}个局面")
+
+    return _opening_book
 
 
 class AvgStat:
@@ -77,9 +76,8 @@ class ConfigDialog(QDialog):
         self.ai_dfs_max_depth = create_spin_box(7)
         self.ai_min_decision_seconds = create_double_spin_box(0.5, maximum=99999)
         self.ai_max_decision_time = create_double_spin_box(26, maximum=99999)
-        self.enable_presearch = create_checkbox(True)
-        self.ai_dfs_presearch_depth = create_spin_box(2)
-        self.ai_dfs_max_choice_per_depth = create_spin_box(5)
+        self.ai_parallel_workers = create_spin_box(1, maximum=multiprocessing.cpu_count(), minimum=1)
+        self.ai_endgame_empties = create_spin_box(14, maximum=board_size * board_size)
 
         buttonBox = QDialogButtonBox(QDialogButtonBox.Ok, self)
 
@@ -91,9 +89,8 @@ class ConfigDialog(QDialog):
         layout.addRow("ai最大搜索层数（越大越强，速度越慢）", self.ai_dfs_max_depth)
         layout.addRow("ai每步最小等待时间（秒）（太小可能会看不清手动方的落子位置-。-）", self.ai_min_decision_seconds)
         layout.addRow("ai每步最大等待时间（秒）（避免超出30秒）", self.ai_max_decision_time)
-        layout.addRow("是否启用预搜索（加快搜索速度）", self.enable_presearch)
-        layout.addRow("预搜索层数（越大速度越慢，精度越高）", self.ai_dfs_presearch_depth)
-        layout.addRow("预搜索后实际最多搜索子节点数（越小速度越快，精度越小）", self.ai_dfs_max_choice_per_depth)
+        layout.addRow("ai并行搜索进程数（1表示不并行）", self.ai_parallel_workers)
+        layout.addRow("剩余空格不超过该数目时精确求解残局（越大越慢）", self.ai_endgame_empties)
         layout.addWidget(buttonBox)
 
         buttonBox.accepted.connect(self.accept)
@@ -123,6 +120,10 @@ class Reversi(QWidget):
         # ai托管，默认不托管
         self.ai_cells = {}
         self.ai_to_avg_stat = {}  # type: Dict[int, AvgStat]
+        # 各方ai的搜索引擎，在整局中保留，以便复用置换表，重开时释放上一局的引擎（并行搜索时会占用进程池）
+        for engine in getattr(self, "ai_engines", {}).values():
+            engine.close()
+        self.ai_engines = {}  # type: Dict[int, Engine]
 
         self.ai_moving = False
 
@@ -135,18 +136,17 @@ class Reversi(QWidget):
         self.ai_dfs_max_depth = cd.ai_dfs_max_depth.value()
         self.ai_min_decision_seconds = timedelta(seconds=cd.ai_min_decision_seconds.value())
         self.ai_max_decision_time = timedelta(seconds=cd.ai_max_decision_time.value())
+        self.ai_parallel_workers = cd.ai_parallel_workers.value()
+        self.ai_endgame_empties = cd.ai_endgame_empties.value()
         blue_set_ai = cd.blue_set_ai.isChecked()
         red_set_ai = cd.red_set_ai.isChecked()
-        self.enable_presearch = cd.enable_presearch.isChecked()
-        self.ai_dfs_max_choice_per_depth = cd.ai_dfs_max_choice_per_depth.value()
-        self.ai_dfs_presearch_depth = cd.ai_dfs_presearch_depth.value()
 
         if blue_set_ai:
             self.set_ai(cell_blue, self.ai_min_max)
         if red_set_ai:
             self.set_ai(cell_red, self.ai_min_max)
 
-        logger.info(f"ai最大迭代次数为{self.ai_dfs_max_depth}，每次操作至少{self.ai_min_decision_seconds}，最大等待时间为{self.ai_max_decision_time}")
+        logger.info(f"ai最大迭代次数为{self.ai_dfs_max_depth}，每次操作至少{self.ai_min_decision_seconds}，最大等待时间为{self.ai_max_decision_time}，并行搜索进程数为{self.ai_parallel_workers}")
 
         self.last_step = (1, 1)
 
@@ -491,186 +491,41 @@ class Reversi(QWidget):
         return random.choice(valid_cells)
 
     def ai_min_max(self, valid_cells: List[Tuple[int, int]]) -> Tuple[int, int]:
-        # save
-        backup_board = copy.deepcopy(self.board)
-        backup_step_cell = self.step_cell
-
-        alpha = -0x7fffffff
-        beta = 0x7fffffff
-
-        self.ai_start_time = datetime.now()
-        self.last_update_time = datetime.now()
-
-        # # re: 调试用代码
-        # self.iter_count = 0
-        # self.avg_choice = AvgStat()
-        #
-        # self.ai_min_decision_seconds = timedelta(seconds=0.01)
-        # # 为方便测试，单独设置双方AI的参数
-        # if self.step_cell == cell_blue:
-        #     self.enable_presearch = True
-        #     self.ai_dfs_max_depth = 7
-        #     self.ai_dfs_presearch_depth = 2
-        #     self.ai_dfs_max_choice_per_depth = 5
-        #     # 红方算力：4层搜索，无预搜索
-        #     # 层数 预搜索 最大子节点 平均耗时 蓝方局面分
-        #     # 6     2       6       1.3     2067
-        #     #
-        #     # 7     2       5       3.4     2471/1523/1034/2037
-        #     #
-        #     # 8     2       5       9.5     2223
-        # else:
-        #     self.enable_presearch = False
-        #     self.ai_dfs_max_depth = 4
-        #
-        # logger.info(
-        #     self.cell_name(self.step_cell) + f"ai参数：max_depth={self.ai_dfs_max_depth}, enable_presearch={self.enable_presearch}, max_choice_per_depth={self.ai_dfs_max_choice_per_depth}, presearch_depth={self.ai_dfs_presearch_depth}")
-
-        res = self.ai_min_max_dfs(0, valid_cells, self.step_cell, alpha, beta)
-
-        used_time = datetime.now() - self.ai_start_time
-        self.ai_to_avg_stat[self.step_cell].add(used_time.total_seconds())
-
-        # if self.step_cell == cell_blue:
-        #     logfunc = logger.warning
-        # else:
-        #     logfunc = logger.info
-        #
-        # logfunc(f"count={self.iter_count}, avg_choice={self.avg_choice.avg()}, expected_score={res[1]}")
-
-        # resume
-        self.board = backup_board
-        self.step_cell = backup_step_cell
-
-        return res[0]
-
-    def ai_min_max_dfs(self, depth, valid_cells: List[Tuple[int, int]], ai_step_cell, alpha, beta, presearch=False) -> Tuple[Optional[Tuple[int, int]], int]:
-        # self.iter_count += 1
-        # if len(valid_cells) != 0:
-        #     self.avg_choice.add(len(valid_cells))
-
-        if datetime.now() - self.last_update_time >= timedelta(seconds=1 / 60):
-            since_start = datetime.now() - self.ai_start_time
-            remaining_time = (self.ai_max_decision_time - since_start)
+        ai_step_cell = self.step_cell
 
+        def on_progress(used_seconds: float):
+            remaining_time = self.ai_max_decision_time.total_seconds() - used_seconds
             avg_used_time = self.ai_to_avg_stat[ai_step_cell].avg()
 
-            self.label_count_down.setText(f"{remaining_time.total_seconds():.1f}(平均{avg_used_time:.1f})")
-            self.last_update_time = datetime.now()
-
-        if depth == self.ai_dfs_max_depth:
-            return (None, self.evaluate(ai_step_cell))
-
-        if self.step_cell == ai_step_cell:
-            min_max = max
-            alpha = -0x7fffffff
-            need_reverse_weights = True
-        else:
-            min_max = min
-            beta = 0x7fffffff
-            need_reverse_weights = False
-
-        best_next_move = None
-
-        if len(valid_cells) != 0:
-            # 子搜索流程（实际搜索和预搜索将共用该逻辑）
-            def subsearch(valid_cells, alpha, beta, current_depth, presearch=False, subresult_cb=None):
-                best_next_move = None
-
-                for idx, next_move_index in enumerate(valid_cells):
-                    next_move_row_index, next_move_col_index = next_move_index
-
-                    revoke_op = self.put_cell(next_move_row_index, next_move_col_index, ai_probe=True)
-
-                    next_depth_best_move = self.ai_min_max_dfs(current_depth + 1, self.get_valid_cells(self.current_step_cell()), ai_step_cell, alpha, beta, presearch)
-                    if next_depth_best_move is None:
-                        continue
-
-                    next_depth_min_max_score = next_depth_best_move[1]
-
-                    next_move = ((next_move_row_index, next_move_col_index), next_depth_min_max_score)
-                    if best_next_move is None:
-                        best_next_move = next_move
-                    else:
-                        best_next_move = min_max(best_next_move, next_move, key=lambda v: v[1])
-
-                    revoke_op()
-
-                    # 更新alpha、beta
-                    if self.step_cell == ai_step_cell:
-                        if next_depth_min_max_score > alpha:
-                            alpha = next_depth_min_max_score
-                    else:
-                        if next_depth_min_max_score < beta:
-                            beta = next_depth_min_max_score
-
-                    # 子节点结果回调
-                    if subresult_cb is not None:
-                        subresult_cb(idx, next_depth_min_max_score)
-
-                    # 剪枝
-                    if alpha >= beta:
-                        logger.debug(f"剪枝 alpha={alpha}, beta={beta}")
-                        break
-
-                    # 如果运行时间超限，停止处理
-                    since_start = datetime.now() - self.ai_start_time
-                    if since_start >= self.ai_max_decision_time:
-                        logger.info(f"depth={depth}/{self.ai_dfs_max_depth} valid_cells={idx + 1}/{len(valid_cells)} 等待时间已达到{since_start}，将强制停止搜索")
-                        break
-
-                    # 如果重开了，停止处理
-                    if self.game_restarted:
-                        logger.info(f"游戏重开，将强制停止搜索")
-                        break
-
-                return best_next_move
-
-            need_presearch = self.enable_presearch and \
-                             not presearch and \
-                             len(valid_cells) > self.ai_dfs_max_choice_per_depth and \
-                             depth + self.ai_dfs_presearch_depth < self.ai_dfs_max_depth
-
-            if need_presearch:
-                # 预计算若干层得到各落子的评分，按照该评分排序
-                # 预搜索时本层实际不需要剪枝，因为目的是为了计算出各个子节点的排序权重
-                presearch_alpha, presearch_beta = -0x7fffffff, 0x7fffffff
-                presearch_current_depth = self.ai_dfs_max_depth - self.ai_dfs_presearch_depth
-                valid_cells_weights = [0 for cell in valid_cells]
-
-                def subresult_cb(child_idx, next_depth_min_max_score):
-                    valid_cells_weights[child_idx] = next_depth_min_max_score
-
-                subsearch(valid_cells, presearch_alpha, presearch_beta, presearch_current_depth, presearch=True, subresult_cb=subresult_cb)
-
-                # 根据计算出的权重进行排序
-                valid_cells = [cell for weight, cell in sorted(zip(valid_cells_weights, valid_cells), reverse=need_reverse_weights)]
-                # 取前几个
-                valid_cells = valid_cells[:self.ai_dfs_max_choice_per_depth]
+            self.label_count_down.setText(f"{remaining_time:.1f}(平均{avg_used_time:.1f})")
+
+        if ai_step_cell not in self.ai_engines:
+            kwargs = dict(
+                max_depth=self.ai_dfs_max_depth,
+                max_seconds=self.ai_max_decision_time.total_seconds(),
+                should_stop=lambda: self.game_restarted,
+                endgame_empties=self.ai_endgame_empties,
+                book=get_opening_book(),
+            )
+            if self.ai_parallel_workers > 1:
+                self.ai_engines[ai_step_cell] = ParallelEngine(workers=self.ai_parallel_workers, **kwargs)
             else:
-                # 以下情况则直接按照权重排序
-                # 1. 如果可选落子数不多
-                # 2. 已经接近叶节点
-                # 3. 预搜索流程
-                valid_cells = sorted(valid_cells, key=lambda v: weight_map[v[0] - 1][v[1] - 1], reverse=need_reverse_weights)
-
-            # 正式开始搜索
-            best_next_move = subsearch(valid_cells, alpha, beta, depth)
-        else:
-            # 本方无可行下子，跳过本轮
-            old_step_cell = self.step_cell
+                self.ai_engines[ai_step_cell] = Engine(**kwargs)
+        engine = self.ai_engines[ai_step_cell]
+        engine.on_progress = on_progress
 
-            self.next_turn()
-            next_depth_best_move = self.ai_min_max_dfs(depth + 1, self.get_valid_cells(self.current_step_cell()), ai_step_cell, alpha, beta)
-            if next_depth_best_move is not None:
-                next_depth_min_max_score = next_depth_best_move[1]
-
-                next_move = ((0, 0), next_depth_min_max_score)
-                best_next_move = next_move
+        # 搜索在位棋盘上进行，不会修改当前棋盘
+        res = engine.search(Board.from_cells(self.board, ai_step_cell))
 
-            self.step_cell = old_step_cell
+        self.ai_to_avg_stat[ai_step_cell].add(res.seconds)
+        pv = " ".join(f"{chr(ord('a') + row - 1)}{col}" for row, col in res.pv)
+        source = {"book": "（开局库）", "endgame": "（残局精确求解）"}.get(res.source, "")
+        logger.info(f"{self.cell_name_without_color(ai_step_cell)}ai{source}完成{res.depth}层搜索，共{res.nodes}个节点，耗时{res.seconds:.1f}秒，"
+                    f"速度为{res.nodes_per_second:.0f}节点/秒，预期局面分为{res.score}，预期变例为 {pv}")
+        for stat in res.workers:
+            logger.info(f"\t进程{stat.pid}: 搜索{stat.nodes}个节点，耗时{stat.seconds:.1f}秒，速度为{stat.nodes_per_second:.0f}节点/秒")
 
-        return best_next_move
+        return res.move
 
     def evaluate(self, current_step_cell, ignore_game_over=False) -> int:
         if self.is_game_over() and not ignore_game_over:
@@ -1148,6 +1003,7 @@ class AiThread(QThread):
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     re = Reversi()
     # re.play()
@@ -0,0 +1,250 @@
+# 黑白棋AI的无界面对战测试
+#
+# 使用固定的随机种子生成无效格子布局和开局，让不同参数的引擎轮流执蓝、执红对战，
+# 记录每步的搜索层数、节点数、速度以及最终胜率，并输出为json报告，方便对比各次改动前后的速度和棋力
+#
+# 用法示例：python reversi_arena.py --games 10 --a "深层:max_depth=7" --b "浅层:max_depth=4" --output arena.json
+
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from reversi_engine import (Board, Engine, OpeningBook, ParallelEngine, bit_of,
+                            cell_blue, cell_red, iter_bits, row_col_of)
+
+invalid_cell_count = 5
+
+
+class EngineConfig(NamedTuple):
+    name: str
+    max_depth: int = 7
+    max_seconds: float = 60.0  # 默认给足时间，使得对局只受层数限制，结果可以复现
+    workers: int = 1  # 大于1时使用并行搜索
+    tt_size_bits: int = 18
+    endgame_empties: int = 14
+    book: str = ""  # 开局库的路径，为空时不使用开局库
+
+    @classmethod
+    def parse(cls, spec: str) -> 'EngineConfig':
+        """解析形如 名称:max_depth=6,max_seconds=5 的配置"""
+        name, _, params = spec.partition(":")
+        kwargs = {}
+        for param in filter(None, params.split(",")):
+            key, value = param.split("=", 1)
+            if key not in cls._fields or key == "name":
+                raise ValueError(f"未知的引擎参数 {key}，可选参数为 {cls._fields[1:]}")
+            kwargs[key] = type(cls._field_defaults[key])(value)
+
+        return cls(name, **kwargs)
+
+    def create_engine(self) -> Engine:
+        kwargs = dict(
+            max_depth=self.max_depth,
+            max_seconds=self.max_seconds,
+            tt_size_bits=self.tt_size_bits,
+            endgame_empties=self.endgame_empties,
+            book=load_book(self.book) if self.book != "" else None,
+        )
+        if self.workers > 1:
+            return ParallelEngine(workers=self.workers, **kwargs)
+        return Engine(**kwargs)
+
+
+_books = {}  # type: Dict[str, OpeningBook]
+
+
+def load_book(path: str) -> OpeningBook:
+    if path not in _books:
+        _books[path] = OpeningBook.load(path)
+    return _books[path]
+
+
+def random_invalid_cells(rng: random.Random, count=invalid_cell_count) -> int:
+    """与reversi.py中的init_invalid_cells_randomly一致，在中间四格以外随机选择若干个位置不可下棋"""
+    center = [(4, 4), (5, 5), (4, 5), (5, 4)]
+    possiable_invalid_cells = [(row, col) for col in range(1, 9) for row in range(1, 9) if (row, col) not in center]
+
+    invalid = 0
+    for row, col in rng.sample(possiable_invalid_cells, k=count):
+        invalid |= bit_of(row, col)
+
+    return invalid
+
+
+def play_game(blue: EngineConfig, red: EngineConfig, invalid: int, opening: List[int]) -> dict:
+    """进行一局对局，opening为开局时随机落下的若干步（不计入统计）"""
+    board = Board.initial(invalid)
+    for move in opening:
+        board.make(move)
+
+    configs = {cell_blue: blue, cell_red: red}
+    engines = {cell_blue: blue.create_engine(), cell_red: red.create_engine()}
+
+    moves = []
+    try:
+        while not board.is_game_over():
+            step_cell = board.step_cell
+            res = engines[step_cell].search(Board(board.blue, board.red, board.invalid, step_cell))
+
+            move = bit_of(*res.move) if res.move != (0, 0) else 0
+            board.make(move)
+            moves.append({
+                "side": "blue" if step_cell == cell_blue else "red",
+                "engine": configs[step_cell].name,
+                "move": list(res.move),
+                "score": res.score,
+                "depth": res.depth,
+                "nodes": res.nodes,
+                "seconds": round(res.seconds, 4),
+                "nodes_per_second": round(res.nodes_per_second),
+                "source": res.source,
+            })
+    finally:
+        for engine in engines.values():
+            engine.close()
+
+    blue_count, red_count = board.count(cell_blue), board.count(cell_red)
+    if blue_count > red_count:
+        winner = blue.name
+    elif red_count > blue_count:
+        winner = red.name
+    else:
+        # reversi.py中平局视为红方胜，这里单独统计
+        winner = ""
+
+    return {
+        "blue": blue.name,
+        "red": red.name,
+        "invalid_cells": [list(row_col_of(bit)) for bit in iter_bits(invalid)],
+        "opening": [list(row_col_of(move)) if move else [0, 0] for move in opening],
+        "blue_count": blue_count,
+        "red_count": red_count,
+        "winner": winner,
+        "moves": moves,
+    }
+
+
+def random_opening(rng: random.Random, invalid: int, opening_moves: int) -> List[int]:
+    board = Board.initial(invalid)
+    opening = []
+    for _ in range(opening_moves):
+        moves = sorted(iter_bits(board.legal_moves()))
+        move = rng.choice(moves) if moves else 0
+        board.make(move)
+        opening.append(move)
+
+    return opening
+
+
+def summarize(config: EngineConfig, games: List[dict]) -> dict:
+    wins, losses, draws = 0, 0, 0
+    moves = []
+    for game in games:
+        if config.name not in (game["blue"], game["red"]):
+            continue
+
+        if game["winner"] == "":
+            draws += 1
+        elif game["winner"] == config.name:
+            wins += 1
+        else:
+            losses += 1
+        moves.extend(move for move in game["moves"] if move["engine"] == config.name)
+
+    played = wins + losses + draws
+    nodes = sum(move["nodes"] for move in moves)
+    seconds = sum(move["seconds"] for move in moves)
+    return {
+        "config": config._asdict(),
+        "games": played,
+        "wins": wins,
+        "losses": losses,
+        "draws": draws,
+        "win_rate": round((wins + 0.5 * draws) / max(played, 1), 4),
+        "moves": len(moves),
+        "nodes": nodes,
+        "seconds": round(seconds, 4),
+        "nodes_per_second": round(nodes / max(seconds, 1e-6)),
+        "avg_depth": round(sum(move["depth"] for move in moves) / max(len(moves), 1), 2),
+        "avg_seconds_per_move": round(seconds / max(len(moves), 1), 4),
+    }
+
+
+def run_match(config_a: EngineConfig, config_b: EngineConfig, games=10, seed=0, opening_moves=2,
+              invalid_count=invalid_cell_count, on_game_end=None) -> dict:
+    """
+    两个引擎配置对战若干局，每个随机布局下双方各执蓝一次，返回可直接保存为json的报告
+    :param on_game_end 每局结束后的回调 on_game_end(game_index, game)
+    """
+    if config_a.name == config_b.name:
+        raise ValueError(f"对战双方的名称不能相同：{config_a.name}")
+
+    rng = random.Random(seed)
+    start_time = time.time()
+
+    records = []
+    for game_index in range(games):
+        if game_index % 2 == 0:
+            invalid = random_invalid_cells(rng, invalid_count)
+            opening = random_opening(rng, invalid, opening_moves)
+            blue, red = config_a, config_b
+        else:
+            blue, red = config_b, config_a
+
+        game = play_game(blue, red, invalid, opening)
+        records.append(game)
+        if on_game_end is not None:
+            on_game_end(game_index, game)
+
+    return {
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "games": games,
+        "opening_moves": opening_moves,
+        "invalid_cell_count": invalid_count,
+        "seconds": round(time.time() - start_time, 4),
+        "summary": [summarize(config, records) for config in [config_a, config_b]],
+        "records": records,
+    }
+
+
+def parse_args(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--a", default="a:max_depth=5", type=str, help="引擎A的配置，eg. 深层:max_depth=7,max_seconds=10,workers=2")
+    parser.add_argument("--b", default="b:max_depth=3", type=str, help="引擎B的配置")
+    parser.add_argument("--games", default=10, type=int, help="对局数目，每个随机布局双方各执蓝一次")
+    parser.add_argument("--seed", default=0, type=int)
+    parser.add_argument("--opening_moves", default=2, type=int, help="开局随机落子的步数，用于增加对局的多样性")
+    parser.add_argument("--invalid_cell_count", default=invalid_cell_count, type=int)
+    parser.add_argument("--output", default="", type=str, help="报告的保存路径，不指定则仅输出汇总信息")
+    return parser.parse_args(args)
+
+
+def main():
+    args = parse_args()
+
+    def on_game_end(game_index: int, game: dict):
+        print(f"第{game_index + 1}局 蓝方 {game['blue']} {game['blue_count']} : {game['red_count']} 红方 {game['red']}，"
+              f"胜者为 {game['winner'] or '平局'}")
+
+    report = run_match(EngineConfig.parse(args.a), EngineConfig.parse(args.b), args.games, args.seed, args.opening_moves,
+                       args.invalid_cell_count, on_game_end)
+
+    for summary in report["summary"]:
+        print(f"{summary['config']['name']}: 胜{summary['wins']} 负{summary['losses']} 平{summary['draws']} 胜率 {summary['win_rate']:.2%} "
+              f"平均层数 {summary['avg_depth']} 速度 {summary['nodes_per_second']}节点/秒 每步平均耗时 {summary['avg_seconds_per_move']}秒")
+
+    if args.output != "":
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存至 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
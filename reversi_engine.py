@@ -0,0 +1,1155 @@
+# 黑白棋（reversi.py）的无界面AI引擎
+#
+# 棋盘使用位棋盘表示：蓝方、红方各一个64位整数，另有一个无效格子的掩码
+# 第row行第col列（均从1开始）对应的位为 (row - 1) * 8 + (col - 1)
+#
+# 走法生成和翻转计算均通过整体移位和掩码完成，落子和撤销只需要几次异或操作
+
+import json
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing.pool import Pool
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+board_size = 8
+
+cell_blue = -1
+cell_empty = 0
+cell_red = 1
+cell_invalid = 2
+
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_A_FILE = 0xFEFEFEFEFEFEFEFE  # 去掉第一列
+NOT_H_FILE = 0x7F7F7F7F7F7F7F7F  # 去掉最后一列
+
+# 八个方向的 (位移量, 移位后需要保留的位的掩码)，掩码用于去掉跨行绕回的位
+DIRECTIONS = [
+    (1, NOT_A_FILE),  # 右
+    (-1, NOT_H_FILE),  # 左
+    (8, FULL),  # 下
+    (-8, FULL),  # 上
+    (9, NOT_A_FILE),  # 右下
+    (7, NOT_H_FILE),  # 左下
+    (-7, NOT_A_FILE),  # 右上
+    (-9, NOT_H_FILE),  # 左上
+]
+
+INFINITY = 0x7FFFFFFF + 1
+GAME_OVER_SCORE = 0x7FFFFFFF
+
+weight_map = [
+    [500, -25, 10, 5, 5, 10, -25, 500],
+    [-25, -45, 1, 1, 1, 1, -45, -25],
+    [10, 1, 3, 2, 2, 3, 1, 10],
+    [5, 1, 2, 1, 1, 2, 1, 5],
+    [5, 1, 2, 1, 1, 2, 1, 5],
+    [10, 1, 3, 2, 2, 3, 1, 10],
+    [-25, -45, 1, 1, 1, 1, -45, -25],
+    [500, -25, 10, 5, 5, 10, -25, 500],
+]
+
+
+def bit_of(row: int, col: int) -> int:
+    return 1 << ((row - 1) * 8 + (col - 1))
+
+
+def row_col_of(bit: int) -> Tuple[int, int]:
+    index = bit.bit_length() - 1
+    return index // 8 + 1, index % 8 + 1
+
+
+if hasattr(int, "bit_count"):
+    # python3.10及以上版本提供了原生的popcount
+    popcount = int.bit_count
+else:
+    def popcount(x: int) -> int:
+        return bin(x).count("1")
+
+
+def iter_bits(x: int):
+    while x:
+        bit = x & -x
+        yield bit
+        x ^= bit
+
+
+def shift(x: int, direction: Tuple[int, int]) -> int:
+    amount, mask = direction
+    if amount > 0:
+        return (x << amount) & mask & FULL
+    else:
+        return (x >> -amount) & mask
+
+
+def legal_moves(own: int, opp: int, empty: int) -> int:
+    """返回己方所有可落子位置的掩码"""
+    moves = 0
+    # 带有水平分量的方向上，被夹住的对方棋子不可能位于第一列或最后一列，去掉这两列后移位时就不会跨行绕回
+    inner_opp = opp & INNER_COLUMNS
+    for amount, mask_opp in ((1, inner_opp), (8, opp), (7, inner_opp), (9, inner_opp)):
+        # 沿该方向连续的对方棋子
+        candidates = mask_opp & (own << amount)
+        candidates |= mask_opp & (candidates << amount)
+        candidates |= mask_opp & (candidates << amount)
+        candidates |= mask_opp & (candidates << amount)
+        candidates |= mask_opp & (candidates << amount)
+        candidates |= mask_opp & (candidates << amount)
+        # 连续对方棋子之后的第一个空位即为可落子位置
+        moves |= empty & (candidates << amount)
+
+        # 反方向
+        candidates = mask_opp & (own >> amount)
+        candidates |= mask_opp & (candidates >> amount)
+        candidates |= mask_opp & (candidates >> amount)
+        candidates |= mask_opp & (candidates >> amount)
+        candidates |= mask_opp & (candidates >> amount)
+        candidates |= mask_opp & (candidates >> amount)
+        moves |= empty & (candidates >> amount)
+
+    return moves
+
+
+def flips_of(move: int, own: int, opp: int) -> int:
+    """返回在move处落子后需要翻转的对方棋子的掩码"""
+    flips = 0
+    for direction in DIRECTIONS:
+        line = 0
+        x = shift(move, direction)
+        while x & opp:
+            line |= x
+            x = shift(x, direction)
+        if x & own:
+            flips |= line
+
+    return flips
+
+
+# 各个格子（按位序号）的位置权重
+WEIGHTS = [weight_map[index // 8][index % 8] for index in range(64)]
+
+
+def weight_sum(blue: int, red: int) -> int:
+    """红方与蓝方的位置权重之差，即各棋子的 权重*颜色 之和"""
+    weights = 0
+    for bit in iter_bits(red):
+        weights += WEIGHTS[bit.bit_length() - 1]
+    for bit in iter_bits(blue):
+        weights -= WEIGHTS[bit.bit_length() - 1]
+
+    return weights
+
+
+CORNERS = bit_of(1, 1) | bit_of(1, 8) | bit_of(8, 1) | bit_of(8, 8)
+INNER = sum(bit_of(_row, _col) for _row in range(2, board_size) for _col in range(2, board_size))
+INNER_COLUMNS = NOT_A_FILE & NOT_H_FILE
+A_FILE = 0x0101010101010101
+
+# 将第一列的8个格子依次移动到最高的8位（第row行对应第row-1位），用于提取左右两条边
+FILE_TO_RANK = 0x0102040810204080
+
+
+def edge_patterns(x: int) -> Tuple[int, int, int, int]:
+    """提取上、下、左、右四条边上的8个格子，各自作为一个8位整数"""
+    return (
+        x & 0xFF,
+        x >> 56,
+        ((x & A_FILE) * FILE_TO_RANK & FULL) >> 56,
+        (((x >> 7) & A_FILE) * FILE_TO_RANK & FULL) >> 56,
+    )
+
+
+def _edge_stable_mask(occupied: int) -> int:
+    """某条边上，与两端某个角之间连续无空格（无效格子也视为非空）的非角格子"""
+    lu = 0
+    while lu < 7 and occupied >> lu & 1:
+        lu += 1
+    ul = 0
+    while ul < 7 and occupied >> (7 - ul) & 1:
+        ul += 1
+
+    return sum(1 << i for i in range(1, 7) if i < lu or i >= 8 - ul)
+
+
+# 按边上8个格子的占用情况预先计算的稳定格子掩码，以及8位整数的popcount表
+EDGE_STABLE_MASKS = [_edge_stable_mask(_occupied) for _occupied in range(256)]
+BYTE_POPCOUNT = [bin(_byte).count("1") for _byte in range(256)]
+
+# 四条直线方向的 (位移量, 左移时需要保留的位的掩码, 右移时需要保留的位的掩码)
+LINE_DIRECTIONS = [
+    (1, NOT_A_FILE, NOT_H_FILE),  # 行
+    (8, FULL, FULL),  # 列
+    (9, NOT_A_FILE, NOT_H_FILE),  # 左上到右下的对角线
+    (7, NOT_H_FILE, NOT_A_FILE),  # 右上到左下的对角线
+]
+
+
+def line_fill(gen: int, amount: int, forward_mask: int, backward_mask: int) -> int:
+    """将gen中的每个格子沿直线向两端延伸到边界，返回覆盖到的全部格子，每步延伸的距离翻倍"""
+    forward = gen
+    prop = forward_mask
+    forward |= prop & (forward << amount)
+    prop &= prop << amount
+    forward |= prop & (forward << 2 * amount)
+    prop &= prop << 2 * amount
+    forward |= prop & (forward << 4 * amount)
+
+    backward = gen
+    prop = backward_mask
+    backward |= prop & (backward >> amount)
+    prop &= prop >> amount
+    backward |= prop & (backward >> 2 * amount)
+    prop &= prop >> 2 * amount
+    backward |= prop & (backward >> 4 * amount)
+
+    return forward | backward
+
+
+# Zobrist哈希，每个格子上的蓝方棋子、红方棋子各对应一个随机数，另有一个表示轮到红方行动的随机数
+# 使用固定的种子，确保同一局面每次运行得到的哈希值相同，方便复现和调试
+_zobrist_random = random.Random(20210601)
+ZOBRIST_BLUE = [_zobrist_random.getrandbits(64) for _ in range(64)]
+ZOBRIST_RED = [_zobrist_random.getrandbits(64) for _ in range(64)]
+# 某个格子的棋子被翻转时，哈希值需要同时异或该格子的蓝方和红方随机数
+ZOBRIST_FLIP = [blue ^ red for blue, red in zip(ZOBRIST_BLUE, ZOBRIST_RED)]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+
+
+def zobrist_hash(blue: int, red: int, step_cell: int) -> int:
+    key = ZOBRIST_SIDE if step_cell == cell_red else 0
+    for bit in iter_bits(blue):
+        key ^= ZOBRIST_BLUE[bit.bit_length() - 1]
+    for bit in iter_bits(red):
+        key ^= ZOBRIST_RED[bit.bit_length() - 1]
+
+    return key
+
+
+class Board:
+    """位棋盘，step_cell为当前行动方"""
+
+    __slots__ = ["blue", "red", "invalid", "step_cell", "hash", "weights", "history"]
+
+    def __init__(self, blue: int = 0, red: int = 0, invalid: int = 0, step_cell: int = cell_blue):
+        self.blue = blue
+        self.red = red
+        self.invalid = invalid
+        self.step_cell = step_cell
+        # 无效格子在整局中不会变化，所以不参与哈希
+        self.hash = zobrist_hash(blue, red, step_cell)
+        # 红方与蓝方的位置权重之差，落子时增量更新
+        self.weights = weight_sum(blue, red)
+        # 每步的 (落子位置, 翻转的棋子, 落子前的哈希值, 落子前的位置权重之差)，用于撤销，轮空时落子位置为0
+        self.history = []  # type: List[Tuple[int, int, int, int]]
+
+    @classmethod
+    def initial(cls, invalid: int = 0) -> 'Board':
+        return cls(
+            blue=bit_of(4, 4) | bit_of(5, 5),
+            red=bit_of(4, 5) | bit_of(5, 4),
+            invalid=invalid,
+            step_cell=cell_blue,
+        )
+
+    @classmethod
+    def from_cells(cls, cells: List[List[int]], step_cell: int) -> 'Board':
+        """从reversi.py中带一圈边界的二维数组棋盘转换"""
+        blue, red, invalid = 0, 0, 0
+        for row in range(1, board_size + 1):
+            for col in range(1, board_size + 1):
+                cell = cells[row][col]
+                if cell == cell_blue:
+                    blue |= bit_of(row, col)
+                elif cell == cell_red:
+                    red |= bit_of(row, col)
+                elif cell == cell_invalid:
+                    invalid |= bit_of(row, col)
+
+        return cls(blue, red, invalid, step_cell)
+
+    def copy(self) -> 'Board':
+        return Board(self.blue, self.red, self.invalid, self.step_cell)
+
+    def cell(self, row: int, col: int) -> int:
+        bit = bit_of(row, col)
+        if self.blue & bit:
+            return cell_blue
+        if self.red & bit:
+            return cell_red
+        if self.invalid & bit:
+            return cell_invalid
+        return cell_empty
+
+    def stones(self, step_cell: int) -> Tuple[int, int]:
+        """返回 (step_cell方的棋子, 另一方的棋子)"""
+        if step_cell == cell_blue:
+            return self.blue, self.red
+        return self.red, self.blue
+
+    def empty(self) -> int:
+        return ~(self.blue | self.red | self.invalid) & FULL
+
+    def legal_moves(self, step_cell: Optional[int] = None) -> int:
+        if step_cell is None:
+            step_cell = self.step_cell
+        own, opp = self.stones(step_cell)
+        return legal_moves(own, opp, self.empty())
+
+    def is_game_over(self) -> bool:
+        empty = self.empty()
+        return legal_moves(self.blue, self.red, empty) == 0 and legal_moves(self.red, self.blue, empty) == 0
+
+    def count(self, step_cell: int) -> int:
+        return popcount(self.blue if step_cell == cell_blue else self.red)
+
+    def winner(self) -> int:
+        """与reversi.py保持一致，平局时视为红方胜"""
+        return cell_blue if self.count(cell_blue) > self.count(cell_red) else cell_red
+
+    def make(self, move: int):
+        """在move处落子（move为0表示轮空），调用方需确保落子有效"""
+        flips = 0
+        old_hash, old_weights = self.hash, self.weights
+        key = old_hash ^ ZOBRIST_SIDE
+        if move:
+            own, opp = self.stones(self.step_cell)
+            flips = flips_of(move, own, opp)
+            index = move.bit_length() - 1
+            if self.step_cell == cell_blue:
+                self.blue ^= move | flips
+                self.red ^= flips
+                key ^= ZOBRIST_BLUE[index]
+            else:
+                self.red ^= move | flips
+                self.blue ^= flips
+                key ^= ZOBRIST_RED[index]
+
+            # 新落的棋子计一次权重，翻转的棋子从对方变为己方，权重之差变化两倍
+            delta = WEIGHTS[index]
+            x = flips
+            while x:
+                bit = x & -x
+                index = bit.bit_length() - 1
+                key ^= ZOBRIST_FLIP[index]
+                delta += 2 * WEIGHTS[index]
+                x ^= bit
+            self.weights = old_weights + self.step_cell * delta
+
+        self.history.append((move, flips, old_hash, old_weights))
+        self.hash = key
+        self.step_cell = -self.step_cell
+
+    def unmake(self):
+        move, flips, self.hash, self.weights = self.history.pop()
+        self.step_cell = -self.step_cell
+
+        if move:
+            if self.step_cell == cell_blue:
+                self.blue ^= move | flips
+                self.red ^= flips
+            else:
+                self.red ^= move | flips
+                self.blue ^= flips
+
+
+def stable_score(own: int, opp: int, empty: int) -> int:
+    """角、边、其他（八个方向都无空位）的稳定子之差"""
+    # 角
+    corner = popcount(own & CORNERS) - popcount(opp & CORNERS)
+
+    # 边：与某个角之间连续无空格的边上棋子，按边上的占用情况查表得到
+    edge = 0
+    for occupied, own_edge, opp_edge in zip(edge_patterns(~empty & FULL), edge_patterns(own), edge_patterns(opp)):
+        mask = EDGE_STABLE_MASKS[occupied]
+        if mask:
+            edge += BYTE_POPCOUNT[own_edge & mask] - BYTE_POPCOUNT[opp_edge & mask]
+
+    # 其他：所在行、列、两条对角线均已无空格的内部棋子
+    # 依次排除与空格同一直线的格子，大部分局面中在排除完所在行有空格的格子后就已经没有剩余的了
+    candidates = INNER & (own | opp)
+    for amount, forward_mask, backward_mask in LINE_DIRECTIONS:
+        if not candidates:
+            break
+        candidates &= ~line_fill(empty, amount, forward_mask, backward_mask)
+    other = popcount(own & candidates) - popcount(opp & candidates)
+
+    return corner + edge + other
+
+
+def evaluate(board: Board, step_cell: int) -> int:
+    """站在step_cell方的角度评估局面，越大越好"""
+    own, opp = board.stones(step_cell)
+    empty = board.empty()
+
+    own_moves = legal_moves(own, opp, empty)
+    opp_moves = legal_moves(opp, own, empty)
+    if own_moves == 0 and opp_moves == 0:
+        # 如果已经能判定胜负，则取极大的权重分
+        return step_cell * board.winner() * GAME_OVER_SCORE
+
+    # 己方与另一方的行动力之差（越大越好）
+    moves_delta = popcount(own_moves) - popcount(opp_moves)
+
+    # 己方与另一方的当前棋盘落子权重之差，越大越好
+    weights = step_cell * board.weights
+
+    return weights + 15 * moves_delta + 10 * stable_score(own, opp, empty)
+
+
+# 棋盘的8种对称变换（旋转、翻转），以 (row, col) -> (row, col) 的形式给出，下标均从0开始
+SYMMETRIES = [
+    lambda r, c: (r, c),
+    lambda r, c: (r, 7 - c),
+    lambda r, c: (7 - r, c),
+    lambda r, c: (7 - r, 7 - c),
+    lambda r, c: (c, r),
+    lambda r, c: (c, 7 - r),
+    lambda r, c: (7 - c, r),
+    lambda r, c: (7 - c, 7 - r),
+]
+# 各个对称变换下，每个位序号变换后的位序号
+SYMMETRY_PERMUTATIONS = [[_transform(_index // 8, _index % 8)[0] * 8 + _transform(_index // 8, _index % 8)[1] for _index in range(64)] for _transform in SYMMETRIES]
+
+
+def transform_bits(x: int, symmetry: int) -> int:
+    permutation = SYMMETRY_PERMUTATIONS[symmetry]
+    result = 0
+    for bit in iter_bits(x):
+        result |= 1 << permutation[bit.bit_length() - 1]
+
+    return result
+
+
+def inverse_transform_index(index: int, symmetry: int) -> int:
+    return SYMMETRY_PERMUTATIONS[symmetry].index(index)
+
+
+# 默认的开局库文件
+opening_book_path = "reversi_opening_book.json"
+
+
+class OpeningBook:
+    """
+    开局库，记录局面（含无效格子）对应的最佳落子
+
+    局面在8种对称变换中取数值最小的一种作为标准形式，对称的局面共用同一条记录，
+    记录中的落子也是标准形式下的位置，查询时再变换回实际的位置
+    """
+
+    def __init__(self):
+        # 标准形式的局面 -> (标准形式下的落子位序号, 分数, 搜索层数)
+        self.entries = {}  # type: Dict[str, Tuple[int, int, int]]
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def normalize(board: Board) -> Tuple[str, int]:
+        """返回 (标准形式局面的键, 变换到标准形式所使用的对称变换)"""
+        best, best_symmetry = None, 0
+        for symmetry in range(len(SYMMETRIES)):
+            transformed = (transform_bits(board.blue, symmetry), transform_bits(board.red, symmetry), transform_bits(board.invalid, symmetry))
+            if best is None or transformed < best:
+                best, best_symmetry = transformed, symmetry
+
+        blue, red, invalid = best
+        side = "b" if board.step_cell == cell_blue else "r"
+        return f"{blue:016x}{red:016x}{invalid:016x}{side}", best_symmetry
+
+    def lookup(self, board: Board) -> Optional[Tuple[int, int, int]]:
+        """返回 (实际的落子, 分数, 搜索层数)，不在开局库中时返回None"""
+        key, symmetry = self.normalize(board)
+        if key not in self.entries:
+            return None
+
+        index, score, depth = self.entries[key]
+        move = 1 << inverse_transform_index(index, symmetry)
+        if not move & board.legal_moves():
+            return None
+
+        return move, score, depth
+
+    def add(self, board: Board, move: int, score: int, depth: int):
+        """记录局面的最佳落子，已有记录时保留搜索层数更深的"""
+        key, symmetry = self.normalize(board)
+        if key in self.entries and self.entries[key][2] > depth:
+            return
+
+        self.entries[key] = (SYMMETRY_PERMUTATIONS[symmetry][move.bit_length() - 1], score, depth)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"entries": {key: list(value) for key, value in sorted(self.entries.items())}}, f, indent=0)
+
+    @classmethod
+    def load(cls, path: str) -> 'OpeningBook':
+        book = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for key, value in json.load(f)["entries"].items():
+                book.entries[key] = tuple(value)
+
+        return book
+
+
+def final_score(board: Board, step_cell: int) -> int:
+    """
+    终局时站在step_cell方的角度的准确分数，为双方子数之差的两倍
+    与reversi.py保持一致，平局时视为红方胜，因此平局时红方计为1分，蓝方计为-1分
+    """
+    delta = board.count(step_cell) - board.count(-step_cell)
+    if delta == 0:
+        return 1 if step_cell == cell_red else -1
+
+    return 2 * delta
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class WorkerStat(NamedTuple):
+    pid: int
+    nodes: int
+    seconds: float  # 实际用于搜索的时间
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / max(self.seconds, 1e-6)
+
+
+class SearchResult(NamedTuple):
+    move: Tuple[int, int]  # (row, col)，无子可下时为 (0, 0)
+    score: int
+    depth: int  # 完成搜索的深度
+    nodes: int  # 搜索的节点数（并行搜索时为所有进程之和）
+    seconds: float
+    pv: List[Tuple[int, int]] = []  # 预期的后续落子序列
+    workers: List[WorkerStat] = []  # 并行搜索时各个进程的统计信息
+    source: str = "search"  # search: 启发式搜索，endgame: 残局精确求解（分数为终局子数之差），book: 开局库
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / max(self.seconds, 1e-6)
+
+
+# 置换表中记录的分数类型
+BOUND_EXACT = 0  # 准确值
+BOUND_LOWER = 1  # 发生了beta剪枝，实际分数不低于记录值
+BOUND_UPPER = 2  # 所有子节点都未超过alpha，实际分数不高于记录值
+
+
+class TranspositionTable:
+    """
+    以Zobrist哈希为索引的置换表，大小固定为2的size_bits次方
+
+    每个槽位保存 (哈希值, 搜索深度, 分数类型, 分数, 最佳落子, 搜索代数)，
+    冲突时优先保留搜索深度更深的记录，但之前的搜索留下的记录总是可以被替换
+    """
+
+    def __init__(self, size_bits=20):
+        self.mask = (1 << size_bits) - 1
+        self.slots = [None] * (1 << size_bits)  # type: List[Optional[Tuple[int, int, int, int, int, int]]]
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, int, int, int]]:
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: int):
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is not None and entry[0] != key and entry[5] == self.generation and entry[1] > depth:
+            return
+
+        self.slots[index] = (key, depth, bound, score, move, self.generation)
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+        self.generation = 0
+
+
+class Engine:
+    """
+    基于位棋盘的迭代加深alpha-beta搜索
+
+    每一轮迭代的结果都会记录在置换表中，下一轮迭代时优先搜索置换表中记录的最佳落子（即上一轮的主要变例），
+    使得剪枝尽早发生。时间用完时返回最后一轮完整迭代得到的最佳落子
+    """
+
+    def __init__(self, max_depth=7, max_seconds=26.0, tt_size_bits=20,
+                 should_stop: Optional[Callable[[], bool]] = None, on_progress: Optional[Callable[[float], None]] = None,
+                 endgame_empties=14, endgame_time_ratio=0.5, book: Optional[OpeningBook] = None):
+        self.max_depth = max_depth
+        self.max_seconds = max_seconds
+        self.should_stop = should_stop
+        self.on_progress = on_progress  # 定期回调已用时间，用于界面展示倒计时
+
+        # 剩余空格不超过该数目时，直接搜索到终局得到准确结果，若在 max_seconds*endgame_time_ratio 内未能完成，则改为启发式搜索
+        self.endgame_empties = endgame_empties
+        self.endgame_time_ratio = endgame_time_ratio
+        self.book = book
+
+        # 置换表在多次搜索之间保留，对手落子后的局面往往已在上一次搜索中出现过
+        self.tt = TranspositionTable(tt_size_bits)
+        # 残局求解的分数与启发式搜索的分数含义不同，单独使用一个置换表
+        self.endgame_tt = TranspositionTable(min(tt_size_bits, 18))
+
+        self.nodes = 0
+        self.start_time = 0.0
+        self.deadline = 0.0
+        self.last_progress_time = 0.0
+
+    def search(self, board: Board) -> SearchResult:
+        board = board.copy()
+
+        self.nodes = 0
+        self.start_time = time.time()
+        self.last_progress_time = self.start_time
+        self.tt.new_search()
+
+        moves = self.ordered_moves(board, board.legal_moves(), 0)
+        if len(moves) == 0:
+            return SearchResult((0, 0), evaluate(board, board.step_cell), 0, 0, 0.0)
+
+        if self.book is not None:
+            hit = self.book.lookup(board)
+            if hit is not None:
+                move, score, depth = hit
+                return SearchResult(row_col_of(move), score, depth, 0, time.time() - self.start_time, [row_col_of(move)], source="book")
+
+        empties = popcount(board.empty())
+        if empties <= self.endgame_empties:
+            self.deadline = self.start_time + self.max_seconds * self.endgame_time_ratio
+            try:
+                move, score = self.solve_root(board, moves)
+                return SearchResult(row_col_of(move), int(score / 2), empties, self.nodes, time.time() - self.start_time,
+                                    self.endgame_variation(board, move), source="endgame")
+            except SearchTimeout:
+                # 未能在限定时间内求解，使用剩余时间进行启发式搜索
+                pass
+
+        self.deadline = self.start_time + self.max_seconds
+
+        # 第一轮迭代完成前，以按位置权重排序的第一个落子作为后备
+        best_move, best_score, completed_depth = moves[0], evaluate(board, board.step_cell), 0
+        try:
+            for depth in range(1, self.max_depth + 1):
+                move, score = self.search_root(board, moves, depth)
+                best_move, best_score, completed_depth = move, score, depth
+
+                # 将本轮的最佳落子放到最前面，作为下一轮的搜索顺序
+                moves = [move] + [m for m in moves if m != move]
+
+                if abs(score) == GAME_OVER_SCORE:
+                    # 已经能确定胜负，更深的搜索不会改变结果
+                    break
+        except SearchTimeout:
+            # 时间用完或被外部要求停止，使用最后一轮完整迭代的结果
+            pass
+
+        return SearchResult(row_col_of(best_move), best_score, completed_depth, self.nodes, time.time() - self.start_time,
+                            self.principal_variation(board, best_move, completed_depth))
+
+    def search_root(self, board: Board, moves: List[int], depth: int) -> Tuple[int, int]:
+        best_move, best_score = moves[0], -INFINITY
+        alpha, beta = -INFINITY, INFINITY
+        for move in moves:
+            board.make(move)
+            try:
+                score = -self.alpha_beta(board, depth - 1, -beta, -alpha)
+            finally:
+                board.unmake()
+
+            if score > best_score:
+                best_move, best_score = move, score
+            if score > alpha:
+                alpha = score
+
+        self.tt.store(board.hash, depth, BOUND_EXACT, best_score, best_move)
+        return best_move, best_score
+
+    def alpha_beta(self, board: Board, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_time()
+
+        if depth == 0:
+            return evaluate(board, board.step_cell)
+
+        key = board.hash
+        tt_move = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, entry_depth, bound, score, tt_move, _ = entry
+            if entry_depth >= depth:
+                if bound == BOUND_EXACT:
+                    return score
+                if bound == BOUND_LOWER and score >= beta:
+                    return score
+                if bound == BOUND_UPPER and score <= alpha:
+                    return score
+
+        moves = board.legal_moves()
+        if moves == 0:
+            if board.legal_moves(-board.step_cell) == 0:
+                return evaluate(board, board.step_cell)
+
+            # 本方无可行落子，轮空
+            board.make(0)
+            try:
+                return -self.alpha_beta(board, depth - 1, -beta, -alpha)
+            finally:
+                board.unmake()
+
+        original_alpha = alpha
+        best, best_move = -INFINITY, 0
+        for move in self.ordered_moves(board, moves, tt_move):
+            board.make(move)
+            try:
+                score = -self.alpha_beta(board, depth - 1, -beta, -alpha)
+            finally:
+                board.unmake()
+
+            if score > best:
+                best, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best >= beta:
+            bound = BOUND_LOWER
+        elif best <= original_alpha:
+            bound = BOUND_UPPER
+        else:
+            bound = BOUND_EXACT
+        self.tt.store(key, depth, bound, best, best_move)
+
+        return best
+
+    def solve_root(self, board: Board, moves: List[int]) -> Tuple[int, int]:
+        """残局精确求解，返回 (最佳落子, 准确分数)"""
+        self.endgame_tt.new_search()
+
+        best_move, best_score = moves[0], -INFINITY
+        alpha = -INFINITY
+        for move in self.fastest_first(board, moves):
+            board.make(move)
+            try:
+                score = -self.solve(board, -INFINITY, -alpha)
+            finally:
+                board.unmake()
+
+            if score > best_score:
+                best_move, best_score = move, score
+            if score > alpha:
+                alpha = score
+
+        self.endgame_tt.store(board.hash, 0, BOUND_EXACT, best_score, best_move)
+        return best_move, best_score
+
+    def solve(self, board: Board, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_time()
+
+        moves = board.legal_moves()
+        if moves == 0:
+            if board.legal_moves(-board.step_cell) == 0:
+                return final_score(board, board.step_cell)
+
+            board.make(0)
+            try:
+                return -self.solve(board, -beta, -alpha)
+            finally:
+                board.unmake()
+
+        key = board.hash
+        tt_move = 0
+        entry = self.endgame_tt.probe(key)
+        if entry is not None:
+            _, _, bound, score, tt_move, _ = entry
+            if bound == BOUND_EXACT:
+                return score
+            if bound == BOUND_LOWER and score >= beta:
+                return score
+            if bound == BOUND_UPPER and score <= alpha:
+                return score
+
+        ordered = self.ordered_moves(board, moves, tt_move)
+        if len(ordered) > 3 and popcount(board.empty()) > 6:
+            # 空格较多时，优先搜索让对方行动力最小的落子，更容易尽早剪枝
+            ordered = self.fastest_first(board, ordered, tt_move)
+
+        original_alpha = alpha
+        best, best_move = -INFINITY, 0
+        for move in ordered:
+            board.make(move)
+            try:
+                score = -self.solve(board, -beta, -alpha)
+            finally:
+                board.unmake()
+
+            if score > best:
+                best, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best >= beta:
+            bound = BOUND_LOWER
+        elif best <= original_alpha:
+            bound = BOUND_UPPER
+        else:
+            bound = BOUND_EXACT
+        self.endgame_tt.store(key, 0, bound, best, best_move)
+
+        return best
+
+    def fastest_first(self, board: Board, moves: List[int], first_move=0) -> List[int]:
+        """按落子后对方的行动力从小到大排序，first_move总是排在最前面"""
+        mobilities = []
+        for move in moves:
+            board.make(move)
+            mobilities.append(-INFINITY if move == first_move else popcount(board.legal_moves()))
+            board.unmake()
+
+        return [move for _, move in sorted(zip(mobilities, moves), key=lambda v: v[0])]
+
+    def endgame_variation(self, board: Board, first_move: int) -> List[Tuple[int, int]]:
+        """沿着残局置换表中记录的最佳落子，得到直到终局的预期落子序列（不含轮空）"""
+        pv = []
+        board = board.copy()
+        move = first_move
+        while move and move & board.legal_moves():
+            pv.append(row_col_of(move))
+            board.make(move)
+            if board.legal_moves() == 0:
+                board.make(0)
+
+            entry = self.endgame_tt.probe(board.hash)
+            move = entry[4] if entry is not None else 0
+
+        return pv
+
+    def ordered_moves(self, board: Board, moves: int, tt_move: int) -> List[int]:
+        """置换表中记录的最佳落子优先，其余按照位置权重从高到低排序"""
+        ordered = sorted(iter_bits(moves), key=lambda move: -weight_of(move))
+        if tt_move and tt_move & moves:
+            ordered.remove(tt_move)
+            ordered.insert(0, tt_move)
+
+        return ordered
+
+    def principal_variation(self, board: Board, first_move: int, depth: int) -> List[Tuple[int, int]]:
+        """沿着置换表中记录的最佳落子，得到预期的后续落子序列"""
+        pv = []
+        board = board.copy()
+        move = first_move
+        while len(pv) < depth and move and move & board.legal_moves():
+            pv.append(row_col_of(move))
+            board.make(move)
+
+            entry = self.tt.probe(board.hash)
+            move = entry[4] if entry is not None else 0
+
+        return pv
+
+    def close(self):
+        pass
+
+    def check_time(self):
+        now = time.time()
+        if now >= self.deadline:
+            raise SearchTimeout()
+        if self.should_stop is not None and self.should_stop():
+            raise SearchTimeout()
+
+        if self.on_progress is not None and now - self.last_progress_time >= 1 / 60:
+            self.on_progress(now - self.start_time)
+            self.last_progress_time = now
+
+
+def weight_of(move: int) -> int:
+    row, col = row_col_of(move)
+    return weight_map[row - 1][col - 1]
+
+
+# 并行搜索的工作进程中使用的引擎，在进程初始化时创建，置换表在整局中保留
+_worker_engine = None  # type: Optional[Engine]
+
+
+def _init_worker(tt_size_bits: int, stop_event):
+    global _worker_engine
+    _worker_engine = Engine(tt_size_bits=tt_size_bits, should_stop=stop_event.is_set)
+
+
+def _search_root_move(blue: int, red: int, invalid: int, step_cell: int, move: int, depth: int, alpha: int, deadline: float,
+                      generation: int) -> Tuple[Optional[int], List[Tuple[int, int]], WorkerStat]:
+    """在工作进程中搜索根节点的一个落子，返回 (分数, 预期变例, 统计信息)，超时或被要求停止时分数为None"""
+    engine = _worker_engine
+    engine.nodes = 0
+    engine.start_time = time.time()
+    engine.last_progress_time = engine.start_time
+    engine.deadline = deadline
+    engine.tt.generation = generation
+
+    board = Board(blue, red, invalid, step_cell)
+    board.make(move)
+
+    score, pv = None, []  # type: Optional[int], List[Tuple[int, int]]
+    try:
+        # 只需要判断是否优于已知的最佳分数，因此只设置下界，超过alpha时得到的就是准确值
+        score = -engine.alpha_beta(board, depth - 1, -INFINITY, -alpha)
+
+        entry = engine.tt.probe(board.hash)
+        pv = [row_col_of(move)] + engine.principal_variation(board, entry[4] if entry is not None else 0, depth - 1)
+    except SearchTimeout:
+        pass
+
+    return score, pv, WorkerStat(os.getpid(), engine.nodes, time.time() - engine.start_time)
+
+
+class ParallelEngine(Engine):
+    """
+    根节点并行的迭代加深搜索（young brothers wait）
+
+    每一轮迭代中，先在当前进程搜索排在最前面的落子（即上一轮的最佳落子），得到一个较好的alpha，
+    然后将其余落子分发给各个工作进程，以该alpha为下界并行搜索。
+    各工作进程有各自的置换表，在整局中保留，根节点的结果和预期变例由当前进程汇总。
+    时间用完或被外部要求停止时，通过共享的事件通知各工作进程尽快停止
+    """
+
+    def __init__(self, workers=0, max_depth=7, max_seconds=26.0, tt_size_bits=20,
+                 should_stop: Optional[Callable[[], bool]] = None, on_progress: Optional[Callable[[float], None]] = None,
+                 endgame_empties=14, endgame_time_ratio=0.5, book: Optional[OpeningBook] = None):
+        super().__init__(max_depth, max_seconds, tt_size_bits, should_stop, on_progress, endgame_empties, endgame_time_ratio, book)
+
+        self.workers = workers if workers > 0 else multiprocessing.cpu_count()
+        self.tt_size_bits = tt_size_bits
+
+        self.pool = None  # type: Optional[Pool]
+        self.stop_event = None
+
+        self.worker_stats = {}  # type: Dict[int, WorkerStat]
+        self.root_pv = []  # type: List[Tuple[int, int]]
+
+    def get_pool(self) -> Pool:
+        if self.pool is None:
+            self.stop_event = multiprocessing.Event()
+            self.pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(self.tt_size_bits, self.stop_event))
+
+        return self.pool
+
+    def close(self):
+        if self.pool is None:
+            return
+
+        self.stop_event.set()
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+
+    def search(self, board: Board) -> SearchResult:
+        self.worker_stats = {}
+        self.root_pv = []
+
+        res = super().search(board)
+
+        pv = res.pv
+        if self.root_pv and self.root_pv[0] == res.move:
+            pv = self.root_pv
+        return res._replace(pv=pv, workers=sorted(self.worker_stats.values()))
+
+    def search_root(self, board: Board, moves: List[int], depth: int) -> Tuple[int, int]:
+        # 先在当前进程搜索第一个落子
+        eldest = moves[0]
+        nodes_before, start_time = self.nodes, time.time()
+        board.make(eldest)
+        try:
+            best_score = -self.alpha_beta(board, depth - 1, -INFINITY, INFINITY)
+        finally:
+            board.unmake()
+            self.add_worker_stat(WorkerStat(os.getpid(), self.nodes - nodes_before, time.time() - start_time))
+        best_move, best_pv = eldest, self.principal_variation(board, eldest, depth)
+
+        if len(moves) > 1 and best_score < GAME_OVER_SCORE:
+            pool = self.get_pool()
+            self.stop_event.clear()
+
+            deadline = self.deadline
+            pending = [
+                (move, pool.apply_async(_search_root_move, (board.blue, board.red, board.invalid, board.step_cell, move, depth, best_score, deadline, self.tt.generation)))
+                for move in moves[1:]
+            ]
+            try:
+                for move, async_result in pending:
+                    while not async_result.ready():
+                        async_result.wait(1 / 60)
+                        # 负责超时判断、外部停止以及界面倒计时的更新
+                        self.check_time()
+
+                    score, pv, stat = async_result.get()
+                    self.nodes += stat.nodes
+                    self.add_worker_stat(stat)
+                    if score is None:
+                        # 工作进程中途停止了，本轮迭代未完成
+                        raise SearchTimeout()
+
+                    if score > best_score:
+                        best_move, best_score, best_pv = move, score, pv
+            except SearchTimeout:
+                # 通知仍在搜索的工作进程停止，并等待它们结束，避免影响下一次搜索
+                self.stop_event.set()
+                for _, async_result in pending:
+                    async_result.wait()
+                raise
+
+        self.tt.store(board.hash, depth, BOUND_EXACT, best_score, best_move)
+        self.root_pv = best_pv
+        return best_move, best_score
+
+    def add_worker_stat(self, stat: WorkerStat):
+        old = self.worker_stats.get(stat.pid, WorkerStat(stat.pid, 0, 0.0))
+        self.worker_stats[stat.pid] = WorkerStat(stat.pid, old.nodes + stat.nodes, old.seconds + stat.seconds)
+
+
+def random_positions(count: int, seed=0, min_moves=8, max_moves=20, invalid_cell_count=5) -> List[Board]:
+    """随机生成若干个局面，用于测试和性能对比"""
+    rng = random.Random(seed)
+    center = bit_of(4, 4) | bit_of(4, 5) | bit_of(5, 4) | bit_of(5, 5)
+
+    positions = []
+    while len(positions) < count:
+        invalid = 0
+        for index in rng.sample([index for index in range(64) if not (1 << index) & center], invalid_cell_count):
+            invalid |= 1 << index
+
+        board = Board.initial(invalid)
+        for _ in range(rng.randint(min_moves, max_moves)):
+            moves = list(iter_bits(board.legal_moves()))
+            if len(moves) == 0:
+                board.make(0)
+                continue
+            board.make(rng.choice(moves))
+
+        if board.legal_moves() and not board.is_game_over():
+            positions.append(Board(board.blue, board.red, board.invalid, board.step_cell))
+
+    return positions
+
+
+def parse_invalid_cells(text: str) -> int:
+    """解析与reversi.py中手动输入相同格式的无效格子位置，eg. a1 b1 c1 d1 e1，字母表示行，数字表示列"""
+    invalid = 0
+    for row_col in text.split():
+        invalid |= bit_of(ord(row_col[0]) - ord('a') + 1, int(row_col[1]))
+
+    return invalid
+
+
+def generate_opening_book(invalid_layouts: List[int], plies=4, depth=8, max_seconds=60.0, book: Optional[OpeningBook] = None,
+                          on_position: Optional[Callable[[int, Board, SearchResult], None]] = None) -> OpeningBook:
+    """
+    为各个无效格子布局生成开局库：从初始局面开始，逐层展开所有可能的落子，对前plies层出现的每个局面进行搜索并记录最佳落子
+    对称的局面只会搜索一次
+    :param on_position 每搜索完一个局面后的回调 on_position(ply, board, result)
+    """
+    if book is None:
+        book = OpeningBook()
+
+    engine = Engine(max_depth=depth, max_seconds=max_seconds, endgame_empties=0)
+    for invalid in invalid_layouts:
+        # Board.hash中不包含无效格子，上一个布局留下的置换表记录在新布局中是错误的，需要先清空
+        engine.tt.clear()
+        engine.endgame_tt.clear()
+
+        frontier = [Board.initial(invalid)]
+        for ply in range(plies):
+            next_frontier = {}  # type: Dict[str, Board]
+            for board in frontier:
+                moves = board.legal_moves()
+                if moves == 0:
+                    continue
+
+                res = engine.search(board)
+                book.add(board, bit_of(*res.move), res.score, res.depth)
+                if on_position is not None:
+                    on_position(ply, board, res)
+
+                for move in iter_bits(moves):
+                    child = board.copy()
+                    child.make(move)
+                    child = child.copy()
+                    if child.legal_moves() == 0:
+                        continue
+                    next_frontier.setdefault(OpeningBook.normalize(child)[0], child)
+
+            frontier = list(next_frontier.values())
+
+    return book
+
+
+def benchmark(max_workers=0, depth=7, position_count=6):
+    """
+    对比不同进程数时并行搜索的速度，以单进程的普通搜索为基准
+    用法：python reversi_engine.py benchmark [最大进程数] [搜索层数] [局面数]
+    """
+    max_workers = max_workers or multiprocessing.cpu_count()
+    positions = random_positions(position_count)
+
+    base_seconds = 0.0
+    for workers in range(1, max_workers + 1):
+        if workers == 1:
+            engine = Engine(max_depth=depth, max_seconds=3600)
+        else:
+            engine = ParallelEngine(workers=workers, max_depth=depth, max_seconds=3600)
+
+        nodes, seconds = 0, 0.0
+        worker_nodes_per_second = []  # type: List[float]
+        try:
+            for board in positions:
+                res = engine.search(board)
+                nodes += res.nodes
+                seconds += res.seconds
+                worker_nodes_per_second.extend(stat.nodes_per_second for stat in res.workers)
+        finally:
+            engine.close()
+
+        if workers == 1:
+            base_seconds = seconds
+
+        per_worker = ""
+        if worker_nodes_per_second:
+            per_worker = f" 单进程平均速度 {sum(worker_nodes_per_second) / len(worker_nodes_per_second):.0f}节点/秒"
+        print(f"{workers}进程: 耗时 {seconds:.2f}秒 节点数 {nodes} 总速度 {nodes / max(seconds, 1e-6):.0f}节点/秒 加速比 {base_seconds / max(seconds, 1e-6):.2f}{per_worker}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "benchmark":
+        benchmark(*[int(arg) for arg in sys.argv[2:5]])
+    elif len(sys.argv) >= 2 and sys.argv[1] == "book":
+        # 用法：python reversi_engine.py book --layouts "a1 b1 c1 d1 e1" "a2 b2 c2 d2 e2" --plies 4 --depth 8
+        import argparse
+
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--layouts", nargs="*", default=[""], help="无效格子布局，eg. \"a1 b1 c1 d1 e1\"，空字符串表示没有无效格子")
+        parser.add_argument("--plies", default=4, type=int, help="开局库覆盖的步数")
+        parser.add_argument("--depth", default=8, type=int, help="生成开局库时的搜索层数")
+        parser.add_argument("--output", default=opening_book_path, type=str)
+        args = parser.parse_args(sys.argv[2:])
+
+        book = OpeningBook.load(args.output) if os.path.exists(args.output) else OpeningBook()
+        generate_opening_book([parse_invalid_cells(layout) for layout in args.layouts], args.plies, args.depth, book=book,
+                              on_position=lambda ply, board, res: print(f"第{ply + 1}步 {res.move} 分数 {res.score} 层数 {res.depth} 耗时 {res.seconds:.2f}秒"))
+        book.save(args.output)
+        print(f"开局库共{len(book)}个局面，已保存至 {args.output}")
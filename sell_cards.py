@@ -8,7 +8,7 @@ from log import color, logger
 from main_def import (make_ark_lottery_card_and_award_info,
                       new_ark_lottery_parse_card_id_from_index)
 from qzone_activity import QzoneActivity
-from setting import parse_card_group_info_map, zzconfig
+from setting import card_group_info_map
 from util import show_head_line
 
 CARD_PLACEHOLDER = "XXXXXXXXXXX"
@@ -25,7 +25,7 @@ def sell_card(targetQQ: str, cards_to_send: List[str]) -> str:
     indexes = list(range(len(cfg.account_configs), 0, -1))
 
     if not is_new_version_ark_lottery():
-        card_info_map = parse_card_group_info_map(zzconfig())
+        card_info_map = card_group_info_map()
         for name in cards_to_send:
             if name not in card_info_map:
                 return f"{name}不是本期卡片名称，有效的卡片名称为： {list(card_info_map.keys())}"
@@ -174,7 +174,7 @@ def run_remote(args):
             # 新版集卡中名称为 1/2/3/4/.../10/11/12
             card_name_list = [new_ark_lottery_parse_card_id_from_index(args.card_index)]
         else:
-            card_info_map = parse_card_group_info_map(zzconfig())
+            card_info_map = card_group_info_map()
             card_name_list = [card_name for card_name, card_info in card_info_map.items() if card_info.index == args.card_index]
 
         msg = sell_card(args.target_qq, card_name_list)
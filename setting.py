@@ -1,13 +1,46 @@
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
 from config import ArkLotteryAwardConfig
 from setting_def import *
 from settings import ark_lottery, dnf_server_list
 
+_zzconfig = None  # type: Optional[ArkLotteryZzConfig]
+_card_group_info_map = None  # type: Optional[Mapping[str, ArkLotteryCard]]
+_prize_list = None  # type: Optional[Tuple[ArkLotteryAwardConfig, ...]]
+
+
+def zzconfig() -> ArkLotteryZzConfig:
+    """
+    集卡活动的配置，每个进程仅解析一次，之后各个DjcHelper共用
+    注意：返回的是共享的对象，使用方不应修改
+    """
+    global _zzconfig
+    if _zzconfig is None:
+        _zzconfig = ArkLotteryZzConfig().auto_update_config(ark_lottery.setting["zzconfig"])
+
+    return _zzconfig
+
+
+def card_group_info_map() -> Mapping[str, ArkLotteryCard]:
+    """集卡活动的 卡片名称 => 卡片信息，基于zzconfig()预先计算好，只读"""
+    global _card_group_info_map
+    if _card_group_info_map is None:
+        _card_group_info_map = MappingProxyType(parse_card_group_info_map(zzconfig()))
+
+    return _card_group_info_map
 
-def zzconfig():
-    return ArkLotteryZzConfig().auto_update_config(ark_lottery.setting["zzconfig"])
 
+def prize_list() -> Tuple[ArkLotteryAwardConfig, ...]:
+    """集卡活动需要依次领取的奖励列表，基于zzconfig()预先计算好，只读"""
+    global _prize_list
+    if _prize_list is None:
+        _prize_list = tuple(parse_prize_list(zzconfig()))
 
-def parse_card_group_info_map(cfg: ArkLotteryZzConfig):
+    return _prize_list
+
+
+def parse_card_group_info_map(cfg: ArkLotteryZzConfig) -> Dict[str, ArkLotteryCard]:
     card_group_info_map = {}
 
     groups = [
@@ -23,7 +56,7 @@ def parse_card_group_info_map(cfg: ArkLotteryZzConfig):
     return card_group_info_map
 
 
-def parse_prize_list(cfg: ArkLotteryZzConfig):
+def parse_prize_list(cfg: ArkLotteryZzConfig) -> List[ArkLotteryAwardConfig]:
     prize_list = []
 
     # 首先加入前三个礼包，eg：全民竞速礼包=28592，即刷即得礼包=28593，直播福利礼包=28594
@@ -53,54 +86,139 @@ def dnf_area_server_list_config() -> List[DnfAreaServerListConfig]:
     return area_servers
 
 
-def dnf_server_list_config():
-    area_servers = dnf_area_server_list_config()
+class DnfServerIndex(NamedTuple):
+    """
+    服务器列表的索引，每个进程仅构建一次，之后各个账号和界面共用
+    注意：其中的配置对象为共享的，使用方不应修改
+    """
+    areas: Tuple[DnfAreaServerListConfig, ...]
+    servers: Tuple[DnfServerConfig, ...]
+    server_names: Tuple[str, ...]
+    name_to_id: Mapping[str, str]
+    id_to_name: Mapping[str, str]
+    id_to_area: Mapping[str, DnfAreaServerListConfig]
+
+
+_dnf_server_index = None  # type: Optional[DnfServerIndex]
+
+
+def get_dnf_server_index() -> DnfServerIndex:
+    global _dnf_server_index
+    if _dnf_server_index is None:
+        _dnf_server_index = build_dnf_server_index(dnf_area_server_list_config())
 
+    return _dnf_server_index
+
+
+def build_dnf_server_index(areas: List[DnfAreaServerListConfig]) -> DnfServerIndex:
     servers = []  # type: List[DnfServerConfig]
-    for area_server in area_servers:
-        servers.extend(area_server.opt_data_array)
+    name_to_id = {}  # type: Dict[str, str]
+    id_to_name = {}  # type: Dict[str, str]
+    id_to_area = {}  # type: Dict[str, DnfAreaServerListConfig]
+    for area in areas:
+        for server in area.opt_data_array:
+            servers.append(server)
+
+            # 与原先按顺序查找的行为保持一致，重名时以第一个为准
+            name_to_id.setdefault(server.t, server.v)
+            id_to_name.setdefault(server.v, server.t)
+            id_to_area.setdefault(server.v, area)
+
+    return DnfServerIndex(
+        tuple(areas),
+        tuple(servers),
+        tuple(server.t for server in servers),
+        MappingProxyType(name_to_id),
+        MappingProxyType(id_to_name),
+        MappingProxyType(id_to_area),
+    )
+
 
-    return servers
+def dnf_server_list_config() -> List[DnfServerConfig]:
+    return list(get_dnf_server_index().servers)
 
 
 def dnf_server_name_list():
-    return ['', *[server.t for server in dnf_server_list_config()]]
+    return ['', *get_dnf_server_index().server_names]
 
 
 def dnf_server_name_to_id(name):
-    for server in dnf_server_list_config():
-        if server.t == name:
-            return server.v
-
-    return ""
+    return get_dnf_server_index().name_to_id.get(name, "")
 
 
 def dnf_server_id_to_name(id):
-    for server in dnf_server_list_config():
-        if server.v == str(id):
-            return server.t
-
-    return ""
+    return get_dnf_server_index().id_to_name.get(str(id), "")
 
 
 def dnf_server_id_to_area_info(id: str) -> DnfAreaServerListConfig:
-    for area in dnf_area_server_list_config():
-        for server in area.opt_data_array:
-            if server.v == id:
-                return area
-
-    return DnfAreaServerListConfig()
+    area = get_dnf_server_index().id_to_area.get(id)
+    if area is None:
+        return DnfAreaServerListConfig()
+
+    return area
+
+
+def benchmark(times=100000):
+    """
+    对比每次重新解析服务器列表后顺序查找与使用索引查找的耗时
+    用法：python setting.py benchmark
+    """
+    import time
+
+    def _linear_server_id_to_name(id):
+        # 原先的实现
+        for area in dnf_area_server_list_config():
+            for server in area.opt_data_array:
+                if server.v == str(id):
+                    return server.t
+
+        return ""
+
+    index = get_dnf_server_index()
+    ids = [server.v for server in index.servers]
+    names = [server.t for server in index.servers]
+
+    linear_times = max(times // 1000, 10)
+    start_time = time.perf_counter()
+    for idx in range(linear_times):
+        _linear_server_id_to_name(ids[idx % len(ids)])
+    linear = (time.perf_counter() - start_time) / linear_times
+
+    start_time = time.perf_counter()
+    build_dnf_server_index(dnf_area_server_list_config())
+    build = time.perf_counter() - start_time
+
+    result = {}
+    for func, args in [
+        (dnf_server_id_to_name, ids),
+        (dnf_server_name_to_id, names),
+        (dnf_server_id_to_area_info, ids),
+    ]:
+        start_time = time.perf_counter()
+        for idx in range(times):
+            func(args[idx % len(args)])
+        result[func.__name__] = (time.perf_counter() - start_time) / times
+
+    print(f"共{len(index.areas)}个大区 {len(index.servers)}个服务器，构建索引耗时 {build * 1000:.2f}ms")
+    print(f"原先每次查找耗时 {linear * 1000:.3f}ms")
+    for name, seconds in result.items():
+        print(f"{name}: {seconds * 1e6:.3f}us/次 加速比 {linear / max(seconds, 1e-12):.0f}")
 
 
 if __name__ == '__main__':
-    cfg = zzconfig()
+    import sys
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "benchmark":
+        benchmark()
+        sys.exit(0)
+
     print("卡片信息如下")
-    for name, card in parse_card_group_info_map(cfg).items():
+    for name, card in card_group_info_map().items():
         print(card.index, name, card)
 
     print()
     print("奖励信息如下")
-    for prize in parse_prize_list(cfg):
+    for prize in prize_list():
         print(prize)
 
     print(dnf_server_name_list())
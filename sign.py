@@ -1,8 +1,5 @@
 import time
 
-from Crypto.Cipher import PKCS1_v1_5
-from Crypto.PublicKey import RSA
-
 from data_struct import AESCipher
 
 init_token_value = 5381
@@ -25,7 +22,10 @@ def getDjcSignParams(aes_key, rsa_public_key_file, qq_number, sDeviceID, appVers
     # aes
     encrypted = AESCipher(aes_key).encrypt(dataToSign)
 
-    # rsa
+    # rsa（Crypto导入耗时较长，仅在实际需要签名时才导入）
+    from Crypto.Cipher import PKCS1_v1_5
+    from Crypto.PublicKey import RSA
+
     rasPublicKey = RSA.import_key(open(rsa_public_key_file, "rb").read())
     encrypted = PKCS1_v1_5.new(rasPublicKey).encrypt(encrypted)
 
@@ -0,0 +1,40 @@
+import io
+import lzma
+import os
+
+import pytest
+
+from compress import compress_stream_with_lzma, decompress_file_with_lzma
+
+block_size = 4 * 1024
+
+
+@pytest.mark.parametrize("size", [
+    0,
+    block_size - 1,
+    block_size,
+    # 块数超过同时保留在内存中的块数(2*max_workers)，覆盖边压缩边写入的流程
+    10 * block_size + 123,
+])
+def test_compress_stream_with_lzma_round_trip(tmp_path, size):
+    # 随机数据与可压缩数据交替，使各块压缩后的大小不同，确保拼接顺序出错时能够发现
+    content = b"".join(os.urandom(512) + bytes([index % 256]) * 512 for index in range(size // 1024 + 1))[:size]
+
+    compressed_filepath = os.path.join(tmp_path, "test.bin.7z")
+    with open(compressed_filepath, "wb") as file_out:
+        compress_stream_with_lzma(io.BytesIO(content), file_out, block_size=block_size, max_workers=2)
+
+    # 每块压缩为一个独立的xz流，空文件也有一个
+    with open(compressed_filepath, "rb") as f:
+        assert f.read().count(b"\xfd7zXZ\x00") == max((size + block_size - 1) // block_size, 1)
+
+    with lzma.open(compressed_filepath, "rb") as f:
+        assert f.read() == content
+
+    with open(compressed_filepath, "rb") as f:
+        assert lzma.decompress(f.read()) == content
+
+    filepath = os.path.join(tmp_path, "test.bin")
+    decompress_file_with_lzma(compressed_filepath, filepath)
+    with open(filepath, "rb") as f:
+        assert f.read() == content
@@ -0,0 +1,85 @@
+import logging
+import os
+import time
+
+import config
+from config import config_snapshot_format, load_config
+
+
+def write_config(path: str, name: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'[[account_configs]]\nname = "{name}"\n')
+
+
+def test_config_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "config_snapshot_path", str(tmp_path / "config.snapshot"))
+    monkeypatch.setattr(config, "g_config", config.Config())
+
+    config_path = str(tmp_path / "config.toml")
+    local_config_path = str(tmp_path / "config.toml.local")
+    write_config(config_path, "账号1")
+
+    load_config(config_path, local_config_path, reset_before_load=True)
+    first = config.config()
+    assert os.path.isfile(config.config_snapshot_path)
+
+    # 配置未变动时直接使用快照，其中包括已经计算好的sDjcSign
+    load_config(config_path, local_config_path, reset_before_load=True)
+    assert config.config() is not first
+    assert config.config().account_configs[0].name == "账号1"
+    assert config.config().account_configs[0].sDjcSign == first.account_configs[0].sDjcSign
+
+    # 新增本地配置后快照失效
+    write_config(local_config_path, "账号2")
+    load_config(config_path, local_config_path, reset_before_load=True)
+    second = config.config()
+    assert second.account_configs[0].name == "账号2"
+    assert second.account_configs[0].sDjcSign != first.account_configs[0].sDjcSign
+
+    # 快照过期后重新解析
+    monkeypatch.setattr(config, "config_snapshot_ttl", 0)
+    time.sleep(0.01)
+    load_config(config_path, local_config_path, reset_before_load=True)
+    assert config.config().account_configs[0].sDjcSign != second.account_configs[0].sDjcSign
+
+    # 快照格式变动后重新解析
+    monkeypatch.setattr(config, "config_snapshot_ttl", 60)
+    monkeypatch.setattr(config, "config_snapshot_format", config_snapshot_format + 1)
+    assert config.load_config_snapshot(config.get_config_snapshot_sources(config_path, local_config_path)) is None
+
+
+def test_config_snapshot_runtime_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "config_snapshot_path", str(tmp_path / "config.snapshot"))
+    monkeypatch.setattr(config, "g_config", config.Config())
+    # 测试结束后还原日志等级
+    monkeypatch.setattr(config.consoleHandler, "level", config.consoleHandler.level)
+    monkeypatch.setattr(config.lanzou_logger, "level", config.lanzou_logger.level)
+
+    url_config_path = str(tmp_path / "url.toml")
+    monkeypatch.setattr(config, "get_url_config_path", lambda: url_config_path)
+    with open(url_config_path, 'w', encoding='utf-8') as f:
+        f.write('netdisk_link = "link1"\n')
+
+    config_path = str(tmp_path / "config.toml")
+    with open(config_path, 'w', encoding='utf-8') as f:
+        f.write('[common]\nlog_level = "warning"\n\n[[account_configs]]\nname = "账号1"\n')
+
+    load_config(config_path, "", reset_before_load=True)
+    assert config.config().common.netdisk_link == "link1"
+
+    # 使用快照时，仍会应用日志等级等影响整个进程的配置
+    config.consoleHandler.setLevel(logging.INFO)
+    config.lanzou_logger.setLevel(logging.INFO)
+    load_config(config_path, "", reset_before_load=True)
+    assert config.consoleHandler.level == logging.WARNING
+    assert config.lanzou_logger.level == logging.WARNING
+
+    # url.toml变动后快照失效，并读取到新的链接
+    sources = config.get_config_snapshot_sources(config_path, "")
+    with open(url_config_path, 'w', encoding='utf-8') as f:
+        f.write('netdisk_link = "link2"\n')
+    assert config.load_config_snapshot(sources) is not None
+    assert config.load_config_snapshot(config.get_config_snapshot_sources(config_path, "")) is None
+
+    load_config(config_path, "", reset_before_load=True)
+    assert config.config().common.netdisk_link == "link2"
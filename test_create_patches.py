@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from _create_patches import (clean_prepared_dir_cache, get_dir_fingerprint,
+                             prepare_version_dir)
+
+version_dir = "DNF蚊子腿小助手_v10.0.0_by风之凌殇"
+
+
+def write_file(path: str, content: str, mtime: int):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def release_dir(tmp_path, monkeypatch):
+    # 版本目录与缓存目录均为相对路径，与实际制作补丁时一样，在发布目录下进行
+    monkeypatch.chdir(tmp_path)
+
+    write_file(os.path.join(version_dir, "DNF蚊子腿小助手.exe"), "exe", 1_000_000_000)
+    write_file(os.path.join(version_dir, "config.toml"), "[common]", 1_000_000_000)
+    write_file(os.path.join(version_dir, "utils", "auto_updater.exe"), "updater", 1_000_000_000)
+    write_file(os.path.join(version_dir, "utils", "bandizip_portable", "bz.exe"), "bz", 1_000_000_000)
+
+    return tmp_path
+
+
+def test_prepare_version_dir(release_dir):
+    prepared_dir = prepare_version_dir(version_dir)
+
+    assert os.path.isfile(os.path.join(prepared_dir, "DNF蚊子腿小助手.exe"))
+    assert os.path.isfile(os.path.join(prepared_dir, "utils", "bandizip_portable", "bz.exe"))
+    # 不参与补丁的文件仅从预处理后的目录中移除，原版本目录保持不变
+    assert not os.path.exists(os.path.join(prepared_dir, "config.toml"))
+    assert not os.path.exists(os.path.join(prepared_dir, "utils", "auto_updater.exe"))
+    assert os.path.isfile(os.path.join(version_dir, "config.toml"))
+    assert os.path.isfile(os.path.join(version_dir, "utils", "auto_updater.exe"))
+    assert not os.path.exists(prepared_dir + ".tmp")
+
+
+def test_prepare_version_dir_reuse_cache(release_dir):
+    prepared_dir = prepare_version_dir(version_dir)
+    # 在缓存目录中放一个标记文件，若复用了缓存，标记文件应当仍然存在
+    marker = os.path.join(prepared_dir, "cache_marker")
+    write_file(marker, "", 1_000_000_000)
+
+    assert prepare_version_dir(version_dir) == prepared_dir
+    assert os.path.isfile(marker)
+
+
+@pytest.mark.parametrize("content,mtime", [
+    ("new exe", 1_000_000_000),  # 大小变化
+    ("exe", 2_000_000_000),  # 仅修改时间变化
+])
+def test_prepare_version_dir_invalidate_cache(release_dir, content, mtime):
+    fingerprint = get_dir_fingerprint(version_dir)
+    prepared_dir = prepare_version_dir(version_dir)
+
+    write_file(os.path.join(version_dir, "DNF蚊子腿小助手.exe"), content, mtime)
+
+    assert get_dir_fingerprint(version_dir) != fingerprint
+    new_prepared_dir = prepare_version_dir(version_dir)
+    assert new_prepared_dir != prepared_dir
+    with open(os.path.join(new_prepared_dir, "DNF蚊子腿小助手.exe"), encoding="utf-8") as f:
+        assert f.read() == content
+
+    # 清理时仅保留本次用到的缓存
+    clean_prepared_dir_cache([new_prepared_dir])
+    assert not os.path.exists(prepared_dir)
+    assert os.path.isdir(new_prepared_dir)
@@ -0,0 +1,227 @@
+import copy
+import dis
+import io
+import json
+import pickle
+from typing import Dict, List
+
+import pytest
+
+from data_struct import (ConfigInterface, SlotsConfigInterface, assigned_attrs,
+                         dump_json, to_json, to_raw_type)
+
+
+class SubConfig(ConfigInterface):
+    def __init__(self):
+        self.val = 0
+        self.updated = False
+
+    def on_config_update(self, raw_config: dict):
+        self.updated = True
+
+
+class TestConfig(ConfigInterface):
+    class_val = "class"
+
+    def __init__(self):
+        self.int_val = 0
+        self.sub_config = SubConfig()
+        self.list_int = []  # type: List[int]
+        self.list_sub_config = []  # type: List[SubConfig]
+        self.dict_str_sub_config = {}  # type: Dict[str, SubConfig]
+
+    def fields_to_fill(self):
+        return [
+            ('list_sub_config', SubConfig),
+        ]
+
+    def dict_fields_to_fill(self):
+        return [
+            ('dict_str_sub_config', SubConfig),
+        ]
+
+
+def test_auto_update_config_same_as_reflectively():
+    raw_configs = [
+        {
+            "int_val": 1,
+            "sub_config": {"val": 2},
+            "list_int": [1, 2, 3],
+            "list_sub_config": [{"val": 1}, {"val": 2}],
+            "dict_str_sub_config": {"1": {"val": 1}},
+            "unknown": "ignored",
+            "class_val": "instance",
+        },
+        # 数组和字典字段为None或者类型不匹配的情况
+        {
+            "list_sub_config": None,
+            "dict_str_sub_config": "invalid",
+        },
+        {},
+    ]
+
+    for raw_config in raw_configs:
+        fast = TestConfig().auto_update_config(raw_config)
+        reflectively = TestConfig().auto_update_config_reflectively(raw_config)
+
+        assert to_raw_type(fast) == to_raw_type(reflectively)
+        assert fast.class_val == reflectively.class_val
+        assert not hasattr(fast, "unknown")
+
+
+def test_auto_update_config_nested():
+    config = TestConfig().auto_update_config({
+        "sub_config": {"val": 2},
+        "list_sub_config": [{"val": 1}],
+        "dict_str_sub_config": {"1": {"val": 1}},
+    })
+
+    assert type(config.sub_config) is SubConfig
+    assert config.sub_config.val == 2
+    assert config.sub_config.updated
+    assert type(config.list_sub_config[0]) is SubConfig
+    assert config.list_sub_config[0].updated
+    assert config.dict_str_sub_config["1"].val == 1
+
+    # 同一个对象再次更新时，只覆盖提供的字段
+    config.auto_update_config({"int_val": 3})
+    assert config.int_val == 3
+    assert config.sub_config.val == 2
+
+
+def test_to_json_same_as_to_raw_type():
+    config = TestConfig().auto_update_config({
+        "int_val": 1,
+        "sub_config": {"val": "中文"},
+        "list_sub_config": [{"val": 1}, {"val": 2}],
+        "dict_str_sub_config": {"1": {"val": 1}},
+    })
+    config.tuple_val = (1, config.sub_config)
+
+    for kwargs in [{}, {"indent": 2}, {"ensure_ascii": True}]:
+        expected = json.dumps(to_raw_type(config), **{"ensure_ascii": False, **kwargs})
+        assert to_json(config, **kwargs) == expected
+
+        fp = io.StringIO()
+        dump_json(config, fp, **kwargs)
+        assert fp.getvalue() == expected
+
+    assert str(config) == json.dumps(to_raw_type(config), ensure_ascii=False)
+    assert json.loads(to_json(config, compact=True)) == json.loads(str(config))
+    assert to_json({"set": {1}}) == '{"set": [1]}'
+
+
+def test_save_compact(tmp_path):
+    config = TestConfig().auto_update_config({"list_sub_config": [{"val": 1}]})
+
+    filepath = str(tmp_path / "config.json")
+    config.save_to_json_file(filepath, compact=True)
+    with open(filepath, encoding='utf-8') as f:
+        content = f.read()
+    assert "\n" not in content
+    assert json.loads(content) == to_raw_type(config)
+
+    loaded = TestConfig()
+    loaded.load_from_json_file(filepath)
+    assert to_raw_type(loaded.list_sub_config) == to_raw_type(config.list_sub_config)
+
+
+class SlotsSubConfig(SlotsConfigInterface):
+    def __init__(self):
+        self.val = 0
+
+
+class SlotsConfig(SlotsConfigInterface):
+    def __init__(self):
+        self.int_val = 0
+        self.sub_config = SlotsSubConfig()
+        self.list_sub_config = []  # type: List[SlotsSubConfig]
+
+    def fields_to_fill(self):
+        return [
+            ('list_sub_config', SlotsSubConfig),
+        ]
+
+    def reset(self):
+        self.later_val = ""
+
+
+class SlotsShadowConfig(SlotsConfigInterface):
+    class_val = "class"
+
+    def __init__(self):
+        self.val = 0
+        self.class_val = "instance"
+
+
+def test_slots_config():
+    assert SlotsConfig.__slots__ == ('int_val', 'sub_config', 'list_sub_config', 'later_val')
+    assert not hasattr(SlotsConfig(), "__dict__")
+
+    raw_config = {"int_val": 1, "sub_config": {"val": 2}, "list_sub_config": [{"val": 3}], "unknown": "ignored"}
+    config = SlotsConfig().auto_update_config(raw_config)
+    assert config.sub_config.val == 2
+    assert type(config.list_sub_config[0]) is SlotsSubConfig
+
+    # 未赋值的slot字段不参与序列化，与原先字段不存在时的行为一致
+    expected = {"int_val": 1, "sub_config": {"val": 2}, "list_sub_config": [{"val": 3}]}
+    assert to_raw_type(config) == expected
+    assert json.loads(str(config)) == expected
+    assert to_raw_type(SlotsConfig().auto_update_config_reflectively(raw_config)) == expected
+
+    for cloned in [pickle.loads(pickle.dumps(config)), copy.deepcopy(config)]:
+        assert to_raw_type(cloned) == expected
+
+    # 未声明的字段不能动态添加
+    with pytest.raises(AttributeError):
+        config.unknown = "unknown"
+
+
+def test_slots_shadow_class_attr():
+    # 实例字段覆盖了类属性时，保留__dict__来存放该字段
+    config = SlotsShadowConfig().auto_update_config({"val": 1, "class_val": "updated"})
+    assert SlotsShadowConfig.__slots__ == ('val', '__dict__')
+    assert to_raw_type(config) == {"val": 1, "class_val": "updated"}
+
+
+def assigned_attrs_by_dis(func) -> List[str]:
+    """assigned_attrs基于dis.get_instructions的原始实现，用于对比"""
+    code = getattr(func, "__code__", None)
+    if code is None or code.co_argcount == 0:
+        return []
+
+    self_name = code.co_varnames[0]
+
+    attrs = []
+    prev = None
+    for instr in dis.get_instructions(code):
+        # self.xxx = val 编译为 加载val -> 加载self -> STORE_ATTR xxx，高版本中前两步可能合并为一条LOAD_FAST_LOAD_FAST
+        if instr.opname == "STORE_ATTR" and prev is not None and prev.opname.startswith("LOAD_FAST"):
+            loaded = prev.argval[-1] if isinstance(prev.argval, tuple) else prev.argval
+            if loaded == self_name and instr.argval not in attrs:
+                attrs.append(instr.argval)
+
+        prev = instr
+
+    return attrs
+
+
+def test_assigned_attrs_same_as_dis():
+    import config
+
+    def nested_assign(self, other):
+        other.not_self = 1
+        self.a, self.b = 1, 2
+        for i in range(300):
+            self.c = i
+        self.a = 3
+
+    assert assigned_attrs(nested_assign) == ["a", "b", "c"]
+
+    funcs = [nested_assign]
+    for val in vars(config).values():
+        if isinstance(val, type):
+            funcs.extend(vars(val).values())
+
+    for func in funcs:
+        assert assigned_attrs(func) == assigned_attrs_by_dis(func)
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+import pytest
+
+from lazy_import import lazy_import, lazy_modules, lazy_object
+
+# 启动时导入main的耗时上限，留有较多余量，避免机器性能波动导致误报，主要用于发现重新在启动时导入了重量级模块这类回退
+import_main_budget_seconds = 1.0
+
+# 这些模块导入耗时较长，且仅在部分流程中使用，不应在启动时导入
+heavy_modules = [
+    "selenium.webdriver",
+    "leancloud",
+    "Crypto.Cipher",
+    "PyQt5",
+]
+
+
+class ImportTime(NamedTuple):
+    name: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_time(stderr: str) -> Dict[str, ImportTime]:
+    """解析 -X importtime 的输出，格式为 import time: self [us] | cumulative | imported package"""
+    result = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # 表头
+            continue
+
+        name = name.strip()
+        result[name] = ImportTime(name, int(self_us), int(cumulative_us))
+
+    return result
+
+
+def measure_import_time(module: str) -> Dict[str, ImportTime]:
+    env = dict(os.environ)
+    # 允许写入pyc，与实际使用时一致
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, encoding="utf-8")
+    assert res.returncode == 0, res.stderr
+
+    return parse_import_time(res.stderr)
+
+
+def format_report(import_times: Dict[str, ImportTime], top_n=20) -> str:
+    slowest = sorted(import_times.values(), key=lambda t: t.self_us, reverse=True)[:top_n]  # type: List[ImportTime]
+
+    lines = [f"{'self(ms)':>10} {'cumulative(ms)':>15}  module"]
+    for t in slowest:
+        lines.append(f"{t.self_us / 1000:>10.1f} {t.cumulative_us / 1000:>15.1f}  {t.name}")
+
+    return "\n".join(lines)
+
+
+def test_parse_import_time():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   json.decoder",
+        "import time:       200 |        300 | json",
+        "unrelated line",
+    ])
+
+    assert parse_import_time(stderr) == {
+        "json.decoder": ImportTime("json.decoder", 100, 100),
+        "json": ImportTime("json", 200, 300),
+    }
+
+
+def test_import_main_time_budget():
+    # 首次运行时可能需要编译pyc，先预热一次，之后取多次中最快的一次，减少波动
+    measure_import_time("main")
+    import_times = min((measure_import_time("main") for _ in range(3)), key=lambda times: times["main"].cumulative_us)
+
+    report = format_report(import_times)
+    print(report)
+
+    imported_heavy_modules = [name for name in heavy_modules if name in import_times]
+    assert imported_heavy_modules == [], f"启动时不应导入 {imported_heavy_modules}\n{report}"
+
+    seconds = import_times["main"].cumulative_us / 1e6
+    assert seconds < import_main_budget_seconds, f"导入main耗时 {seconds:.3f}秒，超过了预算 {import_main_budget_seconds}秒\n{report}"
+
+
+def test_lazy_import(monkeypatch):
+    monkeypatch.setattr("lazy_import.lazy_modules", lazy_modules + ["json"])
+
+    json = lazy_import("json")
+    dumps = lazy_object("json", "dumps")
+    assert json.dumps([1]) == "[1]"
+    assert dumps([1]) == "[1]"
+    assert dumps.__name__ == "dumps"
+
+    # 未登记的模块打包后无法导入，直接报错
+    with pytest.raises(ValueError):
+        lazy_import("not_registered")
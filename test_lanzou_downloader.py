@@ -0,0 +1,114 @@
+import hashlib
+import os
+import pickle
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from lanzou.api.downloader import (SegmentedDownloader, calc_file_hash,
+                                   get_range_support_size)
+
+test_content = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    support_range = True
+
+    def do_GET(self):
+        data = test_content
+        range_header = self.headers.get("Range", "")
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header)
+        if self.support_range and match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(data) - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            data = data[start:end + 1]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class NoRangeRequestHandler(RangeRequestHandler):
+    support_range = False
+
+
+def start_server(handler_class):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/test.7z"
+
+
+@pytest.fixture()
+def range_server():
+    server, url = start_server(RangeRequestHandler)
+    yield url
+    server.shutdown()
+
+
+def test_get_range_support_size(range_server):
+    session = requests.Session()
+    assert get_range_support_size(session, range_server, {}) == len(test_content)
+
+    server, url = start_server(NoRangeRequestHandler)
+    try:
+        assert get_range_support_size(session, url, {}) == -1
+    finally:
+        server.shutdown()
+
+
+def test_segmented_download(range_server, tmp_path):
+    tmp_file_path = str(tmp_path / "test.7z.download")
+    progress = []
+
+    downloader = SegmentedDownloader(requests.Session(), {}, thread_count=4, min_segment_size=512 * 1024)
+    stat = downloader.download(range_server, tmp_file_path, len(test_content),
+                               expected_hash=hashlib.sha256(test_content).hexdigest(),
+                               callback=lambda name, total, now: progress.append(now))
+
+    assert stat.ok
+    assert stat.segment_count == 4
+    assert stat.downloaded_size == len(test_content)
+    assert progress[-1] == len(test_content)
+    assert not SegmentedDownloader.has_progress(tmp_file_path)
+    with open(tmp_file_path, "rb") as f:
+        assert f.read() == test_content
+
+
+def test_segmented_download_resume(range_server, tmp_path):
+    tmp_file_path = str(tmp_path / "test.7z.download")
+    total_size = len(test_content)
+
+    # 模拟上次下载中断：前半部分已下载完毕，后半部分只下载了一部分
+    half = total_size // 2
+    with open(tmp_file_path, "wb") as f:
+        f.truncate(total_size)
+        f.write(test_content[:half + 100])
+    with open(tmp_file_path + SegmentedDownloader.record_suffix, "wb") as rf:
+        pickle.dump({"total_size": total_size, "segments": [[0, half - 1, half], [half, total_size - 1, 100]]}, rf)
+
+    downloader = SegmentedDownloader(requests.Session(), {}, thread_count=2, min_segment_size=512 * 1024)
+    stat = downloader.download(range_server, tmp_file_path, total_size)
+
+    assert stat.ok
+    assert stat.downloaded_size == total_size - half - 100
+    assert calc_file_hash(tmp_file_path) == hashlib.sha256(test_content).hexdigest()
+
+
+def test_segmented_download_hash_mismatch(range_server, tmp_path):
+    tmp_file_path = str(tmp_path / "test.7z.download")
+
+    downloader = SegmentedDownloader(requests.Session(), {}, thread_count=2, min_segment_size=512 * 1024)
+    stat = downloader.download(range_server, tmp_file_path, len(test_content), expected_hash="0" * 64)
+
+    assert not stat.ok
+    assert not os.path.exists(tmp_file_path)
+    assert not SegmentedDownloader.has_progress(tmp_file_path)
@@ -0,0 +1,202 @@
+import threading
+import time
+
+import pytest
+
+import lanzou.api.core
+from lanzou.api.core import LanZouCloud
+from lanzou.api.folder_index import FolderIndex, FolderIndexEntry
+from lanzou.api.models import FolderList
+from lanzou.api.types import FileInFolder
+
+share_url = "https://example.lanzoui.com/b01abcdef"
+total_pages = 7
+files_per_page = 3
+
+
+def make_page_files(page):
+    return [FileInFolder(name=f"page{page}_{index}.7z", time="2021-01-01", size="1.0 M", type="7z", url=f"https://example.lanzoui.com/i{page}_{index}")
+            for index in range(files_per_page)]
+
+
+class StubPageFetcher:
+    """模拟蓝奏云的分享页与分页接口，记录每次请求的页码"""
+
+    def __init__(self, error_page=0):
+        self.error_page = error_page
+        self.parse_count = 0
+        self.requested_pages = []
+        self.lock = threading.Lock()
+
+    def parse_folder_page(self, share_url, dir_pwd=''):
+        self.parse_count += 1
+        folder_meta = {'name': "DNF蚊子腿小助手", 'id': "123", 'time': "01-01", 'desc': ""}
+        return LanZouCloud.SUCCESS, FolderIndexEntry(folder_meta, FolderList(), {'fid': "123", 'pwd': dir_pwd})
+
+    def get_folder_page(self, post_data, page, max_retries=5):
+        with self.lock:
+            self.requested_pages.append(page)
+        # 稍等一下，让同一批的页面确实并发请求
+        time.sleep(0.01)
+
+        if page == self.error_page:
+            return LanZouCloud.NETWORK_ERROR, None
+        if page > total_pages:
+            return LanZouCloud.SUCCESS, None
+        return LanZouCloud.SUCCESS, make_page_files(page)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = FolderIndex(ttl=120)
+    monkeypatch.setattr(lanzou.api.core, "folder_index", index)
+    return index
+
+
+def make_lzy(monkeypatch, fetcher):
+    lzy = LanZouCloud()
+    monkeypatch.setattr(lzy, "_parse_folder_page", fetcher.parse_folder_page)
+    monkeypatch.setattr(lzy, "_get_folder_page", fetcher.get_folder_page)
+    return lzy
+
+
+def all_file_names():
+    return [file.name for page in range(1, total_pages + 1) for file in make_page_files(page)]
+
+
+def test_concurrent_page_walk(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+
+    detail = lzy.get_folder_info_by_url_concurrently(share_url, max_workers=3)
+
+    assert detail.code == LanZouCloud.SUCCESS
+    assert [file.name for file in detail.files] == all_file_names()
+    assert detail.folder.name == "DNF蚊子腿小助手"
+    # 每页只请求一次，且最多多请求一批中超出最后一页的部分
+    assert len(fetcher.requested_pages) == len(set(fetcher.requested_pages))
+    assert set(range(1, total_pages + 1)) <= set(fetcher.requested_pages)
+    assert max(fetcher.requested_pages) <= total_pages + 3
+
+
+def test_concurrent_page_walk_same_as_sequential(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+    # 逐页请求时每页之间会等待一会，这里无需等待
+    monkeypatch.setattr(lanzou.api.core, "sleep", lambda seconds: None)
+
+    sequential = lzy.get_folder_info_by_url(share_url)
+    concurrent = lzy.get_folder_info_by_url_concurrently(share_url, max_workers=4)
+
+    assert list(concurrent.files) == list(sequential.files)
+
+
+def test_max_pages(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+
+    detail = lzy.get_folder_info_by_url_concurrently(share_url, max_pages=2, max_workers=4)
+
+    assert len(detail.files) == 2 * files_per_page
+    assert sorted(fetcher.requested_pages) == [1, 2]
+
+
+def test_stop_when_early_exit(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+
+    target = make_page_files(2)[0].name
+
+    def found_target(files):
+        return any(file.name == target for file in files)
+
+    detail = lzy.get_folder_info_by_url_concurrently(share_url, max_workers=2, stop_when=found_target)
+
+    assert found_target(detail.files)
+    # 第一批(1、2页)中已找到，不再请求后续页面
+    assert sorted(fetcher.requested_pages) == [1, 2]
+
+    # 之后需要完整列表时，只需补充请求剩余的页面
+    detail = lzy.get_folder_info_by_url_concurrently(share_url, max_workers=2)
+    assert [file.name for file in detail.files] == all_file_names()
+    assert fetcher.parse_count == 1
+    assert sorted(fetcher.requested_pages)[:total_pages] == list(range(1, total_pages + 1))
+    assert len(fetcher.requested_pages) == len(set(fetcher.requested_pages))
+
+
+def test_cache_hit(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+
+    first = lzy.get_folder_info_by_url_concurrently(share_url)
+    request_count = len(fetcher.requested_pages)
+    second = lzy.get_folder_info_by_url_concurrently(share_url)
+
+    assert list(second.files) == list(first.files)
+    assert fetcher.parse_count == 1
+    assert len(fetcher.requested_pages) == request_count
+
+    # 提取码不同时视为不同的文件夹
+    lzy.get_folder_info_by_url_concurrently(share_url, dir_pwd="abcd")
+    assert fetcher.parse_count == 2
+
+
+def test_cache_invalidate(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    lzy.invalidate_folder_index([share_url])
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    assert fetcher.parse_count == 2
+
+    # 清除其他链接的缓存不影响当前链接
+    lzy.invalidate_folder_index(["https://example.lanzoui.com/b02other"])
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    assert fetcher.parse_count == 2
+
+    # 未指定链接时清空全部缓存
+    lzy.invalidate_folder_index()
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    assert fetcher.parse_count == 3
+
+
+def test_cache_expire(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+    lzy.set_folder_index_ttl(0.2)
+
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    assert fetcher.parse_count == 1
+
+    time.sleep(0.3)
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    assert fetcher.parse_count == 2
+
+
+def test_cache_disabled(monkeypatch, index):
+    fetcher = StubPageFetcher()
+    lzy = make_lzy(monkeypatch, fetcher)
+    lzy.set_folder_index_ttl(0)
+
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    lzy.get_folder_info_by_url_concurrently(share_url)
+    assert fetcher.parse_count == 2
+    assert index.get(share_url, '') is None
+
+
+def test_error_page_invalidates_cache(monkeypatch, index):
+    fetcher = StubPageFetcher(error_page=3)
+    lzy = make_lzy(monkeypatch, fetcher)
+
+    detail = lzy.get_folder_info_by_url_concurrently(share_url, max_workers=2)
+
+    assert detail.code == LanZouCloud.NETWORK_ERROR
+    assert index.get(share_url, '') is None
+
+    fetcher.error_page = 0
+    detail = lzy.get_folder_info_by_url_concurrently(share_url, max_workers=2)
+    assert detail.code == LanZouCloud.SUCCESS
+    assert [file.name for file in detail.files] == all_file_names()
+    assert fetcher.parse_count == 2
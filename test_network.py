@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import network
+from network import StreamingJsonExtractor, http_request
+
+
+def extract(text: str, prefix: str, chunk_size: int):
+    extractor = StreamingJsonExtractor(prefix)
+    for i in range(0, len(text), chunk_size):
+        if extractor.feed(text[i:i + chunk_size]):
+            return extractor.result
+
+    return None
+
+
+def test_streaming_json_extractor():
+    prefix = "window.syncData = "
+    data = {
+        "actCount": {"rule": {"1": [{"left": 3}]}},
+        "text": 'quote " brace } bracket ] backslash \\ "}',
+        "中文": ["{", "[", "\\\""],
+    }
+    page = f'<script>var a = "{{"; {prefix}{json.dumps(data, ensure_ascii=False)};\n</script>{{ "trailing": ['
+
+    # 无论如何分块，前缀、转义符被切断时都能正确解析，且不会读到后续内容
+    for chunk_size in [1, 2, 3, 7, 16, len(page)]:
+        assert extract(page, prefix, chunk_size) == data
+
+    assert extract('<script>window.other = {"a": 1};</script>', prefix, 4) is None
+    assert extract(f'{prefix}{{"a": [1, 2', prefix, 4) is None
+
+
+def test_http_request_stats_and_rate_limit(monkeypatch):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Set-Cookie", "uin=o123")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{server.server_port}"
+
+    monkeypatch.setattr(network, "_host_stats", {})
+    monkeypatch.setitem(network.host_min_request_interval, host, 0.1)
+    try:
+        start_time = time.time()
+        for _ in range(3):
+            res = http_request("GET", f"http://{host}/", timeout=5)
+            assert res.text == "ok"
+            assert res.cookies.get("uin") == "o123"
+        assert time.time() - start_time >= 0.2
+
+        # 共用的会话中不保存服务器返回的cookie
+        assert len(network.get_http_session().cookies) == 0
+
+        stat = network.get_host_stats()[0]
+        assert (stat.host, stat.count, stat.failed_count) == (host, 3, 0)
+    finally:
+        server.shutdown()
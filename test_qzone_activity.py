@@ -0,0 +1,44 @@
+import time
+from types import SimpleNamespace
+
+import qzone_activity
+from config import CommonConfig
+from qzone_activity import QzoneActivity, clear_page_data_cache
+
+
+def make_activity() -> QzoneActivity:
+    activity = QzoneActivity.__new__(QzoneActivity)
+    activity.lr = SimpleNamespace(uin="o123456")
+    activity.djc_helper = SimpleNamespace(common_cfg=CommonConfig())
+    activity.headers = {}
+    return activity
+
+
+def test_page_data_cache_expires(monkeypatch):
+    state = {"card_count": 1, "fetch_count": 0}
+
+    def fake_fetch_json_in_page(url, prefix, headers, timeout):
+        state["fetch_count"] += 1
+        return {"card_count": state["card_count"]}
+
+    monkeypatch.setattr(qzone_activity, "fetch_json_in_page", fake_fetch_json_in_page)
+    monkeypatch.setattr(qzone_activity, "page_data_cache_ttl", 0.2)
+    clear_page_data_cache()
+
+    activity = make_activity()
+    url = "https://act.qzone.qq.com/example"
+    assert activity.fetch_data(url) == {"card_count": 1}
+    assert activity.fetch_data(url) == {"card_count": 1}
+    assert state["fetch_count"] == 1
+
+    # 模拟其他进程赠送了卡片，本进程的缓存未被清空，但过期后会重新获取
+    state["card_count"] = 2
+    time.sleep(0.3)
+    assert activity.fetch_data(url) == {"card_count": 2}
+    assert state["fetch_count"] == 2
+
+    # 本进程内的操作则会直接清空缓存
+    state["card_count"] = 3
+    clear_page_data_cache()
+    assert activity.fetch_data(url) == {"card_count": 3}
+    assert state["fetch_count"] == 3
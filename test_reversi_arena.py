@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from reversi_arena import EngineConfig, run_match
+
+
+def test_engine_config_parse():
+    assert EngineConfig.parse("深层:max_depth=6,max_seconds=2.5,workers=2") == EngineConfig("深层", max_depth=6, max_seconds=2.5, workers=2)
+    assert EngineConfig.parse("默认") == EngineConfig("默认")
+
+    with pytest.raises(ValueError):
+        EngineConfig.parse("a:depth=6")
+
+
+def test_run_match():
+    config_a, config_b = EngineConfig("a", max_depth=2), EngineConfig("b", max_depth=1)
+
+    report = run_match(config_a, config_b, games=2, seed=1)
+    assert [game["blue"] for game in report["records"]] == ["a", "b"]
+    # 同一布局下双方各执蓝一次
+    assert report["records"][0]["invalid_cells"] == report["records"][1]["invalid_cells"]
+    assert len(report["records"][0]["invalid_cells"]) == 5
+
+    summary_a, summary_b = report["summary"]
+    assert summary_a["games"] == summary_b["games"] == 2
+    assert summary_a["wins"] + summary_a["draws"] == summary_b["losses"] + summary_b["draws"]
+    json.dumps(report)
+
+    # 相同的种子得到相同的对局（耗时除外）
+    def moves_of(report: dict):
+        return [[(move["move"], move["depth"], move["nodes"]) for move in game["moves"]] for game in report["records"]]
+
+    assert moves_of(run_match(config_a, config_b, games=2, seed=1)) == moves_of(report)
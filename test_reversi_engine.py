@@ -0,0 +1,230 @@
+from reversi_engine import (INFINITY, Board, Engine, OpeningBook,
+                            ParallelEngine, bit_of, cell_blue, cell_invalid,
+                            cell_red, evaluate, final_score,
+                            generate_opening_book, iter_bits,
+                            parse_invalid_cells, popcount, random_positions,
+                            row_col_of, stable_score, transform_bits,
+                            weight_sum, zobrist_hash)
+
+
+def moves_of(board: Board, step_cell: int):
+    return sorted(row_col_of(move) for move in iter_bits(board.legal_moves(step_cell)))
+
+
+def test_legal_moves():
+    board = Board.initial()
+    assert moves_of(board, cell_blue) == [(3, 5), (4, 6), (5, 3), (6, 4)]
+    assert moves_of(board, cell_red) == [(3, 4), (4, 3), (5, 6), (6, 5)]
+
+    # 无效格子不可落子，也不能被夹住
+    board = Board.initial(invalid=bit_of(3, 5))
+    assert moves_of(board, cell_blue) == [(4, 6), (5, 3), (6, 4)]
+
+
+def test_make_unmake():
+    board = Board.initial()
+    blue, red = board.blue, board.red
+
+    board.make(bit_of(3, 5))
+    assert board.step_cell == cell_red
+    assert board.cell(3, 5) == cell_blue
+    assert board.cell(4, 5) == cell_blue
+    assert board.count(cell_blue) == 4
+    assert board.count(cell_red) == 1
+
+    board.make(0)
+    assert board.step_cell == cell_blue
+    board.unmake()
+    board.unmake()
+    assert (board.blue, board.red, board.step_cell) == (blue, red, cell_blue)
+
+
+def test_from_cells():
+    cells = [[cell_invalid for _ in range(10)] for _ in range(10)]
+    for row in range(1, 9):
+        for col in range(1, 9):
+            cells[row][col] = 0
+    cells[4][4] = cells[5][5] = cell_blue
+    cells[4][5] = cells[5][4] = cell_red
+    cells[1][1] = cell_invalid
+
+    board = Board.from_cells(cells, cell_red)
+    assert board.step_cell == cell_red
+    assert (board.blue, board.red, board.invalid) == (Board.initial().blue, Board.initial().red, bit_of(1, 1))
+
+
+def test_evaluate_symmetric():
+    board = Board.initial()
+    for move in [(3, 5), (3, 4), (2, 3)]:
+        board.make(bit_of(*move))
+
+    assert evaluate(board, cell_blue) == -evaluate(board, cell_red)
+
+
+def test_search():
+    board = Board.initial()
+    res = Engine(max_depth=4).search(board)
+    assert res.move in moves_of(board, cell_blue)
+    assert res.nodes > 0
+
+    # 双方均无子可下时，返回(0, 0)表示轮空
+    board = Board(blue=bit_of(1, 1), red=0)
+    assert Engine(max_depth=4).search(board).move == (0, 0)
+
+
+def test_zobrist_hash():
+    board = Board.initial()
+    initial_hash = board.hash
+    for move in [(3, 5), (3, 4), (2, 3)]:
+        board.make(bit_of(*move))
+        assert board.hash == zobrist_hash(board.blue, board.red, board.step_cell)
+    board.make(0)
+    assert board.hash == zobrist_hash(board.blue, board.red, board.step_cell)
+
+    for _ in range(4):
+        board.unmake()
+    assert board.hash == initial_hash
+
+
+def negamax(board: Board, depth: int) -> int:
+    if depth == 0:
+        return evaluate(board, board.step_cell)
+
+    moves = board.legal_moves()
+    if moves == 0:
+        if board.legal_moves(-board.step_cell) == 0:
+            return evaluate(board, board.step_cell)
+        board.make(0)
+        score = -negamax(board, depth - 1)
+        board.unmake()
+        return score
+
+    best = -INFINITY
+    for move in iter_bits(moves):
+        board.make(move)
+        best = max(best, -negamax(board, depth - 1))
+        board.unmake()
+    return best
+
+
+def test_search_matches_negamax():
+    board = Board.initial()
+    for move in [(3, 5), (3, 4), (2, 3), (5, 6)]:
+        board.make(bit_of(*move))
+
+    engine = Engine(max_depth=4)
+    res = engine.search(board)
+    assert res.depth == 4
+    assert res.score == negamax(board, 4)
+    assert res.pv[0] == res.move
+
+    # 复用置换表再次搜索，结果不变
+    assert engine.search(board).score == res.score
+
+
+def test_incremental_weights():
+    board = Board.initial()
+    for move in [(3, 5), (3, 4), (2, 3), (5, 6), (6, 5)]:
+        board.make(bit_of(*move))
+        assert board.weights == weight_sum(board.blue, board.red)
+
+    board.unmake()
+    assert board.weights == weight_sum(board.blue, board.red)
+
+
+def test_stable_score():
+    # 上边从左上角开始连续5个格子非空（第4个为无效格子），右边被占满
+    own = bit_of(1, 1) | bit_of(1, 2) | bit_of(1, 3)
+    opp = bit_of(1, 5) | sum(bit_of(row, 8) for row in range(1, 9))
+    invalid = bit_of(1, 4)
+    empty = ~(own | opp | invalid) & 0xFFFFFFFFFFFFFFFF
+
+    # 角：己方1个，对方2个；边：己方(1,2)(1,3)，对方右边6个以及(1,5)
+    assert stable_score(own, opp, empty) == (1 - 2) + (2 - 7)
+
+
+def test_parallel_search():
+    board = random_positions(1, seed=1)[0]
+
+    engine = ParallelEngine(workers=2, max_depth=4)
+    try:
+        res = engine.search(board)
+    finally:
+        engine.close()
+
+    assert res.depth == 4
+    assert res.score == Engine(max_depth=4).search(board).score
+    assert res.pv[0] == res.move
+    assert sum(stat.nodes for stat in res.workers) == res.nodes
+
+
+def test_opening_book_symmetry():
+    invalid = bit_of(1, 2) | bit_of(3, 7)
+    board = Board.initial(invalid)
+    board.make(bit_of(3, 5))
+
+    book = OpeningBook()
+    book.add(board, bit_of(3, 4), 10, 8)
+    assert book.lookup(board) == (bit_of(3, 4), 10, 8)
+
+    # 沿左上到右下的对角线翻转后的局面共用同一条记录
+    symmetry = 4
+    mirrored = Board(transform_bits(board.blue, symmetry), transform_bits(board.red, symmetry), transform_bits(invalid, symmetry), board.step_cell)
+    assert len(book) == 1
+    assert book.lookup(mirrored) == (bit_of(4, 3), 10, 8)
+
+    # 轮到另一方时不命中
+    assert book.lookup(Board(board.blue, board.red, invalid, -board.step_cell)) is None
+
+
+def test_search_with_opening_book(tmp_path):
+    invalid = parse_invalid_cells("a1 b2 c3 h8 g7")
+    book = generate_opening_book([invalid], plies=2, depth=3)
+
+    book_path = str(tmp_path / "book.json")
+    book.save(book_path)
+    book = OpeningBook.load(book_path)
+
+    board = Board.initial(invalid)
+    res = Engine(book=book).search(board)
+    assert res.source == "book"
+    assert res.move == Engine(max_depth=3).search(board).move
+
+
+def solve_brute_force(board: Board) -> int:
+    moves = board.legal_moves()
+    if moves == 0:
+        if board.legal_moves(-board.step_cell) == 0:
+            return final_score(board, board.step_cell)
+        board.make(0)
+        score = -solve_brute_force(board)
+        board.unmake()
+        return score
+
+    best = -INFINITY
+    for move in iter_bits(moves):
+        board.make(move)
+        best = max(best, -solve_brute_force(board))
+        board.unmake()
+    return best
+
+
+def test_endgame_solver():
+    board = random_positions(1, seed=2, min_moves=48, max_moves=48)[0]
+    assert popcount(board.empty()) <= 8
+
+    res = Engine(endgame_empties=10).search(board)
+    assert res.source == "endgame"
+    assert res.score == int(solve_brute_force(board) / 2)
+
+
+def test_opening_book_multiple_layouts():
+    # Board.hash中不包含无效格子，不同布局之间的置换表记录不能混用，结果应与各布局单独生成时一致
+    layouts = [parse_invalid_cells("a1 b2 c3 h8 g7"), parse_invalid_cells("a8 b7 c6 h1 g2")]
+    book = generate_opening_book(layouts, plies=3, depth=4)
+
+    separate = OpeningBook()
+    for invalid in layouts:
+        generate_opening_book([invalid], plies=3, depth=4, book=separate)
+
+    assert book.entries == separate.entries
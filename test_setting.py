@@ -0,0 +1,32 @@
+import setting
+from data_struct import to_raw_type
+from setting import (dnf_area_server_list_config, dnf_server_id_to_area_info,
+                     dnf_server_id_to_name, dnf_server_name_to_id)
+
+
+def test_dnf_server_index_same_as_linear_search():
+    for area in dnf_area_server_list_config():
+        for server in area.opt_data_array:
+            assert dnf_server_name_to_id(server.t) == server.v
+            assert dnf_server_id_to_name(server.v) == server.t
+            assert dnf_server_id_to_name(int(server.v)) == server.t
+            assert to_raw_type(dnf_server_id_to_area_info(server.v)) == to_raw_type(area)
+
+    assert dnf_server_name_to_id("不存在的服务器") == ""
+    assert dnf_server_id_to_name("-1") == ""
+    assert dnf_server_id_to_area_info("-1").v == "21"
+
+    # 索引在进程内仅构建一次
+    assert setting.get_dnf_server_index() is setting.get_dnf_server_index()
+
+
+def test_ark_lottery_settings_parsed_once():
+    assert setting.zzconfig() is setting.zzconfig()
+    assert setting.card_group_info_map() is setting.card_group_info_map()
+    assert setting.prize_list() is setting.prize_list()
+
+    # 与每次重新解析的结果一致
+    cfg = setting.ArkLotteryZzConfig().auto_update_config(setting.ark_lottery.setting["zzconfig"])
+    assert to_raw_type(dict(setting.card_group_info_map())) == to_raw_type(setting.parse_card_group_info_map(cfg))
+    assert to_raw_type(list(setting.prize_list())) == to_raw_type(setting.parse_prize_list(cfg))
+    assert to_raw_type(setting.zzconfig()) == to_raw_type(cfg)
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+import db_def
+import update
+from config import CommonConfig
+from dao import UpdateInfo
+
+
+def make_fake_get_update_info(site_to_delay_and_ok: dict):
+    def _fake_get_update_info(changelog_page: str, readme_page: str, cancelled=None) -> UpdateInfo:
+        site = changelog_page.split("/")[2]
+        delay, ok = site_to_delay_and_ok[site]
+        time.sleep(delay)
+        if not ok:
+            raise Exception(f"{site} 无法访问")
+
+        update_info = UpdateInfo()
+        update_info.latest_version = site
+        return update_info
+
+    return _fake_get_update_info
+
+
+def test_get_update_info_from_fastest_mirror(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_def, "db_top_dir", str(tmp_path))
+    monkeypatch.setattr(update, "hedge_delay", 0.1)
+
+    config = CommonConfig()
+    config.github_mirror_sites = ["mirror1", "mirror2"]
+    monkeypatch.setattr(update, "_get_update_info", make_fake_get_update_info({
+        "github.com": (1, True),
+        "mirror1": (0, False),
+        "mirror2": (0.2, True),
+    }))
+
+    # 原站超时后同时请求各个镜像，采用最先返回的有效结果
+    start_time = time.time()
+    assert update.get_update_info(config).latest_version == "mirror2"
+    assert time.time() - start_time < 1
+
+    # 下次优先请求上次最快的站点
+    assert update.get_sites_ordered_by_history(config) == ["mirror2", "github.com", "mirror1"]
+
+
+def test_get_update_info_all_failed(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_def, "db_top_dir", str(tmp_path))
+
+    config = CommonConfig()
+    config.github_mirror_sites = ["mirror1"]
+    monkeypatch.setattr(update, "_get_update_info", make_fake_get_update_info({
+        "github.com": (0, False),
+        "mirror1": (0, False),
+    }))
+
+    with pytest.raises(Exception):
+        update.get_update_info(config)
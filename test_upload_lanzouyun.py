@@ -0,0 +1,52 @@
+import json
+import os
+
+import upload_lanzouyun
+from compress import compress_file_with_lzma
+from upload_lanzouyun import Uploader
+
+
+def test_load_synced_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_lanzouyun, "_parsed_synced_files", {})
+
+    uploader = Uploader()
+    filepath = str(tmp_path / "notices.txt")
+    compressed_filepath = str(tmp_path / uploader.get_compressed_version_filename("notices.txt"))
+
+    def write_and_compress(data):
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        compress_file_with_lzma(filepath, compressed_filepath)
+        os.remove(filepath)
+
+    def fake_download_file_in_folder(folder, name, download_dir, *args, **kwargs):
+        return str(tmp_path / name)
+
+    monkeypatch.setattr(uploader, "download_file_in_folder", fake_download_file_in_folder)
+
+    parse_count = 0
+
+    def parse(raw):
+        nonlocal parse_count
+        parse_count += 1
+        return raw
+
+    # 压缩版本直接流式解析，不解压到磁盘
+    write_and_compress([1, 2])
+    assert uploader.load_synced_json(uploader.folder_online_files, "notices.txt", str(tmp_path), parse=parse) == [1, 2]
+    assert not os.path.exists(filepath)
+
+    # 内容未变化时不再重复解析
+    assert uploader.load_synced_json(uploader.folder_online_files, "notices.txt", str(tmp_path), parse=parse) == [1, 2]
+    assert parse_count == 1
+
+    write_and_compress([3])
+    assert uploader.load_synced_json(uploader.folder_online_files, "notices.txt", str(tmp_path), parse=parse) == [3]
+    assert parse_count == 2
+
+    # 压缩版本损坏时，改用普通版本
+    with open(compressed_filepath, 'wb') as f:
+        f.write(b"invalid")
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump([4], f)
+    assert uploader.load_synced_json(uploader.folder_online_files, "notices.txt", str(tmp_path), parse=parse) == [4]
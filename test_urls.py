@@ -0,0 +1,13 @@
+import pytest
+
+from urls import Urls, get_urls
+
+
+def test_shared_urls_readonly():
+    urls = get_urls()
+    assert urls is get_urls()
+    assert urls.balance == Urls().balance
+
+    with pytest.raises(AttributeError):
+        urls.balance = "modified"
+    assert urls.balance == Urls().balance
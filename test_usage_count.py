@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+
+import pytest
+
+import ga
+import ga4
+import usage_count
+from usage_count import (CounterReport, flush_reports, increase_counter,
+                         load_own_spool, replay_spooled_reports, spool_path,
+                         spool_reports)
+from util import get_today
+
+
+@pytest.fixture
+def reports_sent(tmp_path, monkeypatch):
+    """
+    将缓冲文件放到临时目录，并记录实际上报的内容，可通过设置 offline 来模拟网络不通
+    """
+    sent = {"ga": [], "ga4": [], "lean_cloud": [], "offline": False}
+
+    def fake_ga(ga_hits):
+        if sent["offline"]:
+            return 0
+        sent["ga"].append(ga_hits)
+        return len(ga_hits)
+
+    def fake_ga4(ga4_events):
+        if sent["offline"]:
+            return 0
+        sent["ga4"].append(ga4_events)
+        return len(ga4_events)
+
+    def fake_lean_cloud(name_and_day_to_amount):
+        if sent["offline"]:
+            raise ConnectionError("offline")
+        sent["lean_cloud"].append(dict(name_and_day_to_amount))
+
+    monkeypatch.setattr(usage_count, "report_spool_dir", str(tmp_path))
+    monkeypatch.setattr(usage_count, "_next_replay_time", 0)
+    monkeypatch.setattr(usage_count, "increase_counters_sync_ga", fake_ga)
+    monkeypatch.setattr(usage_count, "increase_counters_sync_ga4", fake_ga4)
+    monkeypatch.setattr(usage_count, "increase_counters_sync_lean_cloud", fake_lean_cloud)
+    monkeypatch.setattr(usage_count, "is_daily_first_run", lambda name: True)
+
+    return sent
+
+
+def test_increase_counter_batched(reports_sent, monkeypatch):
+    monkeypatch.setattr(usage_count, "report_batch_wait_seconds", 1)
+
+    thread_count = threading.active_count()
+    for idx in range(30):
+        increase_counter(ga_category="login_mode", name=idx)
+    increase_counter(name="run/begin", ga_type=ga.GA_REPORT_TYPE_PAGE_VIEW)
+    increase_counter(name="my_usage", report_to_lean_cloud=True)
+    increase_counter(name="my_usage", report_to_lean_cloud=True)
+
+    # 所有上报由同一个后台线程处理，flush时无需等待批次收集完毕
+    assert threading.active_count() <= thread_count + 1
+    assert flush_reports(timeout=5)
+
+    assert len(reports_sent["ga"]) == len(reports_sent["ga4"]) == 1
+    ga_hits, ga4_events = reports_sent["ga"][0], reports_sent["ga4"][0]
+    assert len(ga_hits) == len(ga4_events) == 33
+    assert ga_hits[0]["ec"] == "login_mode" and ga_hits[0]["ea"] == "0"
+    assert ga_hits[30]["t"] == "pageview"
+    assert ga4_events[31]["name"] == "counter" and ga4_events[31]["params"] == {"event_name": "my_usage"}
+
+    # 同一批次中同一计数器的多次增加合并为一次
+    assert reports_sent["lean_cloud"] == [{("my_usage", get_today()): 2}]
+
+    # 上报成功后不再保留在缓冲文件中
+    assert load_own_spool() == []
+
+
+def test_replay_after_offline(reports_sent, monkeypatch):
+    reports_sent["offline"] = True
+    report_time = time.time() - 60
+    spool_reports([
+        CounterReport("a", True, True, True, ga.GA_REPORT_TYPE_EVENT, "c", None, report_time),
+        CounterReport("b", False, True, True, ga.GA_REPORT_TYPE_EVENT, "c", None, report_time),
+    ])
+
+    # 网络不通时保留在缓冲文件中，并在一段时间内不再尝试
+    replay_spooled_reports()
+    assert len(load_own_spool()) == 2
+    assert usage_count._next_replay_time > time.time()
+
+    # 网络恢复后补报，并带上实际的上报时间
+    reports_sent["offline"] = False
+    replay_spooled_reports()
+    assert load_own_spool() == []
+    ga_hits, ga4_events = reports_sent["ga"][0], reports_sent["ga4"][0]
+    assert [hit["ea"] for hit in ga_hits] == ["a", "b"]
+    assert ga_hits[0]["qt"] >= 60 * 1000
+    assert ga4_events[0]["timestamp_micros"] == int(report_time * 1000000)
+    assert reports_sent["lean_cloud"] == [{("a", get_today()): 1}]
+
+
+def test_replay_partial_failure(reports_sent, monkeypatch):
+    def lean_cloud_offline(name_and_day_to_amount):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(usage_count, "increase_counters_sync_lean_cloud", lean_cloud_offline)
+    spool_reports([CounterReport("a", True, True, True, ga.GA_REPORT_TYPE_EVENT, "c", None, time.time())])
+
+    # 仅保留未能成功上报的部分，避免重复上报到ga
+    replay_spooled_reports()
+    assert len(reports_sent["ga"]) == 1
+    assert [(report.report_to_lean_cloud, report.report_to_ga, report.report_to_ga4) for report in load_own_spool()] == [(True, False, False)]
+
+
+def test_replay_partial_ga_failure(reports_sent, monkeypatch):
+    # ga v3的第2个请求失败，ga4全部失败
+    monkeypatch.setattr(usage_count, "increase_counters_sync_ga", lambda ga_hits: min(len(ga_hits), ga.GA_BATCH_MAX_HITS))
+    monkeypatch.setattr(usage_count, "increase_counters_sync_ga4", lambda ga4_events: 0)
+
+    count = ga.GA_BATCH_MAX_HITS + 5
+    spool_reports([CounterReport(f"name_{idx}", False, True, True, ga.GA_REPORT_TYPE_EVENT, "c", None, time.time() + idx) for idx in range(count)])
+
+    # ga v3仅保留未发送的部分，ga4则全部保留
+    replay_spooled_reports()
+    reports = load_own_spool()
+    assert len(reports) == count
+    assert [report.report_to_ga for report in reports] == [False] * ga.GA_BATCH_MAX_HITS + [True] * 5
+    assert all(report.report_to_ga4 for report in reports)
+
+
+def test_claim_orphan_spool(reports_sent, tmp_path):
+    # 已退出的进程遗留的缓冲文件由当前进程接手补报，仍在运行的进程的缓冲文件则不处理
+    dead_pid = 2 ** 22 + 1
+    alive_pid = os.getppid()
+    for pid in [dead_pid, alive_pid]:
+        with open(spool_path(pid), 'w', encoding='utf-8') as f:
+            f.write(f'{{"name": "{pid}", "report_to_lean_cloud": false, "report_to_ga": true, "report_to_ga4": true, "ga_type": "event", "ga_category": "c", "ga_misc_params": null, "report_time": 0}}\n')
+            f.write('{"name": "incomplete')
+
+    replay_spooled_reports()
+    assert [hit["ea"] for hit in reports_sent["ga"][0]] == [str(dead_pid)]
+    assert len(reports_sent["ga4"][0]) == 1
+    assert os.listdir(str(tmp_path)) == [f"{alive_pid}.jsonl"]
+
+
+def test_spool_size_limit(reports_sent, monkeypatch):
+    monkeypatch.setattr(usage_count, "report_spool_max_bytes", 2000)
+
+    for idx in range(100):
+        spool_reports([CounterReport(f"name_{idx}", False, True, True, ga.GA_REPORT_TYPE_EVENT, "c", None, idx)])
+
+    # 超出大小上限时丢弃最早的上报
+    reports = load_own_spool()
+    assert os.path.getsize(spool_path(os.getpid())) <= 2000 + 200
+    assert reports[-1].name == "name_99"
+    assert len(reports) < 100
+
+
+def test_track_partial_failure(monkeypatch):
+    class FakeResponse:
+        class request:
+            body = ""
+
+        text = ""
+
+        def raise_for_status(self):
+            pass
+
+    def make_fake_http_request(fail_at: int):
+        calls = []
+
+        def fake_http_request(method, url, **kwargs):
+            calls.append(url)
+            if len(calls) == fail_at:
+                raise ConnectionError("offline")
+            return FakeResponse()
+
+        return fake_http_request
+
+    monkeypatch.setattr(ga, "get_common_data", lambda: {})
+    monkeypatch.setattr(ga4, "get_cid", lambda: "cid")
+
+    # 第2个请求失败时，仅第1个请求中的部分已上报，且不再发送后续请求
+    monkeypatch.setattr(ga, "http_request", make_fake_http_request(2))
+    hits = [ga.make_event_hit("c", str(idx)) for idx in range(3 * ga.GA_BATCH_MAX_HITS)]
+    assert ga.track_hits(hits) == ga.GA_BATCH_MAX_HITS
+
+    monkeypatch.setattr(ga4, "http_request", make_fake_http_request(1))
+    assert ga4.track_events([ga4.make_event("c", "name")]) == 0
+
+    monkeypatch.setattr(ga4, "http_request", make_fake_http_request(0))
+    assert ga4.track_events([ga4.make_event("c", "name")] * 30) == 30
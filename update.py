@@ -1,19 +1,22 @@
 import platform
+import queue
 import random
 import re
+import threading
+import time
 import webbrowser
 from datetime import datetime
-from typing import List, Tuple
-
-import requests
+from typing import List, Optional
 
 from config import CommonConfig
 from dao import UpdateInfo
+from db import GithubMirrorDB
 from first_run import is_first_run
 from log import color, logger
+from network import http_request
 from upload_lanzouyun import Uploader
-from util import (async_message_box, bypass_proxy, is_run_in_github_action,
-                  is_windows, try_except, use_proxy)
+from util import (async_call, async_message_box, bypass_proxy,
+                  is_run_in_github_action, is_windows, try_except, use_proxy)
 from version import now_version, ver_time
 
 if is_windows():
@@ -155,44 +158,111 @@ def show_update_info_on_first_run(ui: UpdateInfo):
         async_message_box(message, "更新")
 
 
+# 优先请求上次最快的站点，若其在该时间（秒）内没有返回结果或者失败了，则同时请求其余所有站点
+hedge_delay = 1.0
+
+
 # 获取最新版本号与下载网盘地址
 def get_update_info(config: CommonConfig) -> UpdateInfo:
-    for changelog_page, readme_page in get_urls_and_mirrors(config):
+    """
+    向原站和各个镜像站点发起请求，采用最先返回且能正确解析的结果，其余请求的结果将被丢弃
+    """
+    sites = get_sites_ordered_by_history(config)
+    results = queue.Queue()  # type: queue.Queue
+    cancelled = threading.Event()
+
+    def _fetch(site: str):
+        start_time = time.time()
         try:
-            return _get_update_info(changelog_page, readme_page)
+            update_info = _get_update_info(get_mirror(config.changelog_page, site), get_mirror(config.readme_page, site), cancelled)
+            results.put((site, update_info, time.time() - start_time, None))
         except Exception as e:
-            # 尝试使用镜像来访问
-            logger.warning(f"使用 {changelog_page} 获取更新信息失败，尝试下一个镜像~ 错误={e}")
-            logger.debug(f"具体信息", exc_info=e)
+            results.put((site, None, time.time() - start_time, e))
+
+    started = 0
+
+    def _start_fetch(count: int):
+        nonlocal started
+        for site in sites[started:started + count]:
+            async_call(_fetch, site)
+        started = min(started + count, len(sites))
+
+    _start_fetch(1)
+    try:
+        for _ in range(len(sites)):
+            while True:
+                try:
+                    site, update_info, cost, error = results.get(timeout=hedge_delay if started < len(sites) else None)
+                    break
+                except queue.Empty:
+                    logger.info(f"{sites[0]} 在{hedge_delay}秒内未返回更新信息，同时尝试其余镜像~")
+                    _start_fetch(len(sites))
+
+            if error is None:
+                logger.info(f"使用 {site} 获取更新信息成功，耗时{cost:.2f}秒")
+                save_fastest_site(site, cost)
+                return update_info
+
+            logger.warning(f"使用 {site} 获取更新信息失败，耗时{cost:.2f}秒，将使用其他镜像的结果~ 错误={error}")
+            logger.debug(f"具体信息", exc_info=error)
+            _start_fetch(len(sites))
+    finally:
+        # 通知仍在进行中的请求不再解析结果
+        cancelled.set()
 
     raise Exception("无法获取更新信息")
 
 
-def get_urls_and_mirrors(config: CommonConfig) -> List[Tuple[str, str]]:
-    urls = [
-        (config.changelog_page, config.readme_page),
-    ]
-    for mirror_site in config.github_mirror_sites:
-        urls.append((
-            get_mirror(config.changelog_page, mirror_site),
-            get_mirror(config.readme_page, mirror_site),
-        ))
-    return urls
+def get_sites_ordered_by_history(config: CommonConfig) -> List[str]:
+    """原站与各个镜像站点，上次最快的站点排在最前面"""
+    sites = ["github.com", *config.github_mirror_sites]
+
+    fastest_site = GithubMirrorDB().load().fastest_site
+    if fastest_site in sites:
+        sites.remove(fastest_site)
+        sites.insert(0, fastest_site)
+
+    return sites
+
+
+def save_fastest_site(site: str, cost: float):
+    def _update(db: GithubMirrorDB):
+        db.fastest_site = site
+        db.site_to_cost[site] = round(cost, 3)
+
+    GithubMirrorDB().update(_update)
 
 
 def get_mirror(original_url: str, github_mirror_site: str):
     return original_url.replace("github.com", github_mirror_site)
 
 
-def _get_update_info(changelog_page: str, readme_page: str) -> UpdateInfo:
+def _get_update_info(changelog_page: str, readme_page: str, cancelled: Optional[threading.Event] = None) -> UpdateInfo:
     logger.info(f"尝试使用 {changelog_page} 来查询更新信息")
 
     update_info = UpdateInfo()
 
-    # 获取github本项目的readme页面内容和changelog页面内容
+    # 同时获取github本项目的readme页面内容和changelog页面内容
     timeout = 3  # 由于国内网络不太好，加个超时
-    changelog_html_text = requests.get(changelog_page, timeout=timeout).text
-    readme_html_text = requests.get(readme_page, timeout=timeout).text
+    readme_res = {}
+
+    def _get_readme():
+        try:
+            readme_res["text"] = http_request("GET", readme_page, timeout=timeout).text
+        except Exception as e:
+            readme_res["error"] = e
+
+    readme_thread = threading.Thread(target=_get_readme, daemon=True)
+    readme_thread.start()
+    changelog_html_text = http_request("GET", changelog_page, timeout=timeout).text
+    readme_thread.join()
+
+    if "error" in readme_res:
+        raise readme_res["error"]
+    readme_html_text = readme_res["text"]
+
+    if cancelled is not None and cancelled.is_set():
+        raise Exception("已经从其他站点获取到更新信息，不再解析本站点的结果")
 
     # 从更新日志中提取所有版本信息
     versions = re.findall(r"(?<=[vV])[0-9.]+(?=\s+\d+\.\d+\.\d+)", changelog_html_text)
@@ -267,7 +337,7 @@ def get_netdisk_addr(config: CommonConfig):
 def get_version_from_gitee() -> str:
     logger.info("尝试从gitee获取更新信息")
     api = "https://gitee.com/api/v5/repos/fzls/djc_helper/tags"
-    res = requests.get(api, timeout=10).json()
+    res = http_request("GET", api, timeout=10).json()
 
     reg_version = r'v\d+(\.\d+)*'
     res = filter(lambda tag_info: re.match(reg_version, tag_info['name']) is not None, res)
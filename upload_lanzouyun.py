@@ -1,14 +1,21 @@
+import hashlib
 import json
+import lzma
 import os
 import re
+import threading
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List
+from typing import (Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional,
+                    Tuple)
 
 from compress import compress_file_with_lzma, decompress_file_with_lzma
 from const import compressed_temp_dir, downloads_dir
 from lanzou.api import LanZouCloud
-from lanzou.api.types import FileInFolder, FolderDetail
+from lanzou.api.models import FileList
+from lanzou.api.types import File, FileInFolder, FolderDetail
+from lanzou.api.utils import name_format
 from log import color, get_log_func, logger
 from util import (cache_name_download, human_readable_size,
                   make_sure_dir_exists, parse_time, parse_timestamp,
@@ -17,6 +24,12 @@ from util import (cache_name_download, human_readable_size,
 Folder = namedtuple('Folder', ['name', 'id', 'url', 'password'])
 
 
+class SyncedFile(NamedTuple):
+    path: str  # 本地文件路径，若为压缩版本，则为未解压的压缩文件
+    compressed: bool
+    fingerprint: str  # 文件内容的指纹，内容不变时指纹不变
+
+
 # 参考文档可见：https://github.com/zaxtyson/LanZouCloud-API/wiki
 
 # 如果日后蓝奏云仍出现多次问题，可以考虑增加一个fallback选项
@@ -60,10 +73,21 @@ class Uploader:
     compressed_version_prefix = "compressed_"
     compressed_version_suffix = ".7z"
 
+    # 下载单个文件时的并发连接数，仅对较大的文件（如小助手的完整压缩包）生效
+    download_threads = 4
+    # 批量上传时同时上传的文件数，不宜过大，避免触发蓝奏云的频率限制
+    upload_threads = 3
+
     def __init__(self):
         self.lzy = LanZouCloud()
+        self.lzy.set_download_threads(self.download_threads)
+        self.lzy.set_upload_threads(self.upload_threads)
         self.login_ok = False
 
+        # 上传时用到的网盘目录文件列表，每个目录只获取一次，之后的移动、删除操作直接在本地同步更新
+        self._folder_files = {}  # type: Dict[int, FileList]
+        self._folder_files_lock = threading.Lock()
+
     def login(self, cookie):
         # 仅上传需要登录
         self.login_ok = self.lzy.login_by_cookie(cookie) == LanZouCloud.SUCCESS
@@ -77,24 +101,55 @@ class Uploader:
             # 未设置历史文件前缀，默认为当前文件名
             history_file_prefix = os.path.basename(filepath)
 
-        if not only_upload_compressed_version:
-            ok = self._upload_to_lanzouyun(filepath, target_folder, history_file_prefix, delete_history_file)
-            if not ok:
-                return False
+        with ThreadPoolExecutor(max_workers=1) as compress_pool:
+            compress_future = None
+            if also_upload_compressed_version:
+                # 在后台创建压缩版本，与普通版本的上传同时进行
+                compress_future = compress_pool.submit(self.create_compressed_version, filepath)
 
-        if also_upload_compressed_version:
-            filename = os.path.basename(filepath)
-            compressed_filepath = os.path.join(compressed_temp_dir, self.get_compressed_version_filename(filename))
-            compressed_history_file_prefix = f"{self.compressed_version_prefix}{history_file_prefix}"
+            if not only_upload_compressed_version:
+                ok = self._upload_to_lanzouyun(filepath, target_folder, history_file_prefix, delete_history_file)
+                if not ok:
+                    return False
 
-            logger.info(color("bold_green") + f"创建压缩版本并上传 {compressed_filepath}")
-            # 创建压缩版本
-            compress_file_with_lzma(filepath, compressed_filepath)
-            # 上传
-            return self._upload_to_lanzouyun(compressed_filepath, target_folder, compressed_history_file_prefix, delete_history_file)
+            if compress_future is not None:
+                compressed_filepath = compress_future.result()
+                compressed_history_file_prefix = f"{self.compressed_version_prefix}{history_file_prefix}"
+
+                logger.info(color("bold_green") + f"上传压缩版本 {compressed_filepath}")
+                return self._upload_to_lanzouyun(compressed_filepath, target_folder, compressed_history_file_prefix, delete_history_file)
 
         return True
 
+    def upload_files_to_lanzouyun(self, upload_list: List[Tuple[str, Folder, str]], delete_history_file=False, also_upload_compressed_version=False) -> List[Tuple[str, Folder, str]]:
+        """
+        同时上传多个文件，upload_list 中每一项为 (本地文件路径, 网盘目录, 历史文件前缀)，最多同时上传 upload_threads 个文件
+        返回上传失败的项，全部成功时返回空列表
+        注意：同时上传的文件之间在网盘中的先后顺序不确定，若需要某个文件显示在最前方，请在其他文件上传完成后单独上传
+        """
+        if len(upload_list) == 0:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.upload_threads, len(upload_list))) as pool:
+            results = list(pool.map(
+                lambda item: self.upload_to_lanzouyun(item[0], item[1], history_file_prefix=item[2], delete_history_file=delete_history_file, also_upload_compressed_version=also_upload_compressed_version),
+                upload_list,
+            ))
+
+        return [item for item, ok in zip(upload_list, results) if not ok]
+
+    def create_compressed_version(self, filepath: str) -> str:
+        """
+        创建文件的压缩版本，并返回压缩版本的路径
+        """
+        filename = os.path.basename(filepath)
+        compressed_filepath = os.path.join(compressed_temp_dir, self.get_compressed_version_filename(filename))
+
+        logger.info(color("bold_green") + f"创建压缩版本 {compressed_filepath}")
+        compress_file_with_lzma(filepath, compressed_filepath)
+
+        return compressed_filepath
+
     def _upload_to_lanzouyun(self, filepath: str, target_folder: Folder, history_file_prefix, delete_history_file=False) -> bool:
         if history_file_prefix == "":
             logger.error("未设置history_file_prefix")
@@ -114,30 +169,53 @@ class Uploader:
             if target_folder.id == self.folder_online_files.id:
                 folder_history_files = self.folder_online_files_history_files
 
-            files = self.lzy.get_file_list(target_folder.id)
-            for file in files:
-                if file.name.startswith(history_file_prefix):
-                    if not delete_history_file:
-                        self.lzy.move_file(file.id, folder_history_files.id)
-                        logger.info(f"将{file.name}移动到目录({folder_history_files.name})")
-                    else:
-                        self.lzy.delete(file.id, True)
-                        logger.info(f"移除旧版本的{file.name}")
+            with self._folder_files_lock:
+                history_files = self.get_folder_files(target_folder.id).filter(lambda file: file.name.startswith(history_file_prefix))
+
+            for file in history_files:
+                if not delete_history_file:
+                    self.lzy.move_file(file.id, folder_history_files.id)
+                    logger.info(f"将{file.name}移动到目录({folder_history_files.name})")
+                else:
+                    self.lzy.delete(file.id, True)
+                    logger.info(f"移除旧版本的{file.name}")
+
+                with self._folder_files_lock:
+                    self.get_folder_files(target_folder.id).pop_by_id(file.id)
+                    if not delete_history_file and int(folder_history_files.id) in self._folder_files:
+                        self._folder_files[int(folder_history_files.id)].insert(0, file)
 
             logger.info(f"将文件移到目录({target_folder.name})中")
             self.lzy.move_file(fid, target_folder.id)
 
+            with self._folder_files_lock:
+                self.get_folder_files(target_folder.id).insert(0, File(name=name_format(filename), id=fid, time="", size="", type=filename.split('.')[-1], downs=0, has_pwd=False, has_des=False))
+
         # 上传到指定的文件夹中
+        # note: 根目录会在上传过程中删除同名文件，且上传完成后文件会被移走，内容一直在变化，因此不使用缓存，每次上传时由upload_file重新获取
         retCode = self.lzy.upload_file(filepath, -1, callback=self.show_progress, uploaded_handler=on_uploaded)
         if retCode != LanZouCloud.SUCCESS:
             logger.error(f"上传失败，retCode={retCode}")
             return False
 
+        # 目录内容已变化，清除文件夹列表的缓存
+        self.lzy.invalidate_folder_index()
+
         filesize = os.path.getsize(filepath)
         logger.warning(color("bold_yellow") + f"上传文件 {filename}({human_readable_size(filesize)}) 总计耗时{datetime.now() - run_start_time}")
 
         return True
 
+    def get_folder_files(self, folder_id) -> FileList:
+        """
+        获取网盘目录中的文件列表（需登录），每个目录只实际获取一次，调用方需持有 _folder_files_lock
+        """
+        folder_id = int(folder_id)
+        if folder_id not in self._folder_files:
+            self._folder_files[folder_id] = self.lzy.get_file_list(folder_id)
+
+        return self._folder_files[folder_id]
+
     def get_compressed_version_filename(self, filename: str) -> str:
         return f"{self.compressed_version_prefix}{filename}{self.compressed_version_suffix}"
 
@@ -174,7 +252,7 @@ class Uploader:
         """
         查找最新版本，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url)
+        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url, stop_when=self.stop_when_found_prefix(self.history_version_prefix))
         for file in folder_info.files:
             if file.name.startswith(self.history_version_prefix):
                 return file
@@ -205,7 +283,7 @@ class Uploader:
         """
         查找最新版本的补丁，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url)
+        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url, stop_when=self.stop_when_found_prefix(self.history_patches_prefix))
         for file in folder_info.files:
             if file.name.startswith(self.history_patches_prefix):
                 return file
@@ -222,7 +300,7 @@ class Uploader:
         """
         查找最新版本dlc，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url)
+        folder_info = self.get_folder_info_by_url(self.folder_djc_helper.url, stop_when=self.stop_when_found_prefix(self.history_dlc_version_prefix))
         for file in folder_info.files:
             if file.name.startswith(self.history_dlc_version_prefix):
                 return file
@@ -280,11 +358,47 @@ class Uploader:
         # 下载普通版本
         return _download(name)
 
+    def sync_file_in_folder(self, folder: Folder, name: str, download_dir: str, show_log=True, try_compressed_version_first=True, cache_max_seconds=600) -> SyncedFile:
+        """
+        与 download_file_in_folder 类似，但下载到压缩版本时不再解压到磁盘，由调用方通过 open_synced_file 流式读取
+        同时返回文件内容的指纹，调用方可据此跳过对未变化内容的重复解析
+        """
+        if try_compressed_version_first:
+            compressed_filename = self.get_compressed_version_filename(name)
+            try:
+                get_log_func(logger.info, show_log)(color("bold_green") + f"尝试优先下载压缩版本 {compressed_filename}")
+                path = self.download_file_in_folder(folder, compressed_filename, download_dir, show_log=show_log, cache_max_seconds=cache_max_seconds)
+                return SyncedFile(path, True, file_fingerprint(path))
+            except Exception as e:
+                get_log_func(logger.error, show_log)(f"下载压缩版本 {compressed_filename} 失败，将尝试普通版本~", exc_info=e)
+
+        path = self.download_file_in_folder(folder, name, download_dir, show_log=show_log, cache_max_seconds=cache_max_seconds)
+        return SyncedFile(path, False, file_fingerprint(path))
+
+    def load_synced_json(self, folder: Folder, name: str, download_dir: str, show_log=True, parse: Callable[[Any], Any] = lambda raw: raw) -> Any:
+        """
+        同步网盘中的json文件，并返回 parse(文件内容) 的结果
+        若文件内容与本进程上次解析时一致，则直接返回上次的解析结果，因此调用方不应修改返回的结果
+        """
+        synced_file = self.sync_file_in_folder(folder, name, download_dir, show_log=show_log)
+        try:
+            return parse_synced_json(folder, name, synced_file, parse, show_log)
+        except Exception as e:
+            if not synced_file.compressed:
+                raise
+
+            get_log_func(logger.error, show_log)(f"解析压缩版本 {synced_file.path} 失败，将尝试普通版本~", exc_info=e)
+            synced_file = self.sync_file_in_folder(folder, name, download_dir, show_log=show_log, try_compressed_version_first=False)
+            return parse_synced_json(folder, name, synced_file, parse, show_log)
+
+    def stop_when_found_prefix(self, prefix: str) -> Callable[[List[FileInFolder]], bool]:
+        return lambda files: any(file.name.startswith(prefix) for file in files)
+
     def find_file(self, folder, name) -> FileInFolder:
         """
         在对应目录查找指定名称的文件，如找到，返回lanzouyun提供的file信息，否则抛出异常
         """
-        folder_info = self.get_folder_info_by_url(folder.url, folder.password)
+        folder_info = self.get_folder_info_by_url(folder.url, folder.password, stop_when=lambda files: any(file.name == name for file in files))
         for file in folder_info.files:
             if file.name == name:
                 return file
@@ -322,6 +436,7 @@ class Uploader:
         get_log_func(logger.info, show_log)(f"即将开始下载 {target_path.value}")
         callback = None
         if show_log: callback = self.show_progress
+        self.lzy.last_download_stat = None
         retCode = self.down_file_by_url(fileinfo.url, "", download_dir, callback=callback, downloaded_handler=after_downloaded, overwrite=overwrite)
         if retCode != LanZouCloud.SUCCESS:
             get_log_func(logger.error, show_log)(f"下载失败，retCode={retCode}")
@@ -339,6 +454,10 @@ class Uploader:
                 ))
             raise Exception("下载失败")
 
+        stat = self.lzy.last_download_stat
+        if stat is not None and stat.ok:
+            get_log_func(logger.info, show_log)(f"分段下载 {fileinfo.name}({human_readable_size(stat.size)}) 完成，分为{stat.segment_count}段并发下载，耗时{stat.seconds:.2f}秒，平均速度为{human_readable_size(stat.speed)}/s")
+
         return target_path.value
 
     def show_progress(self, file_name, total_size, now_size):
@@ -353,10 +472,17 @@ class Uploader:
         if total_size == now_size:
             print('')  # 下载完成换行
 
-    def get_folder_info_by_url(self, share_url, dir_pwd='', get_this_page=0) -> FolderDetail:
+    def get_folder_info_by_url(self, share_url, dir_pwd='', get_this_page=0, stop_when: Optional[Callable[[List[FileInFolder]], bool]] = None) -> FolderDetail:
+        """
+        获取文件夹信息，未指定页码时将并发获取各页，并在进程内缓存一小段时间
+        若设置了stop_when，则在其返回True后不再获取后续页面
+        """
         for possiable_url in self.all_possiable_urls(share_url):
             try:
-                folder_info = self.lzy.get_folder_info_by_url(possiable_url, dir_pwd, get_this_page=get_this_page)
+                if get_this_page > 0:
+                    folder_info = self.lzy.get_folder_info_by_url(possiable_url, dir_pwd, get_this_page=get_this_page)
+                else:
+                    folder_info = self.lzy.get_folder_info_by_url_concurrently(possiable_url, dir_pwd, stop_when=stop_when)
             except Exception as e:
                 folder_info = FolderDetail(LanZouCloud.NETWORK_ERROR)
                 logger.debug(f"get_folder_info_by_url {possiable_url} 出异常了", exc_info=e)
@@ -425,6 +551,45 @@ def demo():
             logger.error("登录失败")
 
 
+# (文件夹名称, 文件名) => (内容指纹, 解析结果)
+_parsed_synced_files = {}  # type: Dict[Tuple[str, str], Tuple[str, Any]]
+# (路径, 大小, 修改时间) => 内容指纹，避免每次都重新计算哈希
+_file_fingerprints = {}  # type: Dict[Tuple[str, int, int], str]
+
+
+def file_fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_fingerprints:
+        with open(path, 'rb') as f:
+            _file_fingerprints[key] = f"{stat.st_size}-{hashlib.sha256(f.read()).hexdigest()}"
+
+    return _file_fingerprints[key]
+
+
+def parse_synced_json(folder: Folder, name: str, synced_file: SyncedFile, parse: Callable[[Any], Any], show_log=True) -> Any:
+    key = (folder.name, name)
+    if key in _parsed_synced_files:
+        fingerprint, result = _parsed_synced_files[key]
+        if fingerprint == synced_file.fingerprint:
+            get_log_func(logger.info, show_log)(f"{name} 内容未变化，直接使用之前的解析结果")
+            return result
+
+    with open_synced_file(synced_file) as f:
+        result = parse(json.load(f))
+
+    _parsed_synced_files[key] = (synced_file.fingerprint, result)
+    return result
+
+
+def open_synced_file(synced_file: SyncedFile) -> BinaryIO:
+    """以二进制模式打开同步的文件，压缩版本将在读取时流式解压"""
+    if synced_file.compressed:
+        return lzma.open(synced_file.path, 'rb')
+
+    return open(synced_file.path, 'rb')
+
+
 def demo_downloads():
     uploader = Uploader()
     uploader.download_file_in_folder(uploader.folder_online_files, uploader.all_jiaoyile_orders_filename, downloads_dir, try_compressed_version_first=True, cache_max_seconds=0)
@@ -1,6 +1,5 @@
-import requests
-
 from dao import AmsActInfo
+from network import http_request
 from util import *
 
 
@@ -115,7 +114,14 @@ def get_act_url(act_name: str) -> str:
 
 
 class Urls:
+    """
+    各个活动的链接模板，内容固定，一般通过get_urls()获取进程内共享的实例，而不是每次都重新构造
+    构造完成后即为只读，避免某处的修改影响到其他账号
+    """
+
     def __init__(self):
+        self._frozen = False
+
         # 余额
         self.balance = "https://djcapp.game.qq.com/cgi-bin/daoju/djcapp/v5/solo/jfcloud_flow.cgi?&appVersion={appVersion}&p_tk={p_tk}&sDeviceID={sDeviceID}&weexVersion=0.9.4&platform=android&deviceModel=MIX%202&&method=balance&page=0&osVersion=Android-28&ch=10003&sVersionName=v4.1.6.0&appSource=android"
         self.money_flow = "https://djcapp.game.qq.com/daoju/igw/main/?_service=app.bean.water&appVersion={appVersion}&p_tk={p_tk}&sDeviceID={sDeviceID}&sDjcSign={sDjcSign}&&weexVersion=0.9.4&platform=android&deviceModel=MIX%202&page=1&starttime={starttime}&endtime={endtime}&osVersion=Android-28&ch=10003&sVersionName=v4.1.6.0&appSource=android"
@@ -328,6 +334,14 @@ class Urls:
         self.xiaojiangyou_ask_question = "https://xyapi.game.qq.com/xiaoyue/service/ask?_={millseconds}&question={question}&question_id={question_id}&robot_type={robot_type}&option_type=0&filter={question}&rec_more=&certificate={certificate}&callback=jQuery171004811813596127945_{millseconds}&_={millseconds}"
         self.xiaojiangyou_get_packge = "https://xyapi.game.qq.com/xiaoyue/helper/package/get?_={millseconds}&token={token}&ams_id={ams_id}&package_group_id={package_group_id}&tool_id={tool_id}&certificate={certificate}&callback=jQuery171039455388263754454_{millseconds}&_={millseconds}"
 
+        self._frozen = True
+
+    def __setattr__(self, key, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"Urls为只读的链接模板，不能修改 {key}")
+
+        super().__setattr__(key, value)
+
     def show_current_valid_act_infos(self):
         acts = []
 
@@ -375,6 +389,18 @@ class Urls:
         logger.info(table)
 
 
+_urls = None  # type: Optional[Urls]
+
+
+def get_urls() -> Urls:
+    """进程内共享的链接模板，首次使用时构造，多进程模式下fork出的子进程将直接继承"""
+    global _urls
+    if _urls is None:
+        _urls = Urls()
+
+    return _urls
+
+
 @try_except()
 def search_act(actId):
     actId = str(actId)
@@ -424,7 +450,7 @@ def download_act_desc_js(actId: str) -> str:
         f'https://apps.game.qq.com/comm-htdocs/js/ams/v0.2R02/act/{actId}/act.desc.js',
     ]
     for url in actUrls:
-        res = requests.get(url, timeout=1)
+        res = http_request("GET", url, timeout=1)
         if res.status_code != 200:
             continue
 
@@ -486,6 +512,5 @@ def format_act(act: AmsActInfo, needPadding=False):
 
 
 if __name__ == '__main__':
-    urls = Urls()
-    urls.show_current_valid_act_infos()
+    get_urls().show_current_valid_act_infos()
     # print(get_not_ams_act_desc("集卡"))
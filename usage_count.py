@@ -1,21 +1,86 @@
 # 使用次数统计脚本
+import atexit
+import collections
+import datetime
+import json
 import os
-from typing import Any
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-import leancloud
-import leancloud.object_
+import psutil
 
 import ga
 import ga4
+from const import cached_dir
 from first_run import is_daily_first_run
 from log import logger
-from util import async_call, get_today, try_except
+from util import get_today, make_sure_dir_exists, try_except
 
 LEAN_CLOUD_SERVER_ADDR = "https://d02na0oe.lc-cn-n1-shared.com"
 LEAN_CLOUD_APP_ID = "D02NA0OEBGXu0YqwpVQYUNl3-gzGzoHsz"
 LEAN_CLOUD_APP_KEY = "LAs9VtM5UtGHLksPzoLwuCvx"
 
-leancloud.init(LEAN_CLOUD_APP_ID, LEAN_CLOUD_APP_KEY)
+_lean_cloud_inited = False
+_lean_cloud_init_lock = threading.Lock()
+
+
+def get_lean_cloud():
+    """
+    leancloud及其依赖导入耗时较长，且仅在后台上报和查询使用情况时才会用到，因此在首次使用时再导入并初始化
+    """
+    global _lean_cloud_inited
+
+    import leancloud
+
+    with _lean_cloud_init_lock:
+        if not _lean_cloud_inited:
+            leancloud.init(LEAN_CLOUD_APP_ID, LEAN_CLOUD_APP_KEY)
+            _lean_cloud_inited = True
+
+    return leancloud
+
+
+class CounterReport(NamedTuple):
+    name: str
+    report_to_lean_cloud: bool
+    # ga v3和ga4各自独立上报，其中一方失败时仅需补报该方
+    report_to_ga: bool
+    report_to_ga4: bool
+    ga_type: str
+    ga_category: str
+    ga_misc_params: Optional[dict]
+    report_time: float = 0
+
+
+# 所有上报都先放入队列，由单个后台线程写入本地的缓冲文件，再从缓冲文件中批量上报，上报失败时留待后续网络恢复后再补报
+# 从而确保上报既不会新开大量线程和连接，也不会因为网络不通而拖慢运行
+_report_queue = queue.Queue()  # type: queue.Queue
+_report_worker = None  # type: Optional[threading.Thread]
+_report_worker_lock = threading.Lock()
+
+# 后台线程取到一个上报后，再等待这么久来收集同一批次的其他上报
+report_batch_wait_seconds = 0.5
+# 程序退出时最多等待这么久来完成剩余的上报，未完成的部分会保留在缓冲文件中，下次运行时补报
+report_flush_timeout_seconds = 5
+# 上报请求的超时时间
+report_request_timeout_seconds = 5
+# 上报失败后，间隔这么久才再次尝试补报，期间仅写入缓冲文件
+report_retry_interval_seconds = 10 * 60
+# 每次补报时最多一起发送的上报数目
+report_replay_batch_size = 100
+
+# 缓冲文件所在目录，每个进程仅追加写入自己的缓冲文件 {pid}.jsonl，已退出的进程的缓冲文件由其他进程接手补报
+report_spool_dir = os.path.join(cached_dir, "usage_report_spool")
+# 单个进程的缓冲文件的大小上限，超出时丢弃最早的上报
+report_spool_max_bytes = 256 * 1024
+
+# ga允许的最长的上报延迟
+GA_MAX_QUEUE_TIME_MS = 4 * 3600 * 1000
+
+_next_replay_time = 0.0
 
 
 def increase_counter(name: Any = "", report_to_lean_cloud=False, report_to_google_analytics=True, ga_type=ga.GA_REPORT_TYPE_EVENT, ga_category="", ga_misc_params: dict = None):
@@ -24,31 +89,292 @@ def increase_counter(name: Any = "", report_to_lean_cloud=False, report_to_googl
     if name == "":
         raise AssertionError("increase_counter name not set")
 
-    def _cb():
-        if report_to_lean_cloud and is_daily_first_run(name):
-            # lean_cloud的计数器每日最多上报一次
-            increase_counter_sync_lean_cloud(name)
+    ensure_report_worker_started()
+    _report_queue.put(CounterReport(name, report_to_lean_cloud, report_to_google_analytics, report_to_google_analytics, ga_type, ga_category, ga_misc_params, time.time()))
 
-        if report_to_google_analytics:
-            increase_counter_sync_google_analytics(name, ga_type, ga_category, ga_misc_params)
 
-        # UNDONE: 增加自建的计数器上报
+def ensure_report_worker_started():
+    global _report_worker
+    with _report_worker_lock:
+        if _report_worker is not None and _report_worker.is_alive():
+            return
+
+        _report_worker = threading.Thread(target=_report_worker_loop, daemon=True)
+        _report_worker.start()
+
+        atexit.register(flush_reports)
+
+
+def flush_reports(timeout: float = report_flush_timeout_seconds) -> bool:
+    """
+    等待目前已加入队列的上报写入缓冲文件并尝试上报，返回是否在超时前完成
+    """
+    if _report_worker is None or not _report_worker.is_alive():
+        return True
+
+    done = threading.Event()
+    _report_queue.put(done)
+    return done.wait(timeout)
+
+
+def _report_worker_loop():
+    while True:
+        batch = [_report_queue.get()]
+
+        # 收集同一批次的其他上报，遇到flush请求时立即处理
+        deadline = time.time() + report_batch_wait_seconds
+        while not isinstance(batch[-1], threading.Event):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_report_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            spool_reports([report for report in batch if isinstance(report, CounterReport)])
+            if time.time() >= _next_replay_time:
+                replay_spooled_reports()
+        except Exception as e:
+            logger.debug("report batch failed", exc_info=e)
+        finally:
+            for flush_event in batch:
+                if isinstance(flush_event, threading.Event):
+                    flush_event.set()
+
+
+def spool_path(pid: Any) -> str:
+    return os.path.join(report_spool_dir, f"{pid}.jsonl")
+
+
+def spool_owner_pid(filename: str) -> int:
+    """
+    缓冲文件名形如 {pid}.jsonl 或 {pid}-{接手的进程的pid}.jsonl，返回其所属的进程
+    """
+    return int(filename.split(".")[0].split("-")[0])
+
+
+def spool_reports(reports: List[CounterReport]):
+    if len(reports) == 0:
+        return
+
+    # lean_cloud的计数器每日最多上报一次，在写入时就确定是否需要上报，避免补报时重复判断
+    reports = [report._replace(report_to_lean_cloud=report.report_to_lean_cloud and is_daily_first_run(report.name)) for report in reports]
+
+    make_sure_dir_exists(report_spool_dir)
+    path = spool_path(os.getpid())
+    with open(path, 'a', encoding='utf-8') as f:
+        for report in reports:
+            f.write(json.dumps(report._asdict(), ensure_ascii=False) + "\n")
+
+    if os.path.getsize(path) > report_spool_max_bytes:
+        write_own_spool(load_own_spool())
+
+
+def load_own_spool() -> List[CounterReport]:
+    """
+    读取当前进程的所有缓冲文件（包括从已退出的进程接手的），按上报时间排序
+    """
+    reports = []
+    for filename in own_spool_filenames():
+        with open(os.path.join(report_spool_dir, filename), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    reports.append(CounterReport(**json.loads(line)))
+                except Exception:
+                    # 进程在写入过程中被结束时，最后一行可能不完整，直接丢弃
+                    pass
+
+    return sorted(reports, key=lambda report: report.report_time)
+
+
+def write_own_spool(reports: List[CounterReport]):
+    """
+    将当前进程的所有缓冲文件合并为一个，超出大小上限时丢弃最早的上报
+    """
+    lines = [json.dumps(report._asdict(), ensure_ascii=False) + "\n" for report in reports]
+
+    total_size = 0
+    keep_from = len(lines)
+    while keep_from > 0 and total_size + len(lines[keep_from - 1].encode('utf-8')) <= report_spool_max_bytes:
+        keep_from -= 1
+        total_size += len(lines[keep_from].encode('utf-8'))
+    if keep_from != 0:
+        logger.debug(f"usage report spool is full, drop {keep_from} oldest reports")
 
-    async_call(_cb)
+    filenames = own_spool_filenames()
 
+    path = spool_path(os.getpid())
+    if keep_from != len(lines):
+        make_sure_dir_exists(report_spool_dir)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines[keep_from:])
+        os.replace(temp_path, path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+    for filename in filenames:
+        filepath = os.path.join(report_spool_dir, filename)
+        if filepath != path:
+            os.remove(filepath)
+
+
+def own_spool_filenames() -> List[str]:
+    if not os.path.isdir(report_spool_dir):
+        return []
+
+    pid = os.getpid()
+    return [filename for filename in os.listdir(report_spool_dir) if filename.endswith(".jsonl") and spool_owner_pid(filename) == pid]
+
+
+def claim_orphan_spools():
+    """
+    接手已退出的进程遗留的缓冲文件，通过重命名来确保同一个文件只会被一个进程接手
+    """
+    if not os.path.isdir(report_spool_dir):
+        return
 
-@try_except(show_exception_info=False)
-def increase_counter_sync_lean_cloud(name: str):
-    logger.debug(f"report to lean cloud, name = {name}")
-    for counter in get_counters(name):
-        counter.increment('count')
-        counter.save()
+    pid = os.getpid()
+    for filename in os.listdir(report_spool_dir):
+        if not filename.endswith(".jsonl"):
+            continue
 
+        try:
+            owner_pid = spool_owner_pid(filename)
+            if owner_pid == pid or psutil.pid_exists(owner_pid):
+                continue
+
+            os.replace(os.path.join(report_spool_dir, filename), os.path.join(report_spool_dir, f"{pid}-{uuid.uuid4().hex}.jsonl"))
+        except Exception as e:
+            # 可能已被其他进程接手，或者文件名不符合格式，跳过即可
+            logger.debug(f"claim usage report spool {filename} failed", exc_info=e)
+
+
+def replay_spooled_reports():
+    """
+    分批补报缓冲文件中的所有上报，未能成功上报的部分保留在缓冲文件中，并在一段时间内不再尝试
+    """
+    global _next_replay_time
+
+    claim_orphan_spools()
+    reports = load_own_spool()
+    if len(reports) == 0:
+        return
+
+    pending = []  # type: List[CounterReport]
+    for idx in range(0, len(reports), report_replay_batch_size):
+        batch = reports[idx:idx + report_replay_batch_size]
+        if len(pending) != 0:
+            # 之前的批次已经失败，说明网络不通，剩余部分直接留待下次补报
+            pending.extend(batch)
+            continue
+
+        pending.extend(report_batch(batch))
+
+    write_own_spool(pending)
+    if len(pending) != 0:
+        _next_replay_time = time.time() + report_retry_interval_seconds
+        logger.debug(f"{len(pending)} usage reports failed, retry after {report_retry_interval_seconds} seconds")
+    else:
+        _next_replay_time = 0
+
+
+def report_batch(reports: List[CounterReport]) -> List[CounterReport]:
+    """
+    上报这一批数据，并返回其中未能成功上报的部分
+    """
+    name_and_day_to_lean_cloud_amount = collections.Counter()  # type: Dict[Tuple[str, str], int]
+    # 各个hit/event以及对应的上报在reports中的下标
+    ga_hits, ga_report_indexes = [], []  # type: List[dict], List[int]
+    ga4_events, ga4_report_indexes = [], []  # type: List[dict], List[int]
+
+    for idx, report in enumerate(reports):
+        if report.report_to_lean_cloud:
+            day = get_today(datetime.datetime.fromtimestamp(report.report_time))
+            name_and_day_to_lean_cloud_amount[(report.name, day)] += 1
+
+        if report.report_to_ga or report.report_to_ga4:
+            payloads = make_google_analytics_payloads(report.name, report.ga_type, report.ga_category, report.ga_misc_params, report.report_time)
+            if payloads is not None:
+                if report.report_to_ga:
+                    ga_hits.append(payloads[0])
+                    ga_report_indexes.append(idx)
+                if report.report_to_ga4:
+                    ga4_events.append(payloads[1])
+                    ga4_report_indexes.append(idx)
+
+        # UNDONE: 增加自建的计数器上报
+
+    lean_cloud_ok = True
+    if len(name_and_day_to_lean_cloud_amount) != 0:
+        try:
+            increase_counters_sync_lean_cloud(name_and_day_to_lean_cloud_amount)
+        except Exception as e:
+            logger.debug("report to lean cloud failed", exc_info=e)
+            lean_cloud_ok = False
+
+    # ga v3和ga4分别记录未能上报的部分，分批请求时，前面已成功的请求不会再重复上报
+    ga_failed_indexes, ga4_failed_indexes = set(), set()
+    if len(ga_hits) != 0:
+        sent_count = increase_counters_sync_ga(ga_hits)
+        ga_failed_indexes.update(ga_report_indexes[sent_count:])
+    if len(ga4_events) != 0:
+        sent_count = increase_counters_sync_ga4(ga4_events)
+        ga4_failed_indexes.update(ga4_report_indexes[sent_count:])
+
+    # 仅保留未能成功上报的部分，避免已经上报成功的部分被重复上报
+    failed_reports = []
+    for idx, report in enumerate(reports):
+        report = report._replace(
+            report_to_lean_cloud=report.report_to_lean_cloud and not lean_cloud_ok,
+            report_to_ga=idx in ga_failed_indexes,
+            report_to_ga4=idx in ga4_failed_indexes,
+        )
+        if report.report_to_lean_cloud or report.report_to_ga or report.report_to_ga4:
+            failed_reports.append(report)
+
+    return failed_reports
+
+
+def increase_counters_sync_lean_cloud(name_and_day_to_amount: Dict[Tuple[str, str], int]):
+    logger.debug(f"report to lean cloud, name_and_day_to_amount = {name_and_day_to_amount}")
+    counters = []
+    for (name, day), amount in name_and_day_to_amount.items():
+        for counter in get_counters(name, day):
+            counter.increment('count', amount)
+            counters.append(counter)
+
+    get_lean_cloud().Object.save_all(counters)
+
+
+def increase_counters_sync_ga(ga_hits: List[dict]) -> int:
+    """上报谷歌分析v3，返回成功上报的数目"""
+    logger.debug(f"report to google analytics(v3), count = {len(ga_hits)}")
+    return ga.track_hits(ga_hits, timeout=report_request_timeout_seconds)
+
+
+def increase_counters_sync_ga4(ga4_events: List[dict]) -> int:
+    """上报谷歌分析v4，返回成功上报的数目"""
+    logger.debug(f"report to google analytics(v4), count = {len(ga4_events)}")
+    return ga4.track_events(ga4_events, timeout=report_request_timeout_seconds)
+
+
+def make_google_analytics_payloads(name: str, ga_type: str, ga_category: str, ga_misc_params: Optional[dict], report_time: float = 0) -> Optional[Tuple[dict, dict]]:
+    """
+    返回 (ga v3 的hit, ga4 的event)
+    """
+    ga4_timestamp_micros = 0
+    if report_time != 0:
+        # 补报时通过qt参数告知ga该上报实际发生的时间，ga仅接受4小时内的，更早的则视为现在发生
+        queue_time_ms = int((time.time() - report_time) * 1000)
+        if 0 < queue_time_ms < GA_MAX_QUEUE_TIME_MS:
+            ga_misc_params = {**(ga_misc_params or {}), "qt": queue_time_ms}
 
-@try_except(show_exception_info=False)
-def increase_counter_sync_google_analytics(name: str, ga_type: str, ga_category: str, ga_misc_params: dict):
-    #  上报谷歌分析（v3和v4同时上报）
-    logger.debug(f"report to google analytics(v3 and v4), name = {name}")
+        # ga4则通过timestamp_micros指定，最多可往前追溯72小时
+        if 0 < queue_time_ms < ga4.GA_MAX_BACKDATE_SECONDS * 1000:
+            ga4_timestamp_micros = int(report_time * 1000000)
 
     if ga_type == ga.GA_REPORT_TYPE_EVENT:
         if ga_category == "":
@@ -58,24 +384,24 @@ def increase_counter_sync_google_analytics(name: str, ga_type: str, ga_category:
                 ga_category, name = parts
             else:
                 ga_category = "counter"
-        ga.track_event(ga_category, name, ga_misc_params)
-        ga4.track_event(ga_category, name)
+        return ga.make_event_hit(ga_category, name, ga_misc_params=ga_misc_params), ga4.make_event(ga_category, name, ga4_timestamp_micros)
     elif ga_type == ga.GA_REPORT_TYPE_PAGE_VIEW:
-        ga.track_page(name, ga_misc_params)
-        ga4.track_event("page_view", name)
+        return ga.make_page_hit(name, ga_misc_params), ga4.make_event("page_view", name, ga4_timestamp_micros)
     else:
         logger.error(f"unknow ga_type={ga_type}")
+        return None
 
 
 time_periods = ["all", get_today()]
 time_periods_desc = ["累积", "今日"]
 
 
-def get_counters(name):
+def get_counters(name, day=""):
     """
     获取此计数器的若干个实例，如总计数，本日计数，本月计数，本年计数
+    :param day: 按日计数的日期，默认为今日
     """
-    res = [get_counter(name, time_period) for time_period in time_periods]
+    res = [get_counter(name, time_period) for time_period in ["all", day or get_today()]]
     return res
 
 
@@ -86,6 +412,7 @@ def get_count(name, time_period):
 
 @try_except(show_exception_info=False, return_val_on_except=0)
 def get_record_count_name_start_with(name_start_with, time_period):
+    leancloud = get_lean_cloud()
     CounterClass = leancloud.Object.extend("CounterClass")
     query = CounterClass.query
     query.startswith('name', name_start_with)
@@ -97,6 +424,7 @@ def get_counter(name, time_period):
     """
     获取指定计数器在指定时间段的计数实例
     """
+    leancloud = get_lean_cloud()
     CounterClass = leancloud.Object.extend("CounterClass")
     query = CounterClass.query
     query.equal_to('name', name)
@@ -119,12 +447,13 @@ def leancloud_api(api):
     return f"{LEAN_CLOUD_SERVER_ADDR}/1.1/{api}"
 
 
-def test():
+def demo():
     increase_counter("test_event", False, True, ga.GA_REPORT_TYPE_EVENT)
     increase_counter("test_page_view", False, True, ga.GA_REPORT_TYPE_PAGE_VIEW)
+    flush_reports()
 
     os.system("PAUSE")
 
 
 if __name__ == '__main__':
-    test()
+    demo()